@@ -0,0 +1,32 @@
+"""Ultima actividad en carrito
+
+Revision ID: 02162760c5b4
+Revises: 23d86ea63555
+Create Date: 2026-10-18 18:02:57.331846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '02162760c5b4'
+down_revision: Union[str, None] = '23d86ea63555'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('carrito', sa.Column('ultima_actividad', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_carrito_ultima_actividad'), 'carrito', ['ultima_actividad'], unique=False)
+    # Sin historial de actividad, tomamos la fecha de creación del carrito.
+    op.execute("UPDATE carrito SET ultima_actividad = time_tamptz")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_carrito_ultima_actividad'), table_name='carrito')
+    op.drop_column('carrito', 'ultima_actividad')
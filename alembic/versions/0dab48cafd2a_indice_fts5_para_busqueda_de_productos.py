@@ -0,0 +1,64 @@
+"""Indice FTS5 para busqueda de productos
+
+Revision ID: 0dab48cafd2a
+Revises: 3515e33788eb
+Create Date: 2026-10-18 14:05:11.482310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0dab48cafd2a'
+down_revision: Union[str, None] = '3515e33788eb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# IMPORTANTE: los triggers viven sobre la tabla `productos`. Una migración que use
+# `batch_alter_table('productos')` recrea la tabla y los borra; en ese caso hay que
+# volver a crearlos y ejecutar el 'rebuild' del índice.
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Tabla FTS5 de contenido externo: no duplica los datos, lee de `productos` por rowid.
+    op.execute("""
+        CREATE VIRTUAL TABLE productos_fts USING fts5(
+            name, description, marca,
+            content='productos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER productos_fts_ai AFTER INSERT ON productos BEGIN
+            INSERT INTO productos_fts(rowid, name, description, marca)
+            VALUES (new.id, new.name, new.description, new.marca);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER productos_fts_ad AFTER DELETE ON productos BEGIN
+            INSERT INTO productos_fts(productos_fts, rowid, name, description, marca)
+            VALUES ('delete', old.id, old.name, old.description, old.marca);
+        END
+    """)
+    # Solo reindexamos cuando cambian columnas de texto; los cambios de stock o precio no tocan el índice.
+    op.execute("""
+        CREATE TRIGGER productos_fts_au AFTER UPDATE OF name, description, marca ON productos BEGIN
+            INSERT INTO productos_fts(productos_fts, rowid, name, description, marca)
+            VALUES ('delete', old.id, old.name, old.description, old.marca);
+            INSERT INTO productos_fts(rowid, name, description, marca)
+            VALUES (new.id, new.name, new.description, new.marca);
+        END
+    """)
+    op.execute("INSERT INTO productos_fts(productos_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS productos_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS productos_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS productos_fts_ai")
+    op.execute("DROP TABLE IF EXISTS productos_fts")
@@ -0,0 +1,46 @@
+"""Reservas de stock
+
+Revision ID: 23d86ea63555
+Revises: 79721e5a24e7
+Create Date: 2026-10-18 17:20:44.102937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '23d86ea63555'
+down_revision: Union[str, None] = '79721e5a24e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reservas_stock',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['productos.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reservas_stock_expires_at'), 'reservas_stock', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_reservas_stock_id'), 'reservas_stock', ['id'], unique=False)
+    op.create_index(op.f('ix_reservas_stock_user_id'), 'reservas_stock', ['user_id'], unique=False)
+    # add_column directo (sin batch) para no recrear productos y perder los triggers de productos_fts.
+    op.add_column('productos', sa.Column('stock_reservado', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('productos', 'stock_reservado')
+    op.drop_index(op.f('ix_reservas_stock_user_id'), table_name='reservas_stock')
+    op.drop_index(op.f('ix_reservas_stock_id'), table_name='reservas_stock')
+    op.drop_index(op.f('ix_reservas_stock_expires_at'), table_name='reservas_stock')
+    op.drop_table('reservas_stock')
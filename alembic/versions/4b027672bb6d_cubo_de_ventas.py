@@ -0,0 +1,56 @@
+"""Cubo de ventas
+
+Revision ID: 4b027672bb6d
+Revises: c778969b2e52
+Create Date: 2026-10-18 21:55:12.418307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b027672bb6d'
+down_revision: Union[str, None] = 'c778969b2e52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ventas_cubo',
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('hora', sa.DateTime(), nullable=False),
+    sa.Column('payment_method_id', sa.Integer(), nullable=False),
+    sa.Column('pedidos', sa.Integer(), nullable=False),
+    sa.Column('ingresos', sa.Float(), nullable=False),
+    sa.Column('unidades', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('category_id', 'hora', 'payment_method_id')
+    )
+    # Carga inicial con los pedidos existentes (lo mismo que scripts/reconstruir_analitica.py).
+    metodo = "coalesce((SELECT min(pagos.payment_method_id) FROM pagos WHERE pagos.order_id = pedidos.id), 0)"
+    hora = "strftime('%Y-%m-%d %H:00:00', pedidos.date)"
+    op.execute(
+        "INSERT INTO ventas_cubo (category_id, hora, payment_method_id, pedidos, ingresos, unidades) "
+        f"SELECT productos.category_id, {hora}, {metodo}, count(DISTINCT pedidos.id), "
+        'sum("pedidoDetalle".quantity * "pedidoDetalle".price), sum("pedidoDetalle".quantity) '
+        'FROM "pedidoDetalle" JOIN pedidos ON pedidos.id = "pedidoDetalle".order_id '
+        'JOIN productos ON productos.id = "pedidoDetalle".product_id '
+        "WHERE pedidos.date IS NOT NULL AND productos.category_id IS NOT NULL "
+        f"GROUP BY productos.category_id, {hora}, {metodo}"
+    )
+    op.execute(
+        "INSERT INTO ventas_cubo (category_id, hora, payment_method_id, pedidos, ingresos, unidades) "
+        f"SELECT 0, {hora}, {metodo}, count(DISTINCT pedidos.id), "
+        'sum("pedidoDetalle".quantity * "pedidoDetalle".price), sum("pedidoDetalle".quantity) '
+        'FROM "pedidoDetalle" JOIN pedidos ON pedidos.id = "pedidoDetalle".order_id '
+        "WHERE pedidos.date IS NOT NULL "
+        f"GROUP BY {hora}, {metodo}"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ventas_cubo')
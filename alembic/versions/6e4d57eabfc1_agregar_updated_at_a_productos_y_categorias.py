@@ -0,0 +1,33 @@
+"""Agregar updated_at a productos y categorias
+
+Revision ID: 6e4d57eabfc1
+Revises: 241a5d1d5e0b
+Create Date: 2026-10-18 15:12:48.631902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e4d57eabfc1'
+down_revision: Union[str, None] = '241a5d1d5e0b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Sin batch_alter_table: recrear `productos` borraría los triggers del índice FTS5.
+    op.add_column('productos', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('categorias', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE productos SET updated_at = CURRENT_TIMESTAMP")
+    op.execute("UPDATE categorias SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('categorias', 'updated_at')
+    op.drop_column('productos', 'updated_at')
@@ -0,0 +1,48 @@
+"""Indice unico (cart_id, product_id) en carritoDetalle
+
+Revision ID: 79721e5a24e7
+Revises: 6e4d57eabfc1
+Create Date: 2026-10-18 16:05:12.418309
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '79721e5a24e7'
+down_revision: Union[str, None] = '6e4d57eabfc1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Antes de crear el índice unificamos las líneas duplicadas que pudieron quedar por clicks
+    # concurrentes: la línea más vieja se queda con la suma de las cantidades y el resto se borra.
+    op.execute(
+        """
+        UPDATE "carritoDetalle"
+        SET quantity = (
+            SELECT SUM(d.quantity) FROM "carritoDetalle" AS d
+            WHERE d.cart_id = "carritoDetalle".cart_id AND d.product_id = "carritoDetalle".product_id
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM "carritoDetalle" GROUP BY cart_id, product_id HAVING COUNT(*) > 1
+        )
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM "carritoDetalle"
+        WHERE id NOT IN (SELECT MIN(id) FROM "carritoDetalle" GROUP BY cart_id, product_id)
+        """
+    )
+    op.create_index('ux_carritoDetalle_cart_id_product_id', 'carritoDetalle', ['cart_id', 'product_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_carritoDetalle_cart_id_product_id', table_name='carritoDetalle')
@@ -0,0 +1,47 @@
+"""Ventas por producto
+
+Revision ID: 8dc236fd373a
+Revises: 4b027672bb6d
+Create Date: 2026-10-18 22:31:47.902615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8dc236fd373a'
+down_revision: Union[str, None] = '4b027672bb6d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ventas_productos',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('unidades', sa.Integer(), nullable=False),
+    sa.Column('ingresos', sa.Float(), nullable=False),
+    sa.Column('ultima_venta', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['productos.id'], ),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_index('ix_ventas_productos_ingresos', 'ventas_productos', ['ingresos', 'product_id'], unique=False)
+    op.create_index('ix_ventas_productos_unidades', 'ventas_productos', ['unidades', 'product_id'], unique=False)
+    # Carga inicial con los pedidos existentes (lo mismo que scripts/reconstruir_analitica.py).
+    op.execute(
+        "INSERT INTO ventas_productos (product_id, unidades, ingresos, ultima_venta) "
+        'SELECT "pedidoDetalle".product_id, sum("pedidoDetalle".quantity), '
+        'sum("pedidoDetalle".quantity * "pedidoDetalle".price), max(pedidos.date) '
+        'FROM "pedidoDetalle" JOIN pedidos ON pedidos.id = "pedidoDetalle".order_id '
+        'GROUP BY "pedidoDetalle".product_id'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ventas_productos_unidades', table_name='ventas_productos')
+    op.drop_index('ix_ventas_productos_ingresos', table_name='ventas_productos')
+    op.drop_table('ventas_productos')
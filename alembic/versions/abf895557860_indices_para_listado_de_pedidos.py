@@ -0,0 +1,32 @@
+"""Indices para listado de pedidos
+
+Revision ID: abf895557860
+Revises: fcac39b8b8aa
+Create Date: 2026-10-18 20:21:37.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'abf895557860'
+down_revision: Union[str, None] = 'fcac39b8b8aa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_pedidos_date'), 'pedidos', ['date'], unique=False)
+    op.create_index('ix_pedidos_user_id_id', 'pedidos', ['user_id', 'id'], unique=False)
+    op.create_index(op.f('ix_pedidoDetalle_order_id'), 'pedidoDetalle', ['order_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_pedidoDetalle_order_id'), table_name='pedidoDetalle')
+    op.drop_index('ix_pedidos_user_id_id', table_name='pedidos')
+    op.drop_index(op.f('ix_pedidos_date'), table_name='pedidos')
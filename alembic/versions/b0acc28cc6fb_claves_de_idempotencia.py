@@ -0,0 +1,42 @@
+"""Claves de idempotencia
+
+Revision ID: b0acc28cc6fb
+Revises: 02162760c5b4
+Create Date: 2026-10-18 19:10:42.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b0acc28cc6fb'
+down_revision: Union[str, None] = '02162760c5b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('claves_idempotencia',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('alcance', sa.String(), nullable=False),
+    sa.Column('clave', sa.String(), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('respuesta', sa.LargeBinary(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_claves_idempotencia_created_at'), 'claves_idempotencia', ['created_at'], unique=False)
+    op.create_index(op.f('ix_claves_idempotencia_id'), 'claves_idempotencia', ['id'], unique=False)
+    op.create_index('ux_claves_idempotencia_alcance_clave', 'claves_idempotencia', ['alcance', 'clave'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_claves_idempotencia_alcance_clave', table_name='claves_idempotencia')
+    op.drop_index(op.f('ix_claves_idempotencia_id'), table_name='claves_idempotencia')
+    op.drop_index(op.f('ix_claves_idempotencia_created_at'), table_name='claves_idempotencia')
+    op.drop_table('claves_idempotencia')
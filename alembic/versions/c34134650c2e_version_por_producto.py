@@ -0,0 +1,41 @@
+"""Version por producto
+
+Revision ID: c34134650c2e
+Revises: f1c1857edc68
+Create Date: 2026-10-19 13:02:17.640915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c34134650c2e'
+down_revision: Union[str, None] = 'f1c1857edc68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# productos.version sube cuando cambia algo que ve el cliente de ese producto. La caché de
+# /productos/{id} y /productos/lote la compara por fila, así editar un producto no invalida los demás.
+# IMPORTANTE: como los demás triggers de productos, este se pierde si una migración recrea la tabla.
+_COLUMNAS_VISIBLES = "name, description, price, marca, stock, image_url, category_id"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # add_column directo (sin batch) para no recrear productos y perder sus triggers.
+    op.add_column('productos', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.execute(f"""
+        CREATE TRIGGER productos_version_fila_au AFTER UPDATE OF {_COLUMNAS_VISIBLES} ON productos BEGIN
+            UPDATE productos SET version = version + 1 WHERE id = new.id;
+        END
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS productos_version_fila_au")
+    op.drop_column('productos', 'version')
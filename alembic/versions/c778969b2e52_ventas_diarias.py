@@ -0,0 +1,38 @@
+"""Ventas diarias
+
+Revision ID: c778969b2e52
+Revises: abf895557860
+Create Date: 2026-10-18 20:40:05.881372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c778969b2e52'
+down_revision: Union[str, None] = 'abf895557860'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ventas_diarias',
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('pedidos', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('fecha')
+    )
+    # Carga inicial con los pedidos existentes (lo mismo que scripts/reconstruir_ventas_diarias.py).
+    op.execute(
+        "INSERT INTO ventas_diarias (fecha, total, pedidos) "
+        "SELECT date(date), coalesce(sum(total), 0), count(*) FROM pedidos WHERE date IS NOT NULL GROUP BY date(date)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ventas_diarias')
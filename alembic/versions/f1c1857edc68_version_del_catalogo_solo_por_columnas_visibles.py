@@ -0,0 +1,43 @@
+"""Version del catalogo solo por columnas visibles
+
+Revision ID: f1c1857edc68
+Revises: fdf4d869dfdb
+Create Date: 2026-10-19 12:20:44.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c1857edc68'
+down_revision: Union[str, None] = 'fdf4d869dfdb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Las reservas solo tocan stock_reservado (y updated_at), que no se devuelven al cliente: no
+# deben cambiar la versión del catálogo, o cada checkout invalidaría la caché y todos los ETag.
+_COLUMNAS_VISIBLES = "name, description, price, marca, stock, image_url, category_id"
+
+
+def _crear_trigger(evento: str) -> None:
+    op.execute(f"""
+        CREATE TRIGGER productos_version_au {evento} BEGIN
+            UPDATE versiones_catalogo SET version = version + 1 WHERE espacio IN ('productos');
+        END
+    """)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS productos_version_au")
+    _crear_trigger(f"AFTER UPDATE OF {_COLUMNAS_VISIBLES} ON productos")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS productos_version_au")
+    _crear_trigger("AFTER UPDATE ON productos")
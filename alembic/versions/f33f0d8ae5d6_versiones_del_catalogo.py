@@ -0,0 +1,57 @@
+"""Versiones del catalogo
+
+Revision ID: f33f0d8ae5d6
+Revises: 8dc236fd373a
+Create Date: 2026-10-19 10:12:31.550871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f33f0d8ae5d6'
+down_revision: Union[str, None] = '8dc236fd373a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Cada escritura sobre productos o categorías sube la versión de su espacio; los ETag y las
+# claves de la caché del catálogo la leen de acá. Altas y bajas de productos cambian también
+# los conteos por categoría, igual que mover un producto de categoría.
+# IMPORTANTE: como los del índice FTS5, estos triggers se pierden si una migración recrea
+# `productos` o `categorias` con batch_alter_table.
+_TRIGGERS = {
+    "productos_version_ai": ("AFTER INSERT ON productos", "'productos', 'categorias'"),
+    "productos_version_ad": ("AFTER DELETE ON productos", "'productos', 'categorias'"),
+    "productos_version_au": ("AFTER UPDATE ON productos", "'productos'"),
+    "productos_version_au_categoria": ("AFTER UPDATE OF category_id ON productos", "'categorias'"),
+    "categorias_version_ai": ("AFTER INSERT ON categorias", "'categorias'"),
+    "categorias_version_ad": ("AFTER DELETE ON categorias", "'categorias'"),
+    "categorias_version_au": ("AFTER UPDATE ON categorias", "'categorias'"),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('versiones_catalogo',
+    sa.Column('espacio', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('espacio')
+    )
+    op.execute("INSERT INTO versiones_catalogo (espacio, version) VALUES ('productos', 1), ('categorias', 1)")
+    for nombre, (evento, espacios) in _TRIGGERS.items():
+        op.execute(f"""
+            CREATE TRIGGER {nombre} {evento} BEGIN
+                UPDATE versiones_catalogo SET version = version + 1 WHERE espacio IN ({espacios});
+            END
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for nombre in _TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {nombre}")
+    op.drop_table('versiones_catalogo')
@@ -0,0 +1,48 @@
+"""Cola de pagos
+
+Revision ID: fcac39b8b8aa
+Revises: b0acc28cc6fb
+Create Date: 2026-10-18 19:48:13.027461
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fcac39b8b8aa'
+down_revision: Union[str, None] = 'b0acc28cc6fb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('cola_pagos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('address_id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.String(), nullable=True),
+    sa.Column('status', sa.Integer(), nullable=False),
+    sa.Column('intentos', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('disponible_desde', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('ultimo_error', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['address_id'], ['direccionesEnvio.id'], ),
+    sa.ForeignKeyConstraint(['order_id'], ['pedidos.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_cola_pagos_id'), 'cola_pagos', ['id'], unique=False)
+    op.create_index('ix_cola_pagos_status_disponible_desde', 'cola_pagos', ['status', 'disponible_desde'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_cola_pagos_status_disponible_desde', table_name='cola_pagos')
+    op.drop_index(op.f('ix_cola_pagos_id'), table_name='cola_pagos')
+    op.drop_table('cola_pagos')
@@ -0,0 +1,32 @@
+"""Plazo de toma en cola de pagos
+
+Revision ID: fdf4d869dfdb
+Revises: f33f0d8ae5d6
+Create Date: 2026-10-19 11:03:27.104958
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fdf4d869dfdb'
+down_revision: Union[str, None] = 'f33f0d8ae5d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cola_pagos', sa.Column('tomado_en', sa.DateTime(), nullable=True))
+    op.create_index('ix_cola_pagos_status_tomado_en', 'cola_pagos', ['status', 'tomado_en'], unique=False)
+    # Los que quedaron en procesando (status 2) se retoman cuando venza el plazo.
+    op.execute("UPDATE cola_pagos SET tomado_en = created_at WHERE status = 2")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_cola_pagos_status_tomado_en', table_name='cola_pagos')
+    op.drop_column('cola_pagos', 'tomado_en')
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import bindparam, delete, func, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from api.core import models
+from api.core.database import AsyncSessionLocal
+
+
+# "sqlite" (por defecto): cada cambio del carrito se escribe y confirma en la base.
+# "memoria": los carritos activos viven en este proceso y se vuelcan a carrito/carritoDetalle
+# en segundo plano (write-behind). Solo es válido con un único proceso de la API, porque el
+# estado del carrito no se comparte entre workers.
+CARRITO_ALMACEN = os.environ.get("CARRITO_ALMACEN", "sqlite")
+CARRITO_VOLCADO_INTERVALO_SEGUNDOS = float(os.environ.get("CARRITO_VOLCADO_INTERVALO_SEGUNDOS", "2"))
+CARRITO_MEMORIA_INACTIVIDAD_SEGUNDOS = float(os.environ.get("CARRITO_MEMORIA_INACTIVIDAD_SEGUNDOS", "600"))
+
+
+class LineaEnMemoria:
+    """Línea de carrito en memoria. Expone los mismos atributos que models.CarritoDetalle que usan los endpoints."""
+
+    __slots__ = ("id", "cart_id", "product_id", "quantity", "price")
+
+    def __init__(self, id: int, cart_id: int, product_id: int, quantity: int, price: float):
+        self.id = id
+        self.cart_id = cart_id
+        self.product_id = product_id
+        self.quantity = quantity
+        self.price = price
+
+
+class CarritoEnMemoria:
+    __slots__ = ("cart_id", "lineas", "ultima_actividad", "ultimo_acceso")
+
+    def __init__(self, cart_id: int, lineas: Dict[int, LineaEnMemoria]):
+        self.cart_id = cart_id
+        self.lineas = lineas  # product_id -> línea
+        self.ultima_actividad: Optional[datetime] = None
+        self.ultimo_acceso = time.monotonic()
+
+
+class AlmacenCarritosEnMemoria:
+    """
+    Carritos activos en memoria con escritura diferida. Los cambios solo tocan este
+    diccionario (sin commit a SQLite por click) y marcan el carrito como sucio; `volcar`
+    reemplaza en la base las líneas de los carritos sucios en una sola transacción.
+    Los ids de línea se asignan acá, continuando el máximo de carritoDetalle, para que
+    los endpoints devuelvan el mismo id antes y después del volcado.
+    """
+
+    def __init__(self):
+        self._carritos: Dict[int, CarritoEnMemoria] = {}
+        self._lineas_por_id: Dict[int, LineaEnMemoria] = {}
+        self._sucios: Set[int] = set()
+        self._siguiente_id: Optional[int] = None
+        self._lock_volcado = asyncio.Lock()
+
+    async def cargar(self, db: AsyncSession, cart_id: int) -> CarritoEnMemoria:
+        """Devuelve el carrito en memoria, leyéndolo de la base la primera vez."""
+        carrito = self._carritos.get(cart_id)
+        if carrito is None:
+            result = await db.execute(select(models.CarritoDetalle).where(models.CarritoDetalle.cart_id == cart_id))
+            filas = result.scalars().all()
+            if self._siguiente_id is None:
+                maximo = (await db.execute(select(func.max(models.CarritoDetalle.id)))).scalar()
+                if self._siguiente_id is None:
+                    self._siguiente_id = (maximo or 0) + 1
+            # Otra request pudo cargarlo mientras esperábamos a la base: nos quedamos con ese.
+            carrito = self._carritos.get(cart_id)
+            if carrito is None:
+                lineas = {fila.product_id: LineaEnMemoria(fila.id, cart_id, fila.product_id, fila.quantity, fila.price) for fila in filas}
+                carrito = CarritoEnMemoria(cart_id, lineas)
+                self._carritos[cart_id] = carrito
+                self._lineas_por_id.update((linea.id, linea) for linea in lineas.values())
+        carrito.ultimo_acceso = time.monotonic()
+        return carrito
+
+    async def obtener_linea(self, db: AsyncSession, linea_id: int) -> Optional[LineaEnMemoria]:
+        linea = self._lineas_por_id.get(linea_id)
+        if linea is not None:
+            return linea
+        cart_id = (await db.execute(select(models.CarritoDetalle.cart_id).where(models.CarritoDetalle.id == linea_id))).scalar()
+        if cart_id is None or cart_id in self._carritos:
+            # Si el carrito ya está en memoria, la línea de la base fue borrada y aún no se volcó.
+            return None
+        await self.cargar(db, cart_id)
+        return self._lineas_por_id.get(linea_id)
+
+    def fijar_cantidad(self, carrito: CarritoEnMemoria, product_id: int, cantidad: int, precio: float) -> Optional[LineaEnMemoria]:
+        """Deja `cantidad` unidades del producto en el carrito (0 quita la línea). No valida stock."""
+        linea = carrito.lineas.get(product_id)
+        if cantidad <= 0:
+            if linea is not None:
+                del carrito.lineas[product_id]
+                self._lineas_por_id.pop(linea.id, None)
+            linea = None
+        elif linea is None:
+            linea = LineaEnMemoria(self._siguiente_id, carrito.cart_id, product_id, cantidad, precio)
+            self._siguiente_id += 1
+            carrito.lineas[product_id] = linea
+            self._lineas_por_id[linea.id] = linea
+        else:
+            linea.quantity = cantidad
+        self.marcar_sucio(carrito)
+        return linea
+
+    def vaciar(self, carrito: CarritoEnMemoria) -> None:
+        for linea in carrito.lineas.values():
+            self._lineas_por_id.pop(linea.id, None)
+        carrito.lineas = {}
+        self.marcar_sucio(carrito)
+
+    def marcar_sucio(self, carrito: CarritoEnMemoria) -> None:
+        carrito.ultima_actividad = datetime.now(timezone.utc)
+        self._sucios.add(carrito.cart_id)
+
+    def olvidar(self, cart_id: int) -> None:
+        """Saca el carrito de memoria sin volcarlo; la próxima lectura lo vuelve a cargar de la base."""
+        carrito = self._carritos.pop(cart_id, None)
+        self._sucios.discard(cart_id)
+        if carrito is not None:
+            for linea in carrito.lineas.values():
+                self._lineas_por_id.pop(linea.id, None)
+
+    async def volcar(self, db: AsyncSession, cart_ids: Optional[List[int]] = None) -> int:
+        """
+        Escribe en carrito/carritoDetalle los carritos sucios (o solo los de `cart_ids`) en una
+        transacción: un DELETE de sus líneas, un INSERT con las actuales y la actividad de cada
+        carrito. Se toma una foto antes de la primera espera, así los cambios que lleguen durante
+        el volcado vuelven a marcar el carrito y salen en el próximo. Devuelve cuántos volcó.
+        """
+        async with self._lock_volcado:
+            pendientes = self._sucios if cart_ids is None else self._sucios.intersection(cart_ids)
+            if not pendientes:
+                return 0
+            pendientes = list(pendientes)
+            self._sucios.difference_update(pendientes)
+            carritos = [self._carritos[cart_id] for cart_id in pendientes if cart_id in self._carritos]
+            lineas = [
+                {"id": l.id, "cart_id": l.cart_id, "product_id": l.product_id, "quantity": l.quantity, "price": l.price}
+                for carrito in carritos for l in carrito.lineas.values()
+            ]
+            actividad = [{"b_id": c.cart_id, "b_actividad": c.ultima_actividad} for c in carritos if c.ultima_actividad]
+            try:
+                await db.execute(delete(models.CarritoDetalle).where(models.CarritoDetalle.cart_id.in_(pendientes)))
+                if lineas:
+                    await db.execute(insert(models.CarritoDetalle), lineas)
+                if actividad:
+                    await db.execute(
+                        update(models.Carrito.__table__)
+                        .where(models.Carrito.id == bindparam("b_id"))
+                        .values(ultima_actividad=bindparam("b_actividad")),
+                        actividad,
+                    )
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                self._sucios.update(cart_id for cart_id in pendientes if cart_id in self._carritos)
+                raise
+            return len(pendientes)
+
+    def desalojar_inactivos(self, segundos: float = CARRITO_MEMORIA_INACTIVIDAD_SEGUNDOS) -> int:
+        """Libera la memoria de los carritos ya volcados que no se usan hace `segundos`."""
+        limite = time.monotonic() - segundos
+        inactivos = [cart_id for cart_id, c in self._carritos.items() if c.ultimo_acceso < limite and cart_id not in self._sucios]
+        for cart_id in inactivos:
+            self.olvidar(cart_id)
+        return len(inactivos)
+
+    def ids_en_memoria(self) -> List[int]:
+        return list(self._carritos)
+
+    def estadisticas(self) -> dict:
+        return {"carritos": len(self._carritos), "lineas": len(self._lineas_por_id), "sucios": len(self._sucios)}
+
+
+almacen_carritos = AlmacenCarritosEnMemoria()
+
+
+def en_memoria() -> bool:
+    return CARRITO_ALMACEN == "memoria"
+
+
+async def volcar_carritos_pendientes() -> int:
+    """Vuelca los carritos sucios y desaloja los inactivos. Corre como tarea periódica y al apagar la app."""
+    async with AsyncSessionLocal() as db:
+        volcados = await almacen_carritos.volcar(db)
+    almacen_carritos.desalojar_inactivos()
+    return volcados
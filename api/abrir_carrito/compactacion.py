@@ -0,0 +1,22 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from api.core.database import AsyncSessionLocal
+from api.abrir_carrito import dal
+
+logger = logging.getLogger(__name__)
+
+CARRITOS_ABANDONADOS_DIAS = int(os.environ.get("CARRITOS_ABANDONADOS_DIAS", "30"))
+CARRITOS_COMPACTACION_LOTE = int(os.environ.get("CARRITOS_COMPACTACION_LOTE", "200"))
+CARRITOS_COMPACTACION_INTERVALO_SEGUNDOS = float(os.environ.get("CARRITOS_COMPACTACION_INTERVALO_SEGUNDOS", str(6 * 60 * 60)))
+
+
+async def compactar_carritos_abandonados(dias: int = CARRITOS_ABANDONADOS_DIAS, lote: int = CARRITOS_COMPACTACION_LOTE) -> dict:
+    """Elimina los carritos sin actividad en los últimos `dias` días. Corre como tarea periódica y desde scripts/."""
+    limite = datetime.now(timezone.utc) - timedelta(days=dias)
+    async with AsyncSessionLocal() as db:
+        eliminados = await dal.compactar_carritos_abandonados(db, limite_inactividad=limite, lote=lote)
+    if eliminados["carritos"]:
+        logger.info("Carritos abandonados eliminados: %(carritos)s (líneas: %(lineas)s)", eliminados)
+    return eliminados
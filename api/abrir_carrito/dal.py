@@ -1,9 +1,15 @@
+from sqlalchemy import delete, func, literal, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import List
 from api.core import models
-from api.abrir_carrito import schemas
+from api.abrir_carrito import schemas, resumen
+from api.abrir_carrito.almacen import almacen_carritos, en_memoria
+from api.productos.dal import obtener_productos_por_ids
 
 
 async def obtener_o_crear_carrito(db: AsyncSession, user_id: int):
@@ -12,7 +18,8 @@ async def obtener_o_crear_carrito(db: AsyncSession, user_id: int):
     if carrito is not None:
         return carrito
     
-    db_carrito = models.Carrito(user_id=user_id, time_tamptz=datetime.now(timezone.utc))
+    ahora = datetime.now(timezone.utc)
+    db_carrito = models.Carrito(user_id=user_id, time_tamptz=ahora, ultima_actividad=ahora)
     db.add(db_carrito)
     await db.commit()
     await db.refresh(db_carrito)
@@ -20,12 +27,34 @@ async def obtener_o_crear_carrito(db: AsyncSession, user_id: int):
     return db_carrito
 
 
-async def calcular_total_carrito(db: AsyncSession, carrito_id: int) -> float:
-    detalles = await obtener_detalle_carrito(db=db, carrito_id=carrito_id)
-    total = 0.0
-    for item in detalles:
-        total += item.quantity * item.price
-    return total
+async def _registrar_actividad(db: AsyncSession, cart_id: int) -> None:
+    """Marca el carrito como activo. Se ejecuta dentro de la transacción de cada escritura sobre sus líneas."""
+    await db.execute(update(models.Carrito).where(models.Carrito.id == cart_id).values(ultima_actividad=datetime.now(timezone.utc)))
+
+
+async def obtener_resumen_carrito(db: AsyncSession, carrito_id: int):
+    """
+    Devuelve (total, cantidad_items, cantidad_lineas) del carrito. Se sirve desde el resumen
+    en caché, que mantienen las funciones de escritura de este módulo; si no está, se calcula
+    con SUM/COUNT en SQLite sin traer las líneas.
+    """
+    if en_memoria():
+        carrito = await almacen_carritos.cargar(db, carrito_id)
+        lineas = carrito.lineas.values()
+        return round(sum(l.quantity * l.price for l in lineas), 2), sum(l.quantity for l in lineas), len(lineas)
+
+    cacheado, version_inicial = resumen.leer(carrito_id)
+    if cacheado is not None:
+        return cacheado
+
+    query = select(
+        func.coalesce(func.sum(models.CarritoDetalle.quantity * models.CarritoDetalle.price), 0.0),
+        func.coalesce(func.sum(models.CarritoDetalle.quantity), 0),
+        func.count(models.CarritoDetalle.id),
+    ).where(models.CarritoDetalle.cart_id == carrito_id)
+    total, cantidad_items, cantidad_lineas = (await db.execute(query)).one()
+    resumen.guardar(carrito_id, float(total), cantidad_items, cantidad_lineas, version_inicial)
+    return float(total), cantidad_items, cantidad_lineas
 
 
 async def obtener_carrito_por_usuario_id(db: AsyncSession, user_id: int): #user_id va a venir desde el endpoint
@@ -34,28 +63,209 @@ async def obtener_carrito_por_usuario_id(db: AsyncSession, user_id: int): #user_
     return result.scalars().first()
 
 
-async def agregar_item_al_carrito(db: AsyncSession, cart_id: int, product_id: int, quantity: int, price: float):
-    result = await db.execute(select(models.CarritoDetalle).where(models.CarritoDetalle.cart_id == cart_id, models.CarritoDetalle.product_id == product_id))
-    item_existente = result.scalars().first()
-    if item_existente:
-        item_existente.quantity += quantity
-        db_item = item_existente
-    else:
-        db_item = models.CarritoDetalle(cart_id=cart_id, product_id=product_id, quantity=quantity, price=price)
-        db.add(db_item)
-    await db.commit()
-    await db.refresh(db_item)
+async def agregar_item_al_carrito(db: AsyncSession, cart_id: int, product_id: int, quantity: int):
+    """
+    Agrega `quantity` unidades del producto al carrito con una sola sentencia:
+    INSERT ... SELECT ... ON CONFLICT(cart_id, product_id) DO UPDATE ... RETURNING.
+    El precio se toma del producto y la condición de stock va dentro de la sentencia, tanto
+    para la línea nueva como para la suma sobre una existente, así dos clicks concurrentes
+    no pueden duplicar la línea ni superar el stock.
+    Devuelve la línea resultante, o None si el producto no existe o el stock no alcanza.
+    """
+    if en_memoria():
+        return await _agregar_item_en_memoria(db, cart_id, product_id, quantity)
+
+    nueva_linea = sqlite_insert(models.CarritoDetalle).from_select(
+        ["cart_id", "product_id", "quantity", "price"],
+        select(literal(cart_id), models.Productos.id, literal(quantity), models.Productos.price)
+        .where(models.Productos.id == product_id, models.Productos.stock >= quantity),
+    )
+    stock_del_producto = select(models.Productos.stock).where(models.Productos.id == product_id).scalar_subquery()
+    query = nueva_linea.on_conflict_do_update(
+        index_elements=[models.CarritoDetalle.cart_id, models.CarritoDetalle.product_id],
+        set_={"quantity": models.CarritoDetalle.quantity + nueva_linea.excluded.quantity},
+        where=models.CarritoDetalle.quantity + nueva_linea.excluded.quantity <= stock_del_producto,
+    ).returning(models.CarritoDetalle.id, models.CarritoDetalle.cart_id, models.CarritoDetalle.product_id, models.CarritoDetalle.quantity, models.CarritoDetalle.price)
+
+    with resumen.escritura(cart_id):
+        db_item = (await db.execute(query)).first()
+        if db_item is not None:
+            await _registrar_actividad(db, cart_id)
+        await db.commit()
+        if db_item is None:
+            return None
+        # Si la cantidad final es la agregada, la línea es nueva.
+        resumen.aplicar_cambio(cart_id, quantity * db_item.price, quantity, 1 if db_item.quantity == quantity else 0)
     return db_item
 
 
+async def _agregar_item_en_memoria(db: AsyncSession, cart_id: int, product_id: int, quantity: int):
+    carrito = await almacen_carritos.cargar(db, cart_id)
+    producto = (await obtener_productos_por_ids(db, [product_id])).get(product_id)
+    if producto is None:
+        return None
+    # Entre la lectura de la cantidad actual y la escritura no hay await: otra request no puede intercalarse.
+    linea = carrito.lineas.get(product_id)
+    cantidad = (linea.quantity if linea is not None else 0) + quantity
+    if cantidad > producto.stock:
+        return None
+    return almacen_carritos.fijar_cantidad(carrito, product_id, cantidad, linea.price if linea is not None else producto.price)
+
+
+async def volcar_carrito(db: AsyncSession, carrito_id: int) -> None:
+    """
+    Con el almacén en memoria, escribe ya en la base los cambios pendientes del carrito.
+    Se llama antes de operaciones que leen carritoDetalle en SQL (reserva, checkout).
+    """
+    if en_memoria():
+        await almacen_carritos.volcar(db, [carrito_id])
+
+
+def carrito_convertido_en_pedido(carrito_id: int) -> None:
+    """Actualiza el estado en memoria del carrito después de que un pedido lo vació en la base."""
+    resumen.vaciar(carrito_id)
+    almacen_carritos.olvidar(carrito_id)
+
+
 async def obtener_detalle_carrito(db: AsyncSession, carrito_id: int): # carrito_id va a venir desde el endpoint
-    query = select(models.CarritoDetalle).options(selectinload(models.CarritoDetalle.carrito)).where(models.CarritoDetalle.cart_id == carrito_id)
+    query = select(models.CarritoDetalle).where(models.CarritoDetalle.cart_id == carrito_id)
     result = await db.execute(query)
     return result.scalars().all()
 
 
+async def obtener_detalle_carrito_con_productos(db: AsyncSession, carrito_id: int):
+    """
+    Devuelve las líneas del carrito junto con los datos actuales de cada producto
+    (nombre, imagen, stock y precio) en un único SELECT con LEFT JOIN, sin importar
+    cuántos ítems tenga el carrito. Si el producto ya no existe, sus columnas vienen en None.
+    """
+    if en_memoria():
+        carrito = await almacen_carritos.cargar(db, carrito_id)
+        lineas = sorted(carrito.lineas.values(), key=lambda linea: linea.id)
+        productos = await obtener_productos_por_ids(db, [linea.product_id for linea in lineas])
+        return [_linea_con_producto(linea, productos.get(linea.product_id)) for linea in lineas]
+
+    query = (
+        select(
+            models.CarritoDetalle.id,
+            models.CarritoDetalle.cart_id,
+            models.CarritoDetalle.product_id,
+            models.CarritoDetalle.quantity,
+            models.CarritoDetalle.price,
+            models.Productos.name.label("product_name"),
+            models.Productos.image_url,
+            models.Productos.stock,
+            models.Productos.price.label("precio_actual"),
+        )
+        .outerjoin(models.Productos, models.Productos.id == models.CarritoDetalle.product_id)
+        .where(models.CarritoDetalle.cart_id == carrito_id)
+        .order_by(models.CarritoDetalle.id)
+    )
+    result = await db.execute(query)
+    return result.all()
+
+
+def _linea_con_producto(linea, producto):
+    return SimpleNamespace(
+        id=linea.id,
+        cart_id=linea.cart_id,
+        product_id=linea.product_id,
+        quantity=linea.quantity,
+        price=linea.price,
+        product_name=producto.name if producto else None,
+        image_url=producto.image_url if producto else None,
+        stock=producto.stock if producto else None,
+        precio_actual=producto.price if producto else None,
+    )
+
+
+def _resolver_operaciones(cantidades: dict, operaciones: List[schemas.OperacionCarritoRequest]) -> None:
+    """Aplica en orden las operaciones sobre `cantidades` (product_id -> cantidad). Lanza ValueError si alguna es inválida."""
+    for operacion in operaciones:
+        actual = cantidades.get(operacion.product_id, 0)
+        if operacion.operacion == schemas.TipoOperacionCarrito.QUITAR:
+            cantidades[operacion.product_id] = 0
+        elif operacion.quantity is None:
+            raise ValueError(f"La operación '{operacion.operacion.value}' sobre el producto {operacion.product_id} requiere quantity.")
+        elif operacion.operacion == schemas.TipoOperacionCarrito.AGREGAR:
+            if operacion.quantity <= 0:
+                raise ValueError("La cantidad a agregar debe ser mayor que cero.")
+            cantidades[operacion.product_id] = actual + operacion.quantity
+        else:
+            if operacion.quantity < 0:
+                raise ValueError("La cantidad no puede ser negativa.")
+            cantidades[operacion.product_id] = operacion.quantity
+
+
+def _validar_stock(cantidades: dict, afectados: set, productos: dict) -> None:
+    for product_id in afectados:
+        cantidad = cantidades[product_id]
+        if cantidad == 0:
+            continue
+        producto = productos.get(product_id)
+        if producto is None:
+            raise ValueError(f"Producto {product_id} no encontrado.")
+        if producto.stock < cantidad:
+            raise ValueError(f"Stock insuficiente para el producto {producto.name}. Stock disponible: {producto.stock}")
+
+
+async def aplicar_operaciones_carrito(db: AsyncSession, cart_id: int, operaciones: List[schemas.OperacionCarritoRequest]):
+    """
+    Aplica un lote de operaciones (agregar / fijar / quitar) sobre el carrito en una sola transacción.
+    Las operaciones se resuelven en orden sobre las cantidades actuales; el stock de todos los
+    productos involucrados se valida con una única consulta y todo se confirma con un solo commit.
+    Si alguna operación es inválida no se aplica ninguna y se lanza ValueError.
+    """
+    afectados = {operacion.product_id for operacion in operaciones}
+    if en_memoria():
+        carrito = await almacen_carritos.cargar(db, cart_id)
+        productos = await obtener_productos_por_ids(db, afectados)
+        # Se resuelve sobre las cantidades leídas después del último await: el lote es atómico en memoria.
+        cantidades = {product_id: linea.quantity for product_id, linea in carrito.lineas.items()}
+        _resolver_operaciones(cantidades, operaciones)
+        _validar_stock(cantidades, afectados, productos)
+        for product_id in afectados:
+            linea = carrito.lineas.get(product_id)
+            precio = linea.price if linea is not None else getattr(productos.get(product_id), "price", 0.0)
+            almacen_carritos.fijar_cantidad(carrito, product_id, cantidades[product_id], precio)
+        return True
+
+    result = await db.execute(select(models.CarritoDetalle).where(models.CarritoDetalle.cart_id == cart_id))
+    lineas = {linea.product_id: linea for linea in result.scalars().all()}
+    cantidades = {product_id: linea.quantity for product_id, linea in lineas.items()}
+    _resolver_operaciones(cantidades, operaciones)
+
+    productos = await obtener_productos_por_ids(db, afectados)
+    _validar_stock(cantidades, afectados, productos)
+
+    for product_id in afectados:
+        cantidad = cantidades[product_id]
+        linea = lineas.get(product_id)
+        if cantidad == 0:
+            if linea is not None:
+                await db.delete(linea)
+                del lineas[product_id]
+        elif linea is not None:
+            linea.quantity = cantidad
+        else:
+            lineas[product_id] = models.CarritoDetalle(cart_id=cart_id, product_id=product_id, quantity=cantidad, price=productos[product_id].price)
+            db.add(lineas[product_id])
+    await _registrar_actividad(db, cart_id)
+    await db.commit()
+
+    resumen.fijar(
+        cart_id,
+        sum(linea.quantity * linea.price for linea in lineas.values()),
+        sum(linea.quantity for linea in lineas.values()),
+        len(lineas),
+    )
+    return True
+
+
 async def obtener_detalle_carrito_por_id(db: AsyncSession, carrito_detalle_id: int):
     """Obtiene un detalle de carrito específico por su ID."""
+    if en_memoria():
+        return await almacen_carritos.obtener_linea(db, carrito_detalle_id)
     query = select(models.CarritoDetalle).where(models.CarritoDetalle.id == carrito_detalle_id)
     result = await db.execute(query)
     return result.scalars().first()
@@ -63,26 +273,82 @@ async def obtener_detalle_carrito_por_id(db: AsyncSession, carrito_detalle_id: i
 
 async def eliminar_item_del_carrito(db: AsyncSession, carrito_detalle: models.CarritoDetalle):
     """Elimina un objeto CarritoDetalle de la base de datos."""
-    await db.delete(carrito_detalle)
-    await db.commit()
+    if en_memoria():
+        carrito = await almacen_carritos.cargar(db, carrito_detalle.cart_id)
+        almacen_carritos.fijar_cantidad(carrito, carrito_detalle.product_id, 0, carrito_detalle.price)
+        return True
+    cart_id, quantity, price = carrito_detalle.cart_id, carrito_detalle.quantity, carrito_detalle.price
+    with resumen.escritura(cart_id):
+        await db.delete(carrito_detalle)
+        await _registrar_actividad(db, cart_id)
+        await db.commit()
+        resumen.aplicar_cambio(cart_id, -quantity * price, -quantity, -1)
     return True 
 
 
 async def actualizar_cantidad_item_carrito(db: AsyncSession, carrito_detalle: models.CarritoDetalle, nueva_cantidad: int, precio_unitario_producto: float):
     """Actualiza la cantidad y el precio total de un item en el carrito."""
-    carrito_detalle.quantity = nueva_cantidad
-    await db.commit()
-    await db.refresh(carrito_detalle)
+    if en_memoria():
+        carrito = await almacen_carritos.cargar(db, carrito_detalle.cart_id)
+        return almacen_carritos.fijar_cantidad(carrito, carrito_detalle.product_id, nueva_cantidad, carrito_detalle.price)
+    cart_id = carrito_detalle.cart_id
+    diferencia = nueva_cantidad - carrito_detalle.quantity
+    with resumen.escritura(cart_id):
+        carrito_detalle.quantity = nueva_cantidad
+        await _registrar_actividad(db, cart_id)
+        await db.commit()
+        await db.refresh(carrito_detalle)
+        resumen.aplicar_cambio(cart_id, diferencia * carrito_detalle.price, diferencia)
     
     result = await db.execute(select(models.CarritoDetalle).options(selectinload(models.CarritoDetalle.carrito), selectinload(models.CarritoDetalle.producto)).where(models.CarritoDetalle.id == carrito_detalle.id))
     return result.scalars().first()
 
 
-async def vaciar_carrito_completo(db: AsyncSession, carrito_id: int):
-    """Elimina todos los CarritoDetalle asociados a un carrito_id."""
-    
-    items_a_eliminar = await db.execute(select(models.CarritoDetalle).where(models.CarritoDetalle.cart_id == carrito_id))
-    for item in items_a_eliminar.scalars().all():
-        await db.delete(item)
-    await db.commit()
-    return True
\ No newline at end of file
+async def vaciar_carrito_completo(db: AsyncSession, carrito_id: int, confirmar: bool = True):
+    """
+    Elimina todos los CarritoDetalle asociados a un carrito_id con un único DELETE.
+    Con confirmar=False no hace commit, para que el vaciado forme parte de la transacción
+    del llamador (checkout); en ese caso el llamador actualiza el resumen tras confirmar.
+    Con el almacén en memoria y confirmar=True solo se vacía la copia en memoria, que se vuelca después.
+    """
+    if en_memoria() and confirmar:
+        almacen_carritos.vaciar(await almacen_carritos.cargar(db, carrito_id))
+        return True
+    await db.execute(delete(models.CarritoDetalle).where(models.CarritoDetalle.cart_id == carrito_id))
+    await _registrar_actividad(db, carrito_id)
+    if confirmar:
+        await db.commit()
+        resumen.vaciar(carrito_id)
+    return True
+
+
+async def compactar_carritos_abandonados(db: AsyncSession, limite_inactividad: datetime, lote: int = 200) -> dict:
+    """
+    Borra los carritos sin actividad desde `limite_inactividad` junto con sus líneas.
+    Trabaja en lotes de `lote` carritos con un commit por lote, así nunca retiene el lock de
+    escritura de SQLite por mucho tiempo. La condición de inactividad se vuelve a evaluar en los
+    DELETE, por si un carrito se usó entre la selección y el borrado.
+    Devuelve cuántos carritos y líneas se eliminaron.
+    """
+    inactivo = func.coalesce(models.Carrito.ultima_actividad, models.Carrito.time_tamptz) < limite_inactividad
+    en_memoria_ahora = almacen_carritos.ids_en_memoria()
+    if en_memoria_ahora:
+        # Su actividad en la base puede estar atrasada hasta el próximo volcado: no se tocan.
+        inactivo = inactivo & models.Carrito.id.not_in(en_memoria_ahora)
+    eliminados = {"carritos": 0, "lineas": 0}
+    while True:
+        ids = (await db.execute(select(models.Carrito.id).where(inactivo).order_by(models.Carrito.id).limit(lote))).scalars().all()
+        if not ids:
+            break
+        carritos_del_lote = select(models.Carrito.id).where(models.Carrito.id.in_(ids), inactivo)
+        result = await db.execute(delete(models.CarritoDetalle).where(models.CarritoDetalle.cart_id.in_(carritos_del_lote)))
+        eliminados["lineas"] += result.rowcount
+        result = await db.execute(delete(models.Carrito).where(models.Carrito.id.in_(ids), inactivo))
+        eliminados["carritos"] += result.rowcount
+        await db.commit()
+        for cart_id in ids:
+            resumen.descartar(cart_id)
+            almacen_carritos.olvidar(cart_id)
+        if len(ids) < lote:
+            break
+    return eliminados
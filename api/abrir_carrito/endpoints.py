@@ -5,6 +5,7 @@ from sqlalchemy.future import select
 from api.core.database import AsyncSessionLocal
 from api.auth.endpoints import get_current_user
 from api.productos import dal as productos_dal
+from api.inventario import dal as inventario_dal
 from api.core import models, dal as core_dal
 from api.core.enum import PedidoStatus, PagoStatus
 from . import dal, schemas 
@@ -29,8 +30,8 @@ async def obtener_o_crear_carrito_usuario(db: AsyncSession = Depends(get_db), cu
 @router.get("/carrito/mi_carrito/total", response_model=schemas.CarritoTotalResponse, summary="Obtener el total del carrito del usuario", description="Obtiene el total del carrito del usuario", tags=["Carrito"])
 async def obtener_total_carrito(db: AsyncSession = Depends(get_db), current_user: models.Usuarios = Depends(get_current_user)):
     carrito = await dal.obtener_o_crear_carrito(db=db, user_id=current_user.id)
-    total = await dal.calcular_total_carrito(db=db, carrito_id=carrito.id)
-    return schemas.CarritoTotalResponse(cart_id=carrito.id, total_price=total)
+    total, cantidad_items, cantidad_lineas = await dal.obtener_resumen_carrito(db=db, carrito_id=carrito.id)
+    return schemas.CarritoTotalResponse(cart_id=carrito.id, total_price=total, cantidad_items=cantidad_items, cantidad_lineas=cantidad_lineas)
 
 
 @router.get("/carrito/mi_carrito/detalles", response_model=list[schemas.CarritoDetalleResponse], summary="Ver todos los items en el carrito del usuario", tags=["Carrito"]) 
@@ -39,24 +40,54 @@ async def ver_items_del_carrito(db: AsyncSession = Depends(get_db), current_user
     if not carrito:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrito no encontrado")
 
-    detalles_db = await dal.obtener_detalle_carrito(db=db, carrito_id=carrito.id)
+    detalles_db = await dal.obtener_detalle_carrito_con_productos(db=db, carrito_id=carrito.id)
 
-    response_detalles = []
-    for detalle in detalles_db:
-        producto = await productos_dal.obtener_producto_por_id(db=db, product_id=detalle.product_id)
+    return [_detalle_con_producto(detalle) for detalle in detalles_db]
 
-        item_con_nombre = {
-            "id": detalle.id,
-            "cart_id": detalle.cart_id,
-            "product_id": detalle.product_id,
-            "quantity": detalle.quantity,
-            "price": detalle.price,
-            "product_name": producto.name if producto else "Nombre no disponible",
-            "image_url": producto.image_url if producto else None #Aca incluyo la URL de la imagen
-        }
-        response_detalles.append(item_con_nombre)
 
-    return response_detalles
+def _detalle_con_producto(detalle) -> dict:
+    """Arma un CarritoDetalleResponse a partir de una fila de obtener_detalle_carrito_con_productos."""
+    return {
+        "id": detalle.id,
+        "cart_id": detalle.cart_id,
+        "product_id": detalle.product_id,
+        "quantity": detalle.quantity,
+        "price": detalle.price,
+        "product_name": detalle.product_name or "Nombre no disponible",
+        "image_url": detalle.image_url #Aca incluyo la URL de la imagen
+    }
+
+
+@router.patch("/carrito/mi_carrito/detalles", response_model=schemas.EstadoCarritoResponse, summary="Aplicar varios cambios al carrito en una sola operación", tags=["Carrito"])
+async def modificar_carrito(cambios: schemas.ModificarCarritoRequest, db: AsyncSession = Depends(get_db), current_user: models.Usuarios = Depends(get_current_user)):
+    """
+    Recibe una lista de operaciones sobre productos del carrito:
+    - agregar: suma `quantity` a lo que ya haya.
+    - fijar: deja exactamente `quantity` (0 lo quita).
+    - quitar: saca el producto.
+
+    Se aplican en orden y todas juntas en una transacción: si alguna falla (stock insuficiente,
+    producto inexistente) no se aplica ninguna. Devuelve el carrito resultante con su total.
+    """
+    if not cambios.operaciones:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No se indicaron operaciones.")
+
+    carrito = await dal.obtener_o_crear_carrito(db=db, user_id=current_user.id)
+    try:
+        await dal.aplicar_operaciones_carrito(db=db, cart_id=carrito.id, operaciones=cambios.operaciones)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    detalles_db = await dal.obtener_detalle_carrito_con_productos(db=db, carrito_id=carrito.id)
+    total, cantidad_items, cantidad_lineas = await dal.obtener_resumen_carrito(db=db, carrito_id=carrito.id)
+    return {
+        "cart_id": carrito.id,
+        "items": [_detalle_con_producto(detalle) for detalle in detalles_db],
+        "total_price": total,
+        "cantidad_items": cantidad_items,
+        "cantidad_lineas": cantidad_lineas,
+    }
 
 @router.post("/carrito/mi_carrito/detalles", response_model=schemas.CarritoDetalleResponse, status_code=status.HTTP_201_CREATED, summary="Agregar un item al carrito (o actualizar la cantidad)", tags=["Carrito"])
 async def agregar_item_al_carrito(
@@ -66,34 +97,23 @@ async def agregar_item_al_carrito(
     if not carrito:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrito no encontrado")
     
+    if item_data.quantity <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La cantidad debe ser mayor que cero.")
+
     producto = await productos_dal.obtener_producto_por_id(db=db, product_id=item_data.product_id)
     if producto is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Producto no encontrado")
-    
-    #Arreglo un bug en el que puedo agregar mas productos al carrito de los que tengo en stock
-    result = await db.execute(select(models.CarritoDetalle).where(models.CarritoDetalle.cart_id == carrito.id, models.CarritoDetalle.product_id == item_data.product_id))
-
-    item_existente = result.scalars().first()
-    
-    cantidad_actual_en_carrito = item_existente.quantity if item_existente else 0
-
-    #Aca hacemos la validacion
-
-    if producto.stock < (cantidad_actual_en_carrito + item_data.quantity):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Stock insuficiente para el producto {producto.name}. Stock disponible: {producto.stock}")
-    
-    #Fin de la validacion y seguimos con la logica
 
+    # El control de stock (incluyendo lo que ya hay en el carrito) se hace dentro del upsert.
     db_carrito_detalle = await dal.agregar_item_al_carrito(
         db=db, 
         cart_id=carrito.id, 
         product_id=item_data.product_id, 
-        quantity=item_data.quantity, 
-        price=producto.price
+        quantity=item_data.quantity
     )
     
     if db_carrito_detalle is None:
-         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error al agregar el item al carrito")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Stock insuficiente para el producto {producto.name}. Stock disponible: {producto.stock}")
 
     # Construimos la respuesta para que coincida con el response_model, incluyendo el nombre del producto.
     return {
@@ -181,23 +201,20 @@ async def crear_preferencia_pago(
 ):
     """
     Simula la creación de una preferencia de pago en una pasarela externa.
-    Valida el carrito y el stock, y si todo está OK, devuelve una URL a una
+    Reserva el stock de todo el carrito por unos minutos (así no se lo lleva otro
+    comprador mientras este paga) y, si todo está OK, devuelve una URL a una
     página de pago simulada.
     """
     carrito = await dal.obtener_o_crear_carrito(db=db, user_id=current_user.id)
-    items_carrito = await dal.obtener_detalle_carrito(db=db, carrito_id=carrito.id)
-
-    if not items_carrito:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El carrito está vacío.")
-
-    for item in items_carrito:
-        producto = await productos_dal.obtener_producto_por_id(db=db, product_id=item.product_id)
-        if not producto or producto.stock < item.quantity:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Stock insuficiente para {producto.name if producto else 'un producto'}.")
+    await dal.volcar_carrito(db=db, carrito_id=carrito.id)
+    try:
+        reservado_hasta = await inventario_dal.reservar_carrito(db=db, user_id=current_user.id, cart_id=carrito.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
     # En un caso real, aquí se interactuaría con la API de MercadoPago/Stripe.
     # Para simular, creamos una URL a una página de pago ficticia.
     # Devolvemos una ruta relativa que el frontend usará para redirigir.
     redirect_url = f"pago_simulado.html?user_id={current_user.id}&address_id={request_data.address_id}"
     
-    return {"redirect_url": redirect_url}
\ No newline at end of file
+    return {"redirect_url": redirect_url, "reservado_hasta": reservado_hasta}
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from api.core.cache import CacheLRU
+
+
+RESUMEN_CARRITO_MAX_ENTRADAS = int(os.environ.get("RESUMEN_CARRITO_MAX_ENTRADAS", "10000"))
+RESUMEN_CARRITO_TTL_SEGUNDOS = float(os.environ.get("RESUMEN_CARRITO_TTL_SEGUNDOS", "600"))
+
+# Resumen por carrito: cart_id -> (version, escrituras_en_curso, (total, cantidad_items, cantidad_lineas)).
+# El DAL del carrito lo ajusta con cada alta, cambio o baja de ítems, así el total
+# se sirve sin recorrer las líneas. Si el resumen no está (o es None), se recalcula con SUM/COUNT.
+# La versión de cada carrito vive en su entrada, así que la caché acota también la memoria
+# de las versiones. Un resumen calculado mientras se escribía el mismo carrito no se guarda:
+# la versión cambió o hay una escritura en curso cuyo cambio todavía no se aplicó.
+_resumenes = CacheLRU(max_entradas=RESUMEN_CARRITO_MAX_ENTRADAS, ttl_segundos=RESUMEN_CARRITO_TTL_SEGUNDOS)
+
+
+def _entrada(cart_id: int):
+    encontrado, entrada = _resumenes.obtener(cart_id)
+    return entrada if encontrado else (0, 0, None)
+
+
+def leer(cart_id: int) -> Tuple[Optional[Tuple[float, int, int]], int]:
+    """Devuelve (resumen o None, versión). La versión se pasa a `guardar` si hubo que calcularlo."""
+    version_actual, _, actual = _entrada(cart_id)
+    return actual, version_actual
+
+
+def guardar(cart_id: int, total: float, cantidad_items: int, cantidad_lineas: int, version_inicial: int) -> None:
+    version_actual, en_curso, _ = _entrada(cart_id)
+    if version_actual == version_inicial and en_curso == 0:
+        _resumenes.guardar(cart_id, (version_actual, 0, (total, cantidad_items, cantidad_lineas)))
+
+
+@contextmanager
+def escritura(cart_id: int) -> Iterator[None]:
+    """
+    Envuelve una escritura que después ajusta el resumen con `aplicar_cambio`. Se abre antes de
+    la sentencia y se cierra después de aplicar el cambio: mientras dura, ninguna lectura guarda
+    su SUM/COUNT, que ya podría incluir el cambio y lo contaría dos veces.
+    """
+    version_actual, en_curso, actual = _entrada(cart_id)
+    _resumenes.guardar(cart_id, (version_actual + 1, en_curso + 1, actual))
+    try:
+        yield
+    finally:
+        version_actual, en_curso, actual = _entrada(cart_id)
+        _resumenes.guardar(cart_id, (version_actual + 1, max(en_curso - 1, 0), actual))
+
+
+def aplicar_cambio(cart_id: int, delta_total: float, delta_items: int, delta_lineas: int = 0) -> None:
+    """
+    Ajusta el resumen de un carrito si está en caché; si no está, se calculará en la próxima lectura.
+    Se llama dentro de `escritura(cart_id)`, después del commit.
+    """
+    version_actual, en_curso, actual = _entrada(cart_id)
+    if actual is None:
+        return
+    total, cantidad_items, cantidad_lineas = actual
+    _resumenes.guardar(cart_id, (version_actual, en_curso, (round(total + delta_total, 2), cantidad_items + delta_items, cantidad_lineas + delta_lineas)))
+
+
+def fijar(cart_id: int, total: float, cantidad_items: int, cantidad_lineas: int) -> None:
+    """Reemplaza el resumen de un carrito por uno ya conocido tras una escritura."""
+    version_actual, en_curso, _ = _entrada(cart_id)
+    _resumenes.guardar(cart_id, (version_actual + 1, en_curso, (round(total, 2), cantidad_items, cantidad_lineas)))
+
+
+def vaciar(cart_id: int) -> None:
+    fijar(cart_id, 0.0, 0, 0)
+
+
+def descartar(cart_id: int) -> None:
+    version_actual, en_curso, _ = _entrada(cart_id)
+    _resumenes.guardar(cart_id, (version_actual + 1, en_curso, None))
+
+
+def estadisticas() -> dict:
+    return _resumenes.estadisticas()
@@ -1,5 +1,6 @@
+import enum
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -16,11 +17,25 @@ class FinalizarCompraRequest(BaseModel):
 class ActualizarCantidadCarritoRequest(BaseModel):
     quantity: int
 
+class TipoOperacionCarrito(str, enum.Enum):
+    AGREGAR = "agregar"  # suma quantity a lo que ya haya en el carrito
+    FIJAR = "fijar"      # deja exactamente quantity (0 quita el ítem)
+    QUITAR = "quitar"    # saca el producto del carrito
+
+class OperacionCarritoRequest(BaseModel):
+    operacion: TipoOperacionCarrito
+    product_id: int
+    quantity: Optional[int] = None
+
+class ModificarCarritoRequest(BaseModel):
+    operaciones: List[OperacionCarritoRequest]
+
 
 # RESPONSE
 
 class PreferenciaPagoResponse(BaseModel):
     redirect_url: str
+    reservado_hasta: Optional[datetime] = None
 
 
 class CarritoResponse(BaseModel):
@@ -34,6 +49,8 @@ class CarritoResponse(BaseModel):
 class CarritoTotalResponse(BaseModel):
     cart_id: int
     total_price: float
+    cantidad_items: int = 0
+    cantidad_lineas: int = 0
 
     class Config:
         orm_mode = True
@@ -50,6 +67,13 @@ class CarritoDetalleResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class EstadoCarritoResponse(BaseModel):
+    cart_id: int
+    items: List[CarritoDetalleResponse]
+    total_price: float
+    cantidad_items: int
+    cantidad_lineas: int
+
 class FinalizarCompraResponse(BaseModel):
     message: str
     order_id: int
@@ -0,0 +1,225 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, literal, true
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from api.core import models
+from api.checkout import schemas
+
+# Analítica de ventas sobre el cubo ventas_cubo (hora x categoría x método de pago) y los
+# contadores por producto de ventas_productos. Cada pedido suma sus filas al crearse, así una
+# consulta de un año lee a lo sumo 8760 horas por combinación de filtros y un ranking de más
+# vendidos recorre un índice, en lugar de recorrer pedidos y sus líneas.
+
+TODAS_LAS_CATEGORIAS = 0
+SIN_METODO_DE_PAGO = 0
+
+# Mismo formato de texto para la hora en todas las escrituras y en los límites de las consultas.
+_FORMATO_HORA = "%Y-%m-%d %H:00:00"
+
+_PERIODOS = {
+    schemas.GranularidadAnalitica.HORA: lambda hora: func.strftime("%Y-%m-%d %H:00", hora),
+    schemas.GranularidadAnalitica.DIA: lambda hora: func.date(hora),
+    # Lunes de la semana: el domingo siguiente (o el mismo día) menos seis días.
+    schemas.GranularidadAnalitica.SEMANA: lambda hora: func.date(hora, "weekday 0", "-6 days"),
+    schemas.GranularidadAnalitica.MES: lambda hora: func.strftime("%Y-%m", hora),
+}
+
+_COLUMNAS_CUBO = ["category_id", "hora", "payment_method_id", "pedidos", "ingresos", "unidades"]
+_COLUMNAS_VENTAS_PRODUCTOS = ["product_id", "unidades", "ingresos", "ultima_venta"]
+
+_CRITERIOS = {
+    schemas.CriterioMasVendidos.UNIDADES: models.VentasProductos.unidades,
+    schemas.CriterioMasVendidos.INGRESOS: models.VentasProductos.ingresos,
+}
+
+
+def _hora_del_pedido():
+    return func.strftime(_FORMATO_HORA, models.Pedidos.date)
+
+
+def _upsert_cubo(filas):
+    nueva_fila = sqlite_insert(models.VentasCubo).from_select(_COLUMNAS_CUBO, filas)
+    return nueva_fila.on_conflict_do_update(
+        index_elements=[models.VentasCubo.category_id, models.VentasCubo.hora, models.VentasCubo.payment_method_id],
+        set_={
+            "pedidos": models.VentasCubo.pedidos + nueva_fila.excluded.pedidos,
+            "ingresos": models.VentasCubo.ingresos + nueva_fila.excluded.ingresos,
+            "unidades": models.VentasCubo.unidades + nueva_fila.excluded.unidades,
+        },
+    )
+
+
+def _filas_del_cubo(por_categoria: bool, metodo_de_pago, pedidos):
+    """SELECT con las filas del cubo para los pedidos que cumplen `pedidos`, por categoría o para el total."""
+    hora = _hora_del_pedido()
+    categoria = models.Productos.category_id if por_categoria else literal(TODAS_LAS_CATEGORIAS)
+    query = (
+        select(
+            categoria,
+            hora,
+            metodo_de_pago,
+            func.count(func.distinct(models.Pedidos.id)),
+            func.sum(models.PedidoDetalle.quantity * models.PedidoDetalle.price),
+            func.sum(models.PedidoDetalle.quantity),
+        )
+        .select_from(models.PedidoDetalle)
+        .join(models.Pedidos, models.Pedidos.id == models.PedidoDetalle.order_id)
+        .where(pedidos, models.Pedidos.date.is_not(None))
+    )
+    if por_categoria:
+        query = query.join(models.Productos, models.Productos.id == models.PedidoDetalle.product_id).where(models.Productos.category_id.is_not(None))
+        return query.group_by(models.Productos.category_id, hora, metodo_de_pago)
+    return query.group_by(hora, metodo_de_pago)
+
+
+async def sumar_pedido_a_analitica(db: AsyncSession, order_id: int, payment_method_id: Optional[int]) -> None:
+    """Suma un pedido ya insertado (con sus líneas) al cubo. No hace commit: va en la transacción del pedido."""
+    metodo = literal(payment_method_id or SIN_METODO_DE_PAGO)
+    for por_categoria in (True, False):
+        await db.execute(_upsert_cubo(_filas_del_cubo(por_categoria, metodo, models.PedidoDetalle.order_id == order_id)))
+
+
+async def reconstruir_analitica(db: AsyncSession) -> int:
+    """Recalcula ventas_cubo desde cero a partir de pedidos, sus líneas y sus pagos. Devuelve la cantidad de filas."""
+    metodo = func.coalesce(
+        select(func.min(models.Pagos.payment_method_id)).where(models.Pagos.order_id == models.Pedidos.id).scalar_subquery(),
+        SIN_METODO_DE_PAGO,
+    )
+    await db.execute(delete(models.VentasCubo))
+    for por_categoria in (True, False):
+        await db.execute(insert(models.VentasCubo).from_select(_COLUMNAS_CUBO, _filas_del_cubo(por_categoria, metodo, true())))
+    await db.commit()
+    return (await db.execute(select(func.count()).select_from(models.VentasCubo))).scalar_one()
+
+
+async def consultar_analitica(
+    db: AsyncSession,
+    granularidad: schemas.GranularidadAnalitica,
+    desde: date,
+    hasta: date,
+    category_id: Optional[int] = None,
+    payment_method_id: Optional[int] = None,
+):
+    """
+    Pedidos, ingresos y unidades por período entre `desde` y `hasta` (inclusive), para una
+    categoría (o todas) y un método de pago (o todos; 0 = sin pago registrado).
+    Devuelve filas (periodo, pedidos, ingresos, unidades) ordenadas por período.
+    """
+    periodo = _PERIODOS[granularidad](models.VentasCubo.hora).label("periodo")
+    inicio = datetime.combine(desde, time.min).strftime(_FORMATO_HORA)
+    fin = datetime.combine(hasta + timedelta(days=1), time.min).strftime(_FORMATO_HORA)
+    query = (
+        select(
+            periodo,
+            func.sum(models.VentasCubo.pedidos).label("pedidos"),
+            func.sum(models.VentasCubo.ingresos).label("ingresos"),
+            func.sum(models.VentasCubo.unidades).label("unidades"),
+        )
+        .where(
+            models.VentasCubo.category_id == (category_id if category_id is not None else TODAS_LAS_CATEGORIAS),
+            models.VentasCubo.hora >= func.datetime(inicio),
+            models.VentasCubo.hora < func.datetime(fin),
+        )
+        .group_by(periodo)
+        .order_by(periodo)
+    )
+    if payment_method_id is not None:
+        query = query.where(models.VentasCubo.payment_method_id == payment_method_id)
+    return (await db.execute(query)).all()
+
+
+def _filas_ventas_productos(pedidos):
+    """SELECT con unidades, ingresos y última venta por producto para los pedidos que cumplen `pedidos`."""
+    return (
+        select(
+            models.PedidoDetalle.product_id,
+            func.sum(models.PedidoDetalle.quantity),
+            func.sum(models.PedidoDetalle.quantity * models.PedidoDetalle.price),
+            func.max(models.Pedidos.date),
+        )
+        .select_from(models.PedidoDetalle)
+        .join(models.Pedidos, models.Pedidos.id == models.PedidoDetalle.order_id)
+        .where(pedidos)
+        .group_by(models.PedidoDetalle.product_id)
+    )
+
+
+async def sumar_pedido_a_ventas_productos(db: AsyncSession, order_id: int) -> None:
+    """Suma las líneas de un pedido ya insertado a los contadores por producto. No hace commit."""
+    nueva_fila = sqlite_insert(models.VentasProductos).from_select(
+        _COLUMNAS_VENTAS_PRODUCTOS, _filas_ventas_productos(models.PedidoDetalle.order_id == order_id)
+    )
+    await db.execute(nueva_fila.on_conflict_do_update(
+        index_elements=[models.VentasProductos.product_id],
+        set_={
+            "unidades": models.VentasProductos.unidades + nueva_fila.excluded.unidades,
+            "ingresos": models.VentasProductos.ingresos + nueva_fila.excluded.ingresos,
+            "ultima_venta": func.coalesce(func.max(models.VentasProductos.ultima_venta, nueva_fila.excluded.ultima_venta), nueva_fila.excluded.ultima_venta),
+        },
+    ))
+
+
+async def reconstruir_ventas_productos(db: AsyncSession) -> int:
+    """Recalcula ventas_productos desde cero a partir de todas las líneas de pedido. Devuelve la cantidad de productos."""
+    await db.execute(delete(models.VentasProductos))
+    await db.execute(insert(models.VentasProductos).from_select(_COLUMNAS_VENTAS_PRODUCTOS, _filas_ventas_productos(true())))
+    await db.commit()
+    return (await db.execute(select(func.count()).select_from(models.VentasProductos))).scalar_one()
+
+
+def _consulta_mas_vendidos(*columnas):
+    return (
+        select(
+            models.Productos.id.label("product_id"),
+            models.Productos.name,
+            models.Productos.marca,
+            models.Productos.category_id,
+            models.VentasProductos.unidades,
+            models.VentasProductos.ingresos,
+            models.VentasProductos.ultima_venta,
+            *columnas,
+        )
+        .join(models.Productos, models.Productos.id == models.VentasProductos.product_id)
+    )
+
+
+async def obtener_mas_vendidos(
+    db: AsyncSession,
+    criterio: schemas.CriterioMasVendidos = schemas.CriterioMasVendidos.UNIDADES,
+    limit: int = 10,
+    category_id: Optional[int] = None,
+):
+    """Los `limit` productos más vendidos por unidades o ingresos, de todo el catálogo o de una categoría."""
+    columna = _CRITERIOS[criterio]
+    query = _consulta_mas_vendidos().order_by(columna.desc(), models.VentasProductos.product_id.desc()).limit(limit)
+    if category_id is not None:
+        query = query.where(models.Productos.category_id == category_id)
+    return (await db.execute(query)).all()
+
+
+async def obtener_mas_vendidos_por_categoria(
+    db: AsyncSession,
+    criterio: schemas.CriterioMasVendidos = schemas.CriterioMasVendidos.UNIDADES,
+    limit: int = 5,
+):
+    """
+    Los `limit` más vendidos de cada categoría en una sola consulta (ROW_NUMBER por categoría).
+    Devuelve filas ordenadas por categoría y posición, con el nombre de la categoría.
+    """
+    columna = _CRITERIOS[criterio]
+    posicion = func.row_number().over(
+        partition_by=models.Productos.category_id,
+        order_by=(columna.desc(), models.VentasProductos.product_id.desc()),
+    ).label("posicion")
+    ranking = _consulta_mas_vendidos(posicion).where(models.Productos.category_id.is_not(None)).subquery()
+    query = (
+        select(ranking, models.Categorias.name.label("categoria"))
+        .join(models.Categorias, models.Categorias.id == ranking.c.category_id)
+        .where(ranking.c.posicion <= limit)
+        .order_by(ranking.c.category_id, ranking.c.posicion)
+    )
+    return (await db.execute(query)).all()
@@ -1,114 +1,228 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload,joinedload
+from sqlalchemy.orm import selectinload
 from api.core import models
+from api.core.paginacion import codificar_cursor, decodificar_cursor, cortar_pagina
 from api.checkout import schemas
-from datetime import datetime, timezone
-from typing import List, Optional
-from api.productos.dal import obtener_producto_por_id
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+from api.productos.dal import propagar_cambios_productos
+from api.productos.sugerencias import indice_sugerencias
 from api.core.enum import PedidoStatus, PagoStatus
-from sqlalchemy import func
+from sqlalchemy import delete, func, insert, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from api.core.dal import obtener_direccion_envio_por_id_y_usuario, obtener_metodo_pago_tipo_por_id
-from api.abrir_carrito.dal import obtener_carrito_por_usuario_id, obtener_detalle_carrito, vaciar_carrito_completo
+from api.abrir_carrito.dal import obtener_carrito_por_usuario_id, obtener_detalle_carrito, vaciar_carrito_completo, volcar_carrito, carrito_convertido_en_pedido
+from api.inventario import dal as inventario_dal
+from api.checkout.analitica import sumar_pedido_a_analitica, sumar_pedido_a_ventas_productos
 
 
-async def procesar_checkout(db: AsyncSession, user_id: int, address_id: int, payment_method_id: int) -> models.Pedidos:
+async def crear_pedido_desde_carrito(
+    db: AsyncSession,
+    carrito_id: int,
+    user_id: int,
+    address_id: int,
+    status: int,
+    payment_method_id: Optional[int] = None,
+    antes_de_confirmar: Optional[Callable[[models.Pedidos], Awaitable[None]]] = None,
+) -> models.Pedidos:
+    """
+    Convierte el carrito en un pedido dentro de una sola transacción: descuenta el stock de todas
+    las líneas con un UPDATE condicional (inventario_dal.descontar_stock_de_carrito), crea el pedido,
+    copia las líneas del carrito a PedidoDetalle con un INSERT ... SELECT, registra el pago
+    (si se indica el método), vacía el carrito con un DELETE masivo y suma el pedido a ventas_diarias.
+    La cantidad de sentencias no depende de cuántas líneas tenga el carrito.
+    `antes_de_confirmar(pedido)` corre justo antes del commit, para que quien llama escriba en la
+    misma transacción lo que no puede quedar separado del pedido (la respuesta idempotente, el
+    trabajo de la cola de pagos).
+    Lanza ValueError si el carrito está vacío o falta stock; en ese caso no se escribe nada.
+    """
+    # Con el almacén de carritos en memoria, las líneas pendientes tienen que estar en la base antes de leerlas.
+    await volcar_carrito(db, carrito_id)
     try:
-        #Obtener el carrito
-        carrito = await obtener_carrito_por_usuario_id(db, user_id)
-        if not carrito: 
-            raise ValueError("El usuario no tiene un carrito activo.")
-        
-        detalles_carrito = await obtener_detalle_carrito(db, carrito.id)
+        detalles_carrito = await obtener_detalle_carrito(db, carrito_id)
         if not detalles_carrito:
             raise ValueError("El carrito esta vacio.")
-        
-
-        #Validar stock y calcular total
-        total_pedido = 0.0
-        productos_a_actualizar = {}
-
-        for item_carrito in detalles_carrito:
-            producto = await obtener_producto_por_id(db, item_carrito.product_id)
-            if not producto or producto.stock < item_carrito.quantity:
-                raise ValueError(f"No hay suficiente stock para el producto: {item_carrito.product_id} ({producto.name if producto else 'Desconocido'})")
-            
-            total_pedido += item_carrito.quantity * item_carrito.price
-            productos_a_actualizar[producto.id] = producto.stock - item_carrito.quantity
-        
+
+        # Descontar stock: valida y resta en la misma sentencia para todas las líneas.
+        # Lo que el propio usuario tiene reservado cuenta como disponible para él.
+        productos_modificados = await inventario_dal.descontar_stock_de_carrito(db, user_id, carrito_id)
+        total_pedido = sum(item_carrito.quantity * item_carrito.price for item_carrito in detalles_carrito)
+
         #Crear pedido
         nuevo_pedido = models.Pedidos(
             user_id=user_id,
             address_id=address_id,
             total=total_pedido,
             date=datetime.now(timezone.utc),
-            status=PedidoStatus.PENDIENTE.value #1 es pendiente
+            status=status
         )
         db.add(nuevo_pedido)
         await db.flush() #Para obtener el ID del pedido antes del commit
 
-        # Transferir items del carrito a PedidoDetalle y actualizar stock
-        for item_carrito in detalles_carrito:
-            nuevo_detalle_pedido = models.PedidoDetalle(
-                order_id=nuevo_pedido.id,
-                product_id=item_carrito.product_id,
-                quantity=item_carrito.quantity,
-                price=item_carrito.price
-            )
-            db.add(nuevo_detalle_pedido)
-
-            # Actualizar stock
-            producto_db = await obtener_producto_por_id(db, item_carrito.product_id)
-            if producto_db:
-                producto_db.stock = productos_a_actualizar[producto_db.id]
-        
-        #Crear registro de pago
-        nuevo_pago = models.Pagos(
-            order_id=nuevo_pedido.id,
-            date=datetime.now(timezone.utc),
-            amount=total_pedido,
-            status=PagoStatus.APROBADO.value, #1 Aprobado
-            payment_method_id=payment_method_id
+        # Transferir items del carrito a PedidoDetalle en una sola sentencia
+        lineas_carrito = select(
+            literal(nuevo_pedido.id),
+            models.CarritoDetalle.product_id,
+            models.CarritoDetalle.quantity,
+            models.CarritoDetalle.price,
+        ).where(models.CarritoDetalle.cart_id == carrito_id)
+        await db.execute(
+            insert(models.PedidoDetalle).from_select(["order_id", "product_id", "quantity", "price"], lineas_carrito)
         )
-        db.add(nuevo_pago)
-        
-        # Vaciar el carrito del usuario
-        await vaciar_carrito_completo(db, carrito.id)
 
+        #Crear registro de pago
+        if payment_method_id is not None:
+            db.add(models.Pagos(
+                order_id=nuevo_pedido.id,
+                date=datetime.now(timezone.utc),
+                amount=total_pedido,
+                status=PagoStatus.APROBADO.value,
+                payment_method_id=payment_method_id
+            ))
+
+        # Las reservas del usuario se consumen: el stock ya se descontó de verdad
+        await inventario_dal.liberar_reservas_de_usuario(db, user_id)
+
+        # Vaciar el carrito del usuario (se confirma junto con el pedido)
+        await vaciar_carrito_completo(db, carrito_id, confirmar=False)
+
+        await sumar_a_ventas_diarias(db, nuevo_pedido.date.date(), total_pedido)
+        await sumar_pedido_a_analitica(db, nuevo_pedido.id, payment_method_id)
+        await sumar_pedido_a_ventas_productos(db, nuevo_pedido.id)
+
+        if antes_de_confirmar is not None:
+            await antes_de_confirmar(nuevo_pedido)
         await db.commit()
-        
-        result = await db.execute(select(models.Pedidos).options(selectinload(models.Pedidos.pedido_detalle), selectinload(models.Pedidos.pagos)).where(models.Pedidos.id == nuevo_pedido.id))
-        return result.scalars().first()
-    except Exception as e:
+    except Exception:
         await db.rollback()
-        raise e
-async def obtener_pedidos_de_usuario(db: AsyncSession, user_id: int, es_admin: bool = False) -> List[models.Pedidos]:
-    """Obtiene todos los pedidos de un usuario específico con la direccion del pedido."""
-    query = select(models.Pedidos).options(
-        joinedload(models.Pedidos.direccion),
-        joinedload(models.Pedidos.detalles)
+        raise
+
+    carrito_convertido_en_pedido(carrito_id)
+    propagar_cambios_productos(productos_modificados)
+    indice_sugerencias.sumar_ventas({item.product_id: item.quantity for item in detalles_carrito})
+    return nuevo_pedido
+
+
+async def procesar_checkout(
+    db: AsyncSession,
+    user_id: int,
+    address_id: int,
+    payment_method_id: int,
+    antes_de_confirmar: Optional[Callable[[models.Pedidos], Awaitable[None]]] = None,
+) -> models.Pedidos:
+    """
+    Crea el pedido desde el carrito del usuario y lo devuelve con sus líneas, productos y pagos.
+    El pedido completo se carga dentro de la transacción, antes del commit, y es el que recibe
+    `antes_de_confirmar`.
+    """
+    #Obtener el carrito
+    carrito = await obtener_carrito_por_usuario_id(db, user_id)
+    if not carrito: 
+        raise ValueError("El usuario no tiene un carrito activo.")
+
+    pedido_completo = None
+
+    async def cargar_pedido_completo(nuevo_pedido: models.Pedidos) -> None:
+        nonlocal pedido_completo
+        result = await db.execute(
+            select(models.Pedidos)
+            .options(selectinload(models.Pedidos.detalles).selectinload(models.PedidoDetalle.producto), selectinload(models.Pedidos.pagos))
+            .where(models.Pedidos.id == nuevo_pedido.id)
+            .execution_options(populate_existing=True)
+        )
+        pedido_completo = result.scalars().first()
+        if antes_de_confirmar is not None:
+            await antes_de_confirmar(pedido_completo)
+
+    await crear_pedido_desde_carrito(
+        db, carrito.id, user_id=user_id, address_id=address_id,
+        status=PedidoStatus.PENDIENTE.value, payment_method_id=payment_method_id,
+        antes_de_confirmar=cargar_pedido_completo,
     )
+    return pedido_completo
 
-    if not es_admin:
+
+async def listar_pedidos_resumen(
+    db: AsyncSession,
+    user_id: Optional[int],
+    estado: Optional[int] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+):
+    """
+    Lista pedidos del más nuevo al más viejo con una proyección liviana (sin direcciones ni
+    líneas): id, fecha, total, estado, usuario y unidades compradas, esta última con una
+    subconsulta sobre pedidoDetalle.order_id. `user_id=None` lista los de todos los usuarios (admin).
+    Pagina por keyset sobre id. Devuelve (filas, siguiente_cursor).
+    """
+    cantidad_items = (
+        select(func.coalesce(func.sum(models.PedidoDetalle.quantity), 0))
+        .where(models.PedidoDetalle.order_id == models.Pedidos.id)
+        .scalar_subquery()
+    )
+    query = select(
+        models.Pedidos.id,
+        models.Pedidos.date,
+        models.Pedidos.total,
+        models.Pedidos.status,
+        models.Pedidos.user_id,
+        cantidad_items.label("cantidad_items"),
+    )
+    if user_id is not None:
         query = query.where(models.Pedidos.user_id == user_id)
+    if estado is not None:
+        query = query.where(models.Pedidos.status == estado)
+    if desde is not None:
+        query = query.where(models.Pedidos.date >= datetime.combine(desde, time.min))
+    if hasta is not None:
+        query = query.where(models.Pedidos.date < datetime.combine(hasta + timedelta(days=1), time.min))
+    if cursor is not None:
+        (ultimo_id,) = decodificar_cursor(cursor, int)
+        query = query.where(models.Pedidos.id < ultimo_id)
+
+    result = await db.execute(query.order_by(models.Pedidos.id.desc()).limit(limit + 1))
+    return cortar_pagina(result.all(), limit, lambda pedido: codificar_cursor(pedido.id))
+
+
+async def sumar_a_ventas_diarias(db: AsyncSession, fecha: date, total: float) -> None:
+    """Suma un pedido al día `fecha` de ventas_diarias con un upsert. No hace commit: va en la transacción del pedido."""
+    nueva_fila = sqlite_insert(models.VentasDiarias).values(fecha=fecha, total=total, pedidos=1)
+    await db.execute(nueva_fila.on_conflict_do_update(
+        index_elements=[models.VentasDiarias.fecha],
+        set_={
+            "total": models.VentasDiarias.total + nueva_fila.excluded.total,
+            "pedidos": models.VentasDiarias.pedidos + nueva_fila.excluded.pedidos,
+        },
+    ))
+
 
-    query = query.order_by(models.Pedidos.id.desc())
+async def reconstruir_ventas_diarias(db: AsyncSession) -> int:
+    """Recalcula ventas_diarias desde cero a partir de pedidos en una transacción. Devuelve cuántos días quedaron."""
+    dia = func.date(models.Pedidos.date)
+    await db.execute(delete(models.VentasDiarias))
+    await db.execute(insert(models.VentasDiarias).from_select(
+        ["fecha", "total", "pedidos"],
+        select(dia, func.coalesce(func.sum(models.Pedidos.total), 0.0), func.count())
+        .where(models.Pedidos.date.is_not(None))
+        .group_by(dia),
+    ))
+    await db.commit()
+    return (await db.execute(select(func.count()).select_from(models.VentasDiarias))).scalar_one()
 
-    result = await db.execute(query)
-    pedidos = result.scalars().unique().all()
-    return pedidos
 
 async def obtener_datos_ventas_por_fecha(db: AsyncSession):
     """
-    Agrega las ventas totales de pedidos por fecha.
+    Total vendido por día, leído de ventas_diarias: una fila por día con ventas,
+    sin recorrer la tabla de pedidos.
     """
     result = await db.execute(
         select(
-            func.date(models.Pedidos.date).label("sale_date"),
-            func.sum(models.Pedidos.total).label("total_sales")
+            models.VentasDiarias.fecha.label("sale_date"),
+            models.VentasDiarias.total.label("total_sales"),
         )
-        # Puedes filtrar por estado si lo necesitas, ej: .where(models.Pedidos.status == 'completado')
-        .group_by(func.date(models.Pedidos.date))
-        .order_by(func.date(models.Pedidos.date).asc())
+        .order_by(models.VentasDiarias.fecha.asc())
     )
     return result.all()
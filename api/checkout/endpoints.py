@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
@@ -6,29 +8,74 @@ from api.core.database import get_db
 from api.auth.endpoints import get_current_user, get_current_admin_user
 from api.productos import dal as productos_dal
 from api.core import models
-from . import dal, schemas
+from api.core.idempotencia import ejecutar_idempotente
+from api.core.paginacion import CABECERA_SIGUIENTE_CURSOR
+from api.core.respuestas import serializar, respuesta_preserializada
+from . import analitica, dal, schemas
 
 router = APIRouter()
 
 @router.post("/checkout", response_model=schemas.PedidoResponse, status_code=status.HTTP_201_CREATED, summary="Finalizar la compra y crear un pedido.")
-async def checkout(checkout_data: schemas.CheckoutRequest, db: AsyncSession = Depends(get_db), current_user: models.Usuarios = Depends(get_current_user)):
+async def checkout(
+    checkout_data: schemas.CheckoutRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.Usuarios = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Con la cabecera `Idempotency-Key`, repetir la request (doble click, reintento del cliente)
+    devuelve el mismo pedido sin volver a procesar el carrito.
+    """
+    async def procesar(guardar_respuesta):
+        respuesta = None
+
+        # La respuesta se arma y se guarda dentro de la transacción del pedido: si el commit
+        # entra, la clave ya tiene su respuesta y un reintento no puede crear otro pedido.
+        async def antes_de_confirmar(pedido: models.Pedidos) -> None:
+            nonlocal respuesta
+            contenido = serializar(schemas.PedidoResponse.model_validate(pedido))
+            respuesta = respuesta_preserializada(contenido, status_code=status.HTTP_201_CREATED)
+            await guardar_respuesta(respuesta)
+
+        try:
+            await dal.procesar_checkout(
+                db=db, user_id=current_user.id, address_id=checkout_data.address_id,
+                payment_method_id=checkout_data.payment_method_id, antes_de_confirmar=antes_de_confirmar,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error al procesar el checkout: {e}")
+        return respuesta
+
+    return await ejecutar_idempotente(db, f"checkout:{current_user.id}", idempotency_key, procesar)
+
+@router.get("/pedidos", response_model=List[schemas.PedidoResumenResponse], summary="Listar pedidos (paginado, con filtros)", tags=["Pedidos"])
+async def obtener_mis_pedidos(
+    response: Response,
+    estado: Optional[int] = Query(None, alias="status", ge=1, le=5),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.Usuarios = Depends(get_current_user),
+):
+    """
+    Devuelve los pedidos del usuario (todos, si es administrador) del más nuevo al más viejo,
+    con un resumen por pedido. Se puede filtrar por estado y por rango de fechas (inclusive).
+    Si hay más, el cursor de la página siguiente viaja en la cabecera X-Next-Cursor.
+    """
     try:
-        nuevo_pedido = await dal.procesar_checkout(db=db, user_id=current_user.id, address_id=checkout_data.address_id, payment_method_id=checkout_data.payment_method_id)
-        return nuevo_pedido
+        pedidos, siguiente_cursor = await dal.listar_pedidos_resumen(
+            db=db, user_id=None if current_user.is_admin else current_user.id,
+            estado=estado, desde=desde, hasta=hasta, limit=limit, cursor=cursor,
+        )
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error al procesar el checkout: {e}")
-
-@router.get("/pedidos",  summary="Obtener todos los pedidos del usuario actual.")
-async def obtener_mis_pedidos(db: AsyncSession = Depends(get_db), current_user: models.Usuarios = Depends(get_current_user)):
-    try:
-        print("pedi")
-        pedidos = await dal.obtener_pedidos_de_usuario(db=db, user_id=current_user.id, es_admin=current_user.is_admin)
-        
-        return pedidos
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error al obtener los pedidos: {e}")
+    if siguiente_cursor:
+        response.headers[CABECERA_SIGUIENTE_CURSOR] = siguiente_cursor
+    return pedidos
 
 
 @router.get("/pedidos/{order_id}", response_model=schemas.PedidoDetalladoResponse, summary="Obtener detalles de un pedido específico", tags=["Pedidos"])
@@ -71,3 +118,66 @@ async def obtener_datos_ventas(
     """
     datos_ventas = await dal.obtener_datos_ventas_por_fecha(db)
     return [schemas.DatosVentas(date=row.sale_date, total_sales=row.total_sales) for row in datos_ventas]
+
+
+@router.get("/pedidos/admin/analitica", response_model=list[schemas.PuntoAnaliticaResponse], summary="Analítica de ventas por hora, día, semana o mes (Admin)", tags=["Admin"])
+async def obtener_analitica_ventas(
+    granularidad: schemas.GranularidadAnalitica = schemas.GranularidadAnalitica.DIA,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    category_id: Optional[int] = Query(None, ge=1),
+    payment_method_id: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_db),
+    current_admin: models.Usuarios = Depends(get_current_admin_user)
+):
+    """
+    Pedidos, ingresos, unidades y ticket promedio por período, leídos del cubo preagregado ventas_cubo.
+    El rango de fechas es inclusive (por defecto, los últimos 30 días) y en UTC. Se puede filtrar por
+    categoría y por método de pago (0 = pedidos sin pago registrado). Con categoría, los ingresos y
+    unidades son solo los de esa categoría y los pedidos, los que la incluyen.
+    """
+    hasta = hasta or datetime.now(timezone.utc).date()
+    desde = desde or hasta - timedelta(days=29)
+    if desde > hasta:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'desde' no puede ser posterior a 'hasta'.")
+    filas = await analitica.consultar_analitica(
+        db, granularidad, desde, hasta, category_id=category_id, payment_method_id=payment_method_id
+    )
+    return [
+        schemas.PuntoAnaliticaResponse(
+            periodo=fila.periodo, pedidos=fila.pedidos, ingresos=round(fila.ingresos, 2), unidades=fila.unidades,
+            ticket_promedio=round(fila.ingresos / fila.pedidos, 2) if fila.pedidos else 0.0,
+        )
+        for fila in filas
+    ]
+
+
+@router.get("/pedidos/admin/mas-vendidos", response_model=list[schemas.ProductoMasVendidoResponse], summary="Productos más vendidos (Admin)", tags=["Admin"])
+async def obtener_mas_vendidos(
+    criterio: schemas.CriterioMasVendidos = schemas.CriterioMasVendidos.UNIDADES,
+    category_id: Optional[int] = Query(None, ge=1),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_admin: models.Usuarios = Depends(get_current_admin_user)
+):
+    """
+    Ranking de productos por unidades vendidas o ingresos, de todo el catálogo o de una categoría.
+    Se lee de los contadores de ventas_productos, sin recorrer las líneas de pedido.
+    """
+    return await analitica.obtener_mas_vendidos(db, criterio=criterio, limit=limit, category_id=category_id)
+
+
+@router.get("/pedidos/admin/mas-vendidos/por-categoria", response_model=list[schemas.CategoriaMasVendidosResponse], summary="Productos más vendidos de cada categoría (Admin)", tags=["Admin"])
+async def obtener_mas_vendidos_por_categoria(
+    criterio: schemas.CriterioMasVendidos = schemas.CriterioMasVendidos.UNIDADES,
+    limit: int = Query(5, ge=1, le=50, description="Productos por categoría"),
+    db: AsyncSession = Depends(get_db),
+    current_admin: models.Usuarios = Depends(get_current_admin_user)
+):
+    """Los `limit` productos más vendidos de cada categoría con ventas, en una sola consulta."""
+    filas = await analitica.obtener_mas_vendidos_por_categoria(db, criterio=criterio, limit=limit)
+    categorias = {}
+    for fila in filas:
+        categoria = categorias.setdefault(fila.category_id, schemas.CategoriaMasVendidosResponse(category_id=fila.category_id, name=fila.categoria, productos=[]))
+        categoria.productos.append(schemas.ProductoMasVendidoResponse.model_validate(fila))
+    return list(categorias.values())
@@ -1,3 +1,4 @@
+import enum
 from pydantic import BaseModel
 from typing import List,Optional
 from datetime import datetime, date
@@ -52,6 +53,21 @@ class PedidoResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class PedidoResumenResponse(BaseModel):
+    """Fila del listado de pedidos. El detalle completo (líneas, pagos) está en /pedidos/{order_id}."""
+    id: int
+    date: datetime
+    total: float
+    status: int
+    user_id: int
+    cantidad_items: int
+
+    class Config:
+        from_attributes = True
+
+
 class ListaPedidosResponse(BaseModel):
     pedidos: List[PedidoResponse]        
 
@@ -61,3 +77,43 @@ PedidoDetalladoResponse = PedidoResponse
 class DatosVentas(BaseModel):
     date: date
     total_sales: float
+
+
+class GranularidadAnalitica(str, enum.Enum):
+    HORA = "hora"
+    DIA = "dia"
+    SEMANA = "semana"
+    MES = "mes"
+
+
+class PuntoAnaliticaResponse(BaseModel):
+    """Un período de la analítica de ventas. `periodo` es la hora, el día, el lunes de la semana o el mes (AAAA-MM)."""
+    periodo: str
+    pedidos: int
+    ingresos: float
+    unidades: int
+    ticket_promedio: float
+
+
+class CriterioMasVendidos(str, enum.Enum):
+    UNIDADES = "unidades"
+    INGRESOS = "ingresos"
+
+
+class ProductoMasVendidoResponse(BaseModel):
+    product_id: int
+    name: str
+    marca: str
+    category_id: Optional[int] = None
+    unidades: int
+    ingresos: float
+    ultima_venta: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class CategoriaMasVendidosResponse(BaseModel):
+    category_id: int
+    name: str
+    productos: List[ProductoMasVendidoResponse]
@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+
+class CacheLRU:
+    """
+    Caché en memoria del proceso con desalojo LRU, límite de entradas y TTL.
+    No es compartida entre workers: cada proceso de uvicorn tiene la suya, por eso
+    el TTL acota cuánto puede quedar desactualizada una entrada que otro proceso cambió.
+    """
+
+    def __init__(self, max_entradas: int, ttl_segundos: float):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.expiraciones = 0
+
+    def obtener(self, clave: Hashable) -> Tuple[bool, Any]:
+        """Devuelve (encontrado, valor). Una entrada vencida cuenta como fallo y se descarta."""
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            self.fallos += 1
+            return False, None
+        vence_en, valor = entrada
+        if vence_en < time.monotonic():
+            del self._entradas[clave]
+            self.expiraciones += 1
+            self.fallos += 1
+            return False, None
+        self._entradas.move_to_end(clave)
+        self.aciertos += 1
+        return True, valor
+
+    def guardar(self, clave: Hashable, valor: Any) -> None:
+        self._entradas[clave] = (time.monotonic() + self.ttl_segundos, valor)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self.desalojos += 1
+
+    def invalidar(self, clave: Hashable) -> None:
+        self._entradas.pop(clave, None)
+
+    def limpiar(self) -> None:
+        self._entradas.clear()
+
+    def estadisticas(self) -> dict:
+        consultas = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._entradas),
+            "max_entradas": self.max_entradas,
+            "ttl_segundos": self.ttl_segundos,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            "desalojos": self.desalojos,
+            "expiraciones": self.expiraciones,
+        }
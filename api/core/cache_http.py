@@ -0,0 +1,34 @@
+from fastapi import Request, Response, status
+
+
+def generar_etag(*partes) -> str:
+    """
+    Arma un ETag fuerte a partir de las versiones que identifican el contenido. Las versiones
+    tienen que salir de la base (no de contadores en memoria): así todos los workers generan
+    el mismo ETag para el mismo contenido y uno distinto en cuanto cambia, escriba quien escriba.
+    """
+    return '"' + "-".join(str(parte) for parte in partes) + '"'
+
+
+def coincide_etag(request: Request, etag: str) -> bool:
+    """Indica si la cabecera If-None-Match del cliente ya contiene `etag`."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match usa comparación débil: se ignora el prefijo W/.
+    candidatos = {valor.strip().removeprefix("W/") for valor in if_none_match.split(",")}
+    return etag in candidatos
+
+
+def respuesta_no_modificada(etag: str, cache_control: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabeceras_cache(etag, cache_control))
+
+
+def cabeceras_cache(etag: str, cache_control: str) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def aplicar_cabeceras_cache(response: Response, etag: str, cache_control: str) -> None:
+    response.headers.update(cabeceras_cache(etag, cache_control))
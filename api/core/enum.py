@@ -10,4 +10,10 @@ class PedidoStatus(enum.Enum):
 class PagoStatus(enum.Enum):
     PENDIENTE = 1
     APROBADO = 2
-    RECHAZADO = 3
\ No newline at end of file
+    RECHAZADO = 3
+
+class TrabajoStatus(enum.Enum):
+    PENDIENTE = 1
+    PROCESANDO = 2
+    COMPLETADO = 3
+    FALLIDO = 4
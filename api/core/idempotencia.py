@@ -0,0 +1,188 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException, Response, status
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from api.core import models
+from api.core.database import AsyncSessionLocal
+
+
+IDEMPOTENCIA_ESPERA_SEGUNDOS = float(os.environ.get("IDEMPOTENCIA_ESPERA_SEGUNDOS", "30"))
+IDEMPOTENCIA_TTL_HORAS = float(os.environ.get("IDEMPOTENCIA_TTL_HORAS", "24"))
+IDEMPOTENCIA_PURGA_INTERVALO_SEGUNDOS = float(os.environ.get("IDEMPOTENCIA_PURGA_INTERVALO_SEGUNDOS", "3600"))
+
+# Claves que este proceso está ejecutando ahora. Un duplicado concurrente espera el evento
+# en lugar de sondear la base; los de otros procesos se ven por la fila pendiente.
+_en_curso: Dict[Tuple[str, str], asyncio.Event] = {}
+
+# Lo que recibe la función protegida para guardar su respuesta dentro de su propia transacción.
+GuardarRespuesta = Callable[[Response], Awaitable[None]]
+
+
+def _respuesta_guardada(fila) -> Response:
+    return Response(content=fila.respuesta, status_code=fila.status_code, media_type="application/json", headers={"Idempotent-Replayed": "true"})
+
+
+async def _buscar(db: AsyncSession, alcance: str, clave: str):
+    result = await db.execute(
+        select(models.ClavesIdempotencia.status_code, models.ClavesIdempotencia.respuesta)
+        .where(models.ClavesIdempotencia.alcance == alcance, models.ClavesIdempotencia.clave == clave)
+    )
+    return result.first()
+
+
+async def _guardar(db: AsyncSession, alcance: str, clave: str, respuesta: Response) -> None:
+    """Escribe la respuesta en la fila de la clave. No hace commit."""
+    await db.execute(
+        update(models.ClavesIdempotencia)
+        .where(models.ClavesIdempotencia.alcance == alcance, models.ClavesIdempotencia.clave == clave)
+        .values(status_code=respuesta.status_code, respuesta=respuesta.body)
+    )
+
+
+async def _no_guardar(respuesta: Response) -> None:
+    pass
+
+
+async def _reclamar(db: AsyncSession, alcance: str, clave: str) -> bool:
+    """
+    Registra la clave como pendiente. Devuelve False si otra request ya la tiene.
+    Una pendiente más vieja que IDEMPOTENCIA_ESPERA_SEGUNDOS (su request murió sin terminar) se retoma.
+    """
+    ahora = datetime.now(timezone.utc)
+    result = await db.execute(
+        sqlite_insert(models.ClavesIdempotencia)
+        .values(alcance=alcance, clave=clave, created_at=ahora)
+        .on_conflict_do_nothing(index_elements=[models.ClavesIdempotencia.alcance, models.ClavesIdempotencia.clave])
+    )
+    if result.rowcount == 0:
+        result = await db.execute(
+            update(models.ClavesIdempotencia)
+            .where(
+                models.ClavesIdempotencia.alcance == alcance,
+                models.ClavesIdempotencia.clave == clave,
+                models.ClavesIdempotencia.status_code.is_(None),
+                models.ClavesIdempotencia.created_at < ahora - timedelta(seconds=IDEMPOTENCIA_ESPERA_SEGUNDOS),
+            )
+            .values(created_at=ahora)
+        )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def _esperar_resultado(db: AsyncSession, alcance: str, clave: str) -> Optional[Response]:
+    """Espera a que termine la request que tiene la clave. Devuelve su respuesta, o None si la clave quedó libre."""
+    limite = time.monotonic() + IDEMPOTENCIA_ESPERA_SEGUNDOS
+    while time.monotonic() < limite:
+        evento = _en_curso.get((alcance, clave))
+        if evento is not None:
+            try:
+                await asyncio.wait_for(evento.wait(), timeout=limite - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+        else:
+            await asyncio.sleep(0.1)
+        fila = await _buscar(db, alcance, clave)
+        if fila is None:
+            return None
+        if fila.status_code is not None:
+            return _respuesta_guardada(fila)
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Hay una solicitud con la misma clave de idempotencia en curso.")
+
+
+async def ejecutar_idempotente(db: AsyncSession, alcance: str, clave: Optional[str], funcion: Callable[[GuardarRespuesta], Awaitable[Response]]) -> Response:
+    """
+    Ejecuta `funcion` una sola vez por (alcance, clave) y guarda su respuesta en claves_idempotencia.
+    Una repetición devuelve la respuesta guardada con una búsqueda por índice, y un duplicado que
+    llega mientras la original corre espera su resultado en lugar de repetir el trabajo.
+
+    `funcion` recibe `guardar_respuesta(respuesta)`. Si confirma algo en la base (un pedido, un
+    pago encolado) tiene que llamarla justo antes de su commit: la respuesta queda guardada en la
+    misma transacción que el efecto, y un reintento nunca lo repite aunque después falle algo.
+    Si no la llama, la respuesta se guarda al terminar con un commit aparte.
+    Se guardan las respuestas 2xx y 4xx (incluidas las HTTPException); ante un 5xx o un error
+    inesperado la clave se libera, salvo que su respuesta ya haya quedado confirmada. Sin clave,
+    solo ejecuta.
+    """
+    if not clave:
+        return await funcion(_no_guardar)
+    clave = str(clave)
+
+    fila = await _buscar(db, alcance, clave)
+    if fila is not None and fila.status_code is not None:
+        return _respuesta_guardada(fila)
+
+    while True:
+        if (alcance, clave) not in _en_curso:
+            evento = asyncio.Event()
+            _en_curso[(alcance, clave)] = evento
+            try:
+                if await _reclamar(db, alcance, clave):
+                    break
+            except Exception:
+                del _en_curso[(alcance, clave)]
+                evento.set()
+                raise
+            del _en_curso[(alcance, clave)]
+            evento.set()
+        respuesta = await _esperar_resultado(db, alcance, clave)
+        if respuesta is not None:
+            return respuesta
+
+    guardada = False
+    guardada_por_funcion = False
+
+    async def guardar_respuesta(respuesta: Response) -> None:
+        nonlocal guardada_por_funcion
+        await _guardar(db, alcance, clave, respuesta)
+        guardada_por_funcion = True
+
+    try:
+        try:
+            respuesta = await funcion(guardar_respuesta)
+        except HTTPException as e:
+            if e.status_code >= 500:
+                raise
+            guardada_por_funcion = False  # Lo que haya escrito se deshizo con el error.
+            respuesta = Response(content=orjson.dumps({"detail": e.detail}), status_code=e.status_code, media_type="application/json", headers=e.headers)
+        if guardada_por_funcion:
+            # `funcion` terminó bien después de guardarla: se confirmó con su transacción.
+            guardada = True
+        elif respuesta.status_code < 500:
+            await _guardar(db, alcance, clave, respuesta)
+            await db.commit()
+            guardada = True
+        return respuesta
+    finally:
+        if not guardada:
+            await db.rollback()
+            # Solo se libera si sigue pendiente: si la respuesta ya se confirmó junto con el
+            # efecto (y lo que falló vino después), borrarla permitiría repetirlo.
+            await db.execute(
+                delete(models.ClavesIdempotencia)
+                .where(
+                    models.ClavesIdempotencia.alcance == alcance,
+                    models.ClavesIdempotencia.clave == clave,
+                    models.ClavesIdempotencia.status_code.is_(None),
+                )
+            )
+            await db.commit()
+        del _en_curso[(alcance, clave)]
+        evento.set()
+
+
+async def purgar_claves_vencidas(horas: float = IDEMPOTENCIA_TTL_HORAS) -> int:
+    """Borra las claves más viejas que `horas`. Corre como tarea periódica desde el lifespan."""
+    limite = datetime.now(timezone.utc) - timedelta(hours=horas)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(delete(models.ClavesIdempotencia).where(models.ClavesIdempotencia.created_at < limite))
+        await db.commit()
+    return result.rowcount
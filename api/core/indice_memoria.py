@@ -0,0 +1,47 @@
+import asyncio
+from abc import ABC, abstractmethod
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class IndiceEnMemoria(ABC):
+    """
+    Base de los índices en memoria del catálogo. Se cargan una vez desde la base (al arrancar,
+    o en la primera consulta) y después se mantienen al día con las notificaciones del DAL.
+
+    Las subclases implementan `_leer(db)`, que consulta la base, y `_construir(datos)`, que arma
+    las estructuras. Las notificaciones que llegan antes de terminar la carga se descartan, pero
+    si llegó alguna mientras se leía la base, la lectura se repite para no perder ese cambio.
+    """
+
+    def __init__(self):
+        self.cargado = False
+        self._lock = asyncio.Lock()
+        self._cambios = 0
+
+    @abstractmethod
+    async def _leer(self, db: AsyncSession):
+        """Consulta la base y devuelve los datos con los que se arma el índice."""
+
+    @abstractmethod
+    def _construir(self, datos) -> None:
+        """Arma las estructuras del índice a partir de lo que devolvió `_leer`."""
+
+    async def asegurar_cargado(self, db: AsyncSession) -> None:
+        if self.cargado:
+            return
+        async with self._lock:
+            if self.cargado:
+                return
+            while True:
+                cambios_iniciales = self._cambios
+                datos = await self._leer(db)
+                if self._cambios == cambios_iniciales:
+                    break
+            self._construir(datos)
+            self.cargado = True
+
+    def _registrar_cambio(self) -> bool:
+        """Anota una escritura. Devuelve True si el índice ya está cargado y hay que aplicarla."""
+        self._cambios += 1
+        return self.cargado
@@ -1,8 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Boolean, Date
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Boolean, Date, Index, LargeBinary
 from sqlalchemy.orm import relationship
+from datetime import datetime, timezone
 from api.core.database import Base
 
 
+def _ahora_utc():
+    return datetime.now(timezone.utc)
+
+
 class Usuarios(Base):
     __tablename__ = "usuarios"
     id = Column(Integer, primary_key=True, index=True) 
@@ -37,6 +42,8 @@ class Carrito(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("usuarios.id"))
     time_tamptz = Column(DateTime)
+    # Última vez que se modificaron las líneas del carrito; la usa la compactación de carritos abandonados.
+    ultima_actividad = Column(DateTime, index=True)
 
     usuario = relationship("Usuarios", back_populates="carrito")
     carrito_detalle = relationship("CarritoDetalle", back_populates="carrito")
@@ -44,6 +51,8 @@ class Carrito(Base):
 
 class CarritoDetalle(Base):
     __tablename__ = "carritoDetalle"
+    # Un producto aparece una sola vez por carrito; agregar de nuevo suma cantidad (upsert).
+    __table_args__ = (Index("ux_carritoDetalle_cart_id_product_id", "cart_id", "product_id", unique=True),)
 
     id = Column(Integer, primary_key=True, index=True)
     quantity = Column(Integer)
@@ -61,32 +70,96 @@ class Productos(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
     description = Column(String)
-    price = Column(Integer)
-    marca = Column(String, nullable=False)
+    price = Column(Integer, index=True)
+    marca = Column(String, nullable=False, index=True)
     stock = Column(Integer)
+    # Unidades retenidas por reservas vigentes (ver ReservasStock). Disponible = stock - stock_reservado.
+    stock_reservado = Column(Integer, nullable=False, default=0, server_default="0")
     image_url = Column(String, nullable=True) # Añadimos la URL de la imagen
-    category_id = Column(Integer, ForeignKey("categorias.id"))
+    category_id = Column(Integer, ForeignKey("categorias.id"), index=True)
+    updated_at = Column(DateTime, default=_ahora_utc, onupdate=_ahora_utc)
+    # Sube con un trigger cuando cambia una columna visible para el cliente; la usa la caché por producto.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     categoria = relationship("Categorias", back_populates="producto")
     carrito_detalle = relationship("CarritoDetalle", back_populates="producto")
     pedido_detalle = relationship("PedidoDetalle", back_populates="producto")
 
 
+class ReservasStock(Base):
+    __tablename__ = "reservas_stock"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class ClavesIdempotencia(Base):
+    __tablename__ = "claves_idempotencia"
+
+    id = Column(Integer, primary_key=True, index=True)
+    alcance = Column(String, nullable=False)
+    clave = Column(String, nullable=False)
+    status_code = Column(Integer)  # NULL mientras la request original está en curso
+    respuesta = Column(LargeBinary)
+    created_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (Index("ux_claves_idempotencia_alcance_clave", "alcance", "clave", unique=True),)
+
+
+class ColaPagos(Base):
+    """Notificaciones de pago confirmadas pendientes de convertirse en pedido (ver api/pagos/cola.py)."""
+    __tablename__ = "cola_pagos"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    address_id = Column(Integer, ForeignKey("direccionesEnvio.id"), nullable=False)
+    event_id = Column(String)
+    status = Column(Integer, nullable=False)
+    intentos = Column(Integer, nullable=False, default=0, server_default="0")
+    disponible_desde = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    processed_at = Column(DateTime)
+    order_id = Column(Integer, ForeignKey("pedidos.id"))
+    ultimo_error = Column(String)
+    tomado_en = Column(DateTime)  # Cuándo lo tomó un trabajador; pasado el plazo, otro puede retomarlo
+
+    __table_args__ = (
+        Index("ix_cola_pagos_status_disponible_desde", "status", "disponible_desde"),
+        Index("ix_cola_pagos_status_tomado_en", "status", "tomado_en"),
+    )
+
+
 class Categorias(Base):
     __tablename__ = "categorias"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
+    updated_at = Column(DateTime, default=_ahora_utc, onupdate=_ahora_utc)
 
     producto = relationship("Productos", back_populates="categoria")
 
 
+class VersionesCatalogo(Base):
+    """
+    Versión de cada parte del catálogo ('productos', 'categorias'). La suben triggers de la base
+    en cada INSERT, UPDATE o DELETE de productos y categorías (ver la migración), así que cambia
+    con cualquier escritura, venga de la API, de otro worker o de un script.
+    """
+    __tablename__ = "versiones_catalogo"
+
+    espacio = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
 class PedidoDetalle(Base):
     __tablename__ = "pedidoDetalle"
     id = Column(Integer, primary_key=True, index=True)
     quantity = Column(Integer)
     price = Column(Float)
-    order_id = Column(Integer, ForeignKey("pedidos.id"))
+    order_id = Column(Integer, ForeignKey("pedidos.id"), index=True)
     product_id = Column(Integer, ForeignKey("productos.id"))
     pedido = relationship("Pedidos", back_populates="detalles")
     producto = relationship("Productos", back_populates="pedido_detalle")
@@ -96,7 +169,7 @@ class Pedidos(Base):
     __tablename__ = "pedidos"
     
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(DateTime)
+    date = Column(DateTime, index=True)
     total = Column(Float)
     status = Column(Integer)
     user_id = Column(Integer, ForeignKey("usuarios.id"))
@@ -107,6 +180,52 @@ class Pedidos(Base):
     direccion = relationship("DireccionesEnvio", back_populates="pedido")
     pagos = relationship("Pagos", back_populates="pedido")
 
+    # Listado de pedidos de un usuario paginado por id sin ordenar en memoria.
+    __table_args__ = (Index("ix_pedidos_user_id_id", "user_id", "id"),)
+
+
+class VentasDiarias(Base):
+    """Total vendido y cantidad de pedidos por día (UTC). Se actualiza en la transacción que crea cada pedido."""
+    __tablename__ = "ventas_diarias"
+
+    fecha = Column(Date, primary_key=True)
+    total = Column(Float, nullable=False, default=0.0)
+    pedidos = Column(Integer, nullable=False, default=0)
+
+
+class VentasCubo(Base):
+    """
+    Ventas preagregadas por hora (UTC) x categoría x método de pago, para la analítica de
+    api/checkout/analitica.py. category_id = 0 acumula el pedido completo (todas las categorías);
+    payment_method_id = 0 son los pedidos sin pago registrado (los del webhook).
+    """
+    __tablename__ = "ventas_cubo"
+
+    category_id = Column(Integer, primary_key=True)
+    hora = Column(DateTime, primary_key=True)
+    payment_method_id = Column(Integer, primary_key=True)
+    pedidos = Column(Integer, nullable=False, default=0)
+    ingresos = Column(Float, nullable=False, default=0.0)
+    unidades = Column(Integer, nullable=False, default=0)
+
+
+class VentasProductos(Base):
+    """
+    Contadores de venta por producto (unidades, ingresos, última venta). Se actualizan en la
+    transacción que crea cada pedido; los índices sirven para los rankings por unidades e ingresos.
+    """
+    __tablename__ = "ventas_productos"
+
+    product_id = Column(Integer, ForeignKey("productos.id"), primary_key=True)
+    unidades = Column(Integer, nullable=False, default=0)
+    ingresos = Column(Float, nullable=False, default=0.0)
+    ultima_venta = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_ventas_productos_unidades", "unidades", "product_id"),
+        Index("ix_ventas_productos_ingresos", "ingresos", "product_id"),
+    )
+
 
 class Pagos(Base):
     __tablename__ = "pagos"
@@ -0,0 +1,48 @@
+import base64
+import json
+from typing import Any, List
+
+
+# Cabecera en la que los endpoints paginados devuelven el cursor de la página siguiente.
+# El cuerpo de la respuesta sigue siendo una lista, así el frontend existente no se rompe.
+CABECERA_SIGUIENTE_CURSOR = "X-Next-Cursor"
+
+
+def codificar_cursor(*valores: Any) -> str:
+    """Codifica los valores de la última fila de una página en un cursor opaco."""
+    crudo = json.dumps(list(valores), separators=(",", ":"))
+    return base64.urlsafe_b64encode(crudo.encode("utf-8")).decode("ascii")
+
+
+def decodificar_cursor(cursor: str, *tipos: type) -> List[Any]:
+    """
+    Decodifica un cursor generado por `codificar_cursor` y valida que traiga exactamente un
+    valor de cada tipo de `tipos`, en orden (un float acepta también enteros).
+    Lanza ValueError si el cursor está malformado o no coincide con los tipos esperados.
+    """
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Cursor inválido.") from e
+    if not isinstance(valores, list) or len(valores) != len(tipos):
+        raise ValueError("Cursor inválido.")
+    return [_validar_valor(valor, tipo) for valor, tipo in zip(valores, tipos)]
+
+
+def _validar_valor(valor: Any, tipo: type) -> Any:
+    # bool es subclase de int: true/false nunca son una clave de orden válida.
+    aceptados = (int, float) if tipo is float else tipo
+    if isinstance(valor, bool) or not isinstance(valor, aceptados):
+        raise ValueError("Cursor inválido.")
+    return float(valor) if tipo is float else valor
+
+
+def cortar_pagina(filas: list, limit: int, cursor_de):
+    """
+    Recibe `limit + 1` filas y devuelve (pagina, siguiente_cursor).
+    `cursor_de` arma el cursor a partir de la última fila de la página.
+    """
+    if len(filas) <= limit:
+        return filas, None
+    pagina = filas[:limit]
+    return pagina, cursor_de(pagina[-1])
@@ -0,0 +1,23 @@
+from typing import Dict, Iterable, Optional
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+
+def serializar(modelo: BaseModel) -> bytes:
+    """Serializa un schema de respuesta a JSON con orjson. Se usa para guardar en caché bytes listos para enviar."""
+    return orjson.dumps(modelo.model_dump(mode="json"))
+
+
+def unir_lista(elementos: Iterable[bytes]) -> bytes:
+    """Arma un arreglo JSON a partir de elementos ya serializados, sin volver a decodificarlos."""
+    return b"[" + b",".join(elementos) + b"]"
+
+
+def respuesta_preserializada(contenido: bytes, cabeceras: Optional[Dict[str, str]] = None, status_code: int = 200) -> Response:
+    """
+    Devuelve bytes JSON tal cual. Al retornar un Response, FastAPI no vuelve a validar
+    contra el response_model ni a codificar: el contenido ya salió de un schema al cachearse.
+    """
+    return Response(content=contenido, status_code=status_code, media_type="application/json", headers=cabeceras)
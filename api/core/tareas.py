@@ -0,0 +1,29 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+async def _repetir(nombre: str, intervalo_segundos: float, funcion: Callable[[], Awaitable]) -> None:
+    while True:
+        try:
+            await funcion()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Un error en una corrida no debe matar la tarea: se registra y se reintenta en el próximo ciclo.
+            logger.exception("Falló la tarea periódica %s", nombre)
+        await asyncio.sleep(intervalo_segundos)
+
+
+def iniciar_tarea_periodica(nombre: str, intervalo_segundos: float, funcion: Callable[[], Awaitable]) -> asyncio.Task:
+    """Ejecuta `funcion()` cada `intervalo_segundos` en segundo plano. Se arranca desde el lifespan de la app."""
+    return asyncio.create_task(_repetir(nombre, intervalo_segundos, funcion), name=nombre)
+
+
+async def detener_tareas(tareas: Iterable[asyncio.Task]) -> None:
+    tareas = list(tareas)
+    for tarea in tareas:
+        tarea.cancel()
+    await asyncio.gather(*tareas, return_exceptions=True)
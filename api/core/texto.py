@@ -0,0 +1,9 @@
+import re
+import unicodedata
+
+
+def normalizar(texto: str) -> str:
+    """Pasa a minúsculas, quita tildes y diacríticos y colapsa los espacios: 'Cañón  ÉPICO' -> 'canon epico'."""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    sin_marcas = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", sin_marcas.lower()).strip()
@@ -0,0 +1,19 @@
+import logging
+import os
+
+from api.core.database import AsyncSessionLocal
+from api.inventario import dal
+
+logger = logging.getLogger(__name__)
+
+RESERVAS_BARRIDO_INTERVALO_SEGUNDOS = float(os.environ.get("RESERVAS_BARRIDO_INTERVALO_SEGUNDOS", "30"))
+RESERVAS_BARRIDO_LOTE = int(os.environ.get("RESERVAS_BARRIDO_LOTE", "500"))
+
+
+async def barrer_reservas_vencidas() -> int:
+    """Una pasada del barrido: libera las reservas de stock vencidas. Corre como tarea periódica."""
+    async with AsyncSessionLocal() as db:
+        liberadas = await dal.liberar_reservas_vencidas(db, lote=RESERVAS_BARRIDO_LOTE)
+    if liberadas:
+        logger.info("Reservas de stock vencidas liberadas: %s", liberadas)
+    return liberadas
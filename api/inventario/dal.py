@@ -0,0 +1,154 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from sqlalchemy import delete, func, literal, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from api.core import models
+
+
+RESERVA_STOCK_MINUTOS = int(os.environ.get("RESERVA_STOCK_MINUTOS", "15"))
+
+
+async def _liberar_reservas(db: AsyncSession, condicion) -> int:
+    """
+    Borra las reservas que cumplen `condicion` y devuelve sus unidades al stock disponible,
+    restando de productos.stock_reservado lo reservado por producto (un UPDATE ... FROM).
+    No hace commit. Devuelve la cantidad de reservas liberadas.
+    """
+    por_producto = (
+        select(models.ReservasStock.product_id, func.sum(models.ReservasStock.quantity).label("cantidad"))
+        .where(condicion)
+        .group_by(models.ReservasStock.product_id)
+        .subquery()
+    )
+    await db.execute(
+        update(models.Productos)
+        .where(models.Productos.id == por_producto.c.product_id)
+        .values(stock_reservado=models.Productos.stock_reservado - por_producto.c.cantidad)
+    )
+    result = await db.execute(delete(models.ReservasStock).where(condicion))
+    return result.rowcount
+
+
+async def reservar_carrito(db: AsyncSession, user_id: int, cart_id: int) -> datetime:
+    """
+    Reserva todas las líneas del carrito por RESERVA_STOCK_MINUTOS, reemplazando las reservas
+    previas del usuario. El descuento del disponible es un UPDATE condicional
+    (stock - stock_reservado >= cantidad) sobre todas las líneas a la vez: si alguna no entra,
+    no se reserva nada y se lanza ValueError. Devuelve el vencimiento de la reserva.
+    """
+    try:
+        await _liberar_reservas(db, models.ReservasStock.user_id == user_id)
+
+        lineas = (
+            select(models.CarritoDetalle.product_id, func.sum(models.CarritoDetalle.quantity).label("quantity"))
+            .where(models.CarritoDetalle.cart_id == cart_id)
+            .group_by(models.CarritoDetalle.product_id)
+            .subquery()
+        )
+        cantidad_lineas = (await db.execute(select(func.count()).select_from(lineas))).scalar_one()
+        if cantidad_lineas == 0:
+            raise ValueError("El carrito está vacío.")
+
+        result = await db.execute(
+            update(models.Productos)
+            .where(
+                models.Productos.id == lineas.c.product_id,
+                models.Productos.stock - models.Productos.stock_reservado >= lineas.c.quantity,
+            )
+            .values(stock_reservado=models.Productos.stock_reservado + lineas.c.quantity)
+        )
+        if result.rowcount != cantidad_lineas:
+            raise ValueError("No hay stock disponible suficiente para reservar todos los productos del carrito.")
+
+        vence = datetime.now(timezone.utc) + timedelta(minutes=RESERVA_STOCK_MINUTOS)
+        await db.execute(
+            insert(models.ReservasStock).from_select(
+                ["user_id", "product_id", "quantity", "expires_at"],
+                select(literal(user_id), lineas.c.product_id, lineas.c.quantity, literal(vence, models.ReservasStock.expires_at.type)),
+            )
+        )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return vence
+
+
+async def descontar_stock_de_carrito(db: AsyncSession, user_id: int, cart_id: int) -> List[models.Productos]:
+    """
+    Descuenta del stock todas las líneas del carrito con un único UPDATE ... FROM condicional:
+    cada producto baja `cantidad` solo si stock - stock_reservado + lo reservado por el propio
+    usuario alcanza. La comparación y la resta ocurren en la misma sentencia, así dos compras
+    concurrentes del mismo producto no pueden vender de más. Si alguna línea no entra
+    (rowcount distinto de la cantidad de productos) se lanza ValueError y el llamador hace
+    rollback: no se descuenta nada. No hace commit. Devuelve los productos actualizados.
+    """
+    reservas = (
+        select(models.ReservasStock.product_id, func.sum(models.ReservasStock.quantity).label("cantidad"))
+        .where(models.ReservasStock.user_id == user_id)
+        .group_by(models.ReservasStock.product_id)
+        .subquery()
+    )
+    lineas = (
+        select(
+            models.CarritoDetalle.product_id,
+            func.sum(models.CarritoDetalle.quantity).label("cantidad"),
+            func.coalesce(func.max(reservas.c.cantidad), 0).label("reservado_propio"),
+        )
+        .outerjoin(reservas, reservas.c.product_id == models.CarritoDetalle.product_id)
+        .where(models.CarritoDetalle.cart_id == cart_id)
+        .group_by(models.CarritoDetalle.product_id)
+        .subquery()
+    )
+    cantidad_productos = (await db.execute(select(func.count()).select_from(lineas))).scalar_one()
+    result = await db.execute(
+        update(models.Productos)
+        .where(
+            models.Productos.id == lineas.c.product_id,
+            models.Productos.stock - models.Productos.stock_reservado + lineas.c.reservado_propio >= lineas.c.cantidad,
+        )
+        .values(stock=models.Productos.stock - lineas.c.cantidad)
+        .returning(models.Productos)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    actualizados = result.scalars().all()
+
+    if len(actualizados) != cantidad_productos:
+        pedidos = (await db.execute(select(lineas.c.product_id))).scalars().all()
+        sin_stock = sorted(set(pedidos) - {producto.id for producto in actualizados})
+        nombres = dict((await db.execute(select(models.Productos.id, models.Productos.name).where(models.Productos.id.in_(sin_stock)))).all())
+        detalle = ", ".join(f"{product_id} ({nombres.get(product_id, 'Desconocido')})" for product_id in sin_stock)
+        raise ValueError(f"No hay suficiente stock para el producto: {detalle}")
+    return actualizados
+
+
+async def liberar_reservas_de_usuario(db: AsyncSession, user_id: int) -> int:
+    """Libera todas las reservas del usuario. No hace commit: se usa dentro de la transacción del pedido."""
+    return await _liberar_reservas(db, models.ReservasStock.user_id == user_id)
+
+
+async def liberar_reservas_vencidas(db: AsyncSession, lote: int = 500) -> int:
+    """
+    Libera las reservas vencidas en lotes de `lote`, con un commit por lote para no retener
+    el lock de escritura de SQLite mientras dura todo el barrido. Devuelve cuántas liberó.
+    """
+    liberadas = 0
+    while True:
+        ahora = datetime.now(timezone.utc)
+        ids = (await db.execute(
+            select(models.ReservasStock.id)
+            .where(models.ReservasStock.expires_at <= ahora)
+            .order_by(models.ReservasStock.expires_at)
+            .limit(lote)
+        )).scalars().all()
+        if not ids:
+            break
+        liberadas += await _liberar_reservas(db, models.ReservasStock.id.in_(ids))
+        await db.commit()
+        if len(ids) < lote:
+            break
+    return liberadas
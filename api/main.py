@@ -1,15 +1,52 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
+from api.core.database import AsyncSessionLocal
+from api.core.tareas import iniciar_tarea_periodica, detener_tareas
 from api.auth import endpoints as auth_endpoints
 from api.productos import endpoints as productos_endpoints
 from api.checkout import endpoints as checkout_endpoints
 from api.metodos_pago import endpoints as metodos_pago_endpoints
 from api.usuarios import endpoints as usuarios_endpoints
 from api.pagos import endpoints as pagos_endpoints
+from api.productos.facetas import indice_facetas
+from api.productos.sugerencias import indice_sugerencias
+from api.productos.trigramas import indice_trigramas
+from api.inventario.barrido import barrer_reservas_vencidas, RESERVAS_BARRIDO_INTERVALO_SEGUNDOS
+from api.abrir_carrito.compactacion import compactar_carritos_abandonados, CARRITOS_COMPACTACION_INTERVALO_SEGUNDOS
+from api.core.idempotencia import purgar_claves_vencidas, IDEMPOTENCIA_PURGA_INTERVALO_SEGUNDOS
+from api.pagos.cola import iniciar_trabajadores as iniciar_trabajadores_pagos
+from api.abrir_carrito.almacen import en_memoria as carritos_en_memoria, volcar_carritos_pendientes, CARRITO_VOLCADO_INTERVALO_SEGUNDOS
 import api.abrir_carrito.endpoints
 
 
-app = FastAPI(title="E-commerce API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Precargamos los índices en memoria del catálogo para que la primera request no pague la carga.
+    async with AsyncSessionLocal() as db:
+        await indice_facetas.asegurar_cargado(db)
+        await indice_sugerencias.asegurar_cargado(db)
+        await indice_trigramas.asegurar_cargado(db)
+
+    tareas = [
+        iniciar_tarea_periodica("reservas_vencidas", RESERVAS_BARRIDO_INTERVALO_SEGUNDOS, barrer_reservas_vencidas),
+        iniciar_tarea_periodica("carritos_abandonados", CARRITOS_COMPACTACION_INTERVALO_SEGUNDOS, compactar_carritos_abandonados),
+        iniciar_tarea_periodica("claves_idempotencia", IDEMPOTENCIA_PURGA_INTERVALO_SEGUNDOS, purgar_claves_vencidas),
+    ]
+    # Pool de trabajadores que convierte en pedidos los pagos encolados por el webhook.
+    tareas += await iniciar_trabajadores_pagos()
+    if carritos_en_memoria():
+        tareas.append(iniciar_tarea_periodica("volcado_carritos", CARRITO_VOLCADO_INTERVALO_SEGUNDOS, volcar_carritos_pendientes))
+    yield
+    await detener_tareas(tareas)
+    if carritos_en_memoria():
+        # Lo que quedó sin volcar se escribe antes de cerrar el proceso.
+        await volcar_carritos_pendientes()
+
+
+# ORJSONResponse codifica las respuestas con orjson en lugar del encoder json de la stdlib.
+app = FastAPI(title="E-commerce API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 
 app.include_router(api.abrir_carrito.endpoints.router)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from api.core.database import AsyncSessionLocal
+from api.core import models
+from api.core.enum import PedidoStatus, TrabajoStatus
+from api.abrir_carrito import dal as carrito_dal
+from api.checkout import dal as checkout_dal
+from api.pagos import dal
+
+logger = logging.getLogger(__name__)
+
+COLA_PAGOS_TRABAJADORES = int(os.environ.get("COLA_PAGOS_TRABAJADORES", "2"))
+COLA_PAGOS_LOTE = int(os.environ.get("COLA_PAGOS_LOTE", "10"))
+COLA_PAGOS_MAX_INTENTOS = int(os.environ.get("COLA_PAGOS_MAX_INTENTOS", "5"))
+COLA_PAGOS_BACKOFF_SEGUNDOS = float(os.environ.get("COLA_PAGOS_BACKOFF_SEGUNDOS", "2"))
+COLA_PAGOS_ESPERA_SEGUNDOS = float(os.environ.get("COLA_PAGOS_ESPERA_SEGUNDOS", "1"))
+COLA_PAGOS_MUESTRAS_LATENCIA = int(os.environ.get("COLA_PAGOS_MUESTRAS_LATENCIA", "500"))
+# Un trabajo en procesando por más de este plazo se da por abandonado (su proceso murió) y otro
+# trabajador, de este o de otro proceso, lo retoma. Tiene que superar con holgura lo que tarda un pedido.
+COLA_PAGOS_PLAZO_SEGUNDOS = float(os.environ.get("COLA_PAGOS_PLAZO_SEGUNDOS", "60"))
+
+# El webhook lo activa al encolar para que un trabajador ocioso no espere al próximo sondeo.
+_hay_trabajo = asyncio.Event()
+
+
+def avisar_trabajo_nuevo() -> None:
+    _hay_trabajo.set()
+
+
+async def procesar_trabajo(trabajo) -> None:
+    """
+    Convierte una notificación de pago en pedido. El trabajo se marca completado dentro de la
+    transacción del pedido: o quedan los dos, o ninguno. Los errores de negocio (dirección
+    inexistente, carrito vacío, stock insuficiente) dejan el trabajo fallido: reintentar no cambia
+    el resultado. Cualquier otro error (por ejemplo, la base bloqueada) se reintenta con backoff
+    exponencial hasta COLA_PAGOS_MAX_INTENTOS.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            direccion = await db.get(models.DireccionesEnvio, trabajo.address_id)
+            if direccion is None:
+                raise ValueError("Dirección no encontrada.")
+            carrito = await carrito_dal.obtener_o_crear_carrito(db=db, user_id=trabajo.user_id)
+            await checkout_dal.crear_pedido_desde_carrito(
+                db, carrito.id, user_id=trabajo.user_id, address_id=direccion.id,
+                status=PedidoStatus.COMPLETADO.value, # El pedido ya está pagado
+                antes_de_confirmar=lambda pedido: dal.marcar_completado(db, trabajo, pedido.id),
+            )
+        except dal.TrabajoPerdido as e:
+            await db.rollback()
+            logger.warning("Pago %s: %s", trabajo.id, e)
+        except ValueError as e:
+            await db.rollback()
+            logger.warning("Pago %s descartado: %s", trabajo.id, e)
+            await dal.registrar_fallo(db, trabajo, str(e))
+        except Exception as e:
+            await db.rollback()
+            if trabajo.intentos >= COLA_PAGOS_MAX_INTENTOS:
+                logger.exception("Pago %s fallido tras %s intentos", trabajo.id, trabajo.intentos)
+                await dal.registrar_fallo(db, trabajo, str(e))
+            else:
+                espera = COLA_PAGOS_BACKOFF_SEGUNDOS * 2 ** (trabajo.intentos - 1)
+                logger.warning("Pago %s: intento %s falló (%s), se reintenta en %.1fs", trabajo.id, trabajo.intentos, e, espera)
+                await dal.registrar_fallo(db, trabajo, str(e), reintentar_desde=datetime.now(timezone.utc) + timedelta(seconds=espera))
+
+
+async def _trabajador() -> None:
+    while True:
+        try:
+            _hay_trabajo.clear()
+            async with AsyncSessionLocal() as db:
+                lote = await dal.tomar_lote(db, COLA_PAGOS_LOTE, timedelta(seconds=COLA_PAGOS_PLAZO_SEGUNDOS))
+            for trabajo in lote:
+                await procesar_trabajo(trabajo)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Falló un ciclo del trabajador de la cola de pagos")
+            lote = []
+        if not lote:
+            try:
+                await asyncio.wait_for(_hay_trabajo.wait(), timeout=COLA_PAGOS_ESPERA_SEGUNDOS)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def iniciar_trabajadores(cantidad: int = COLA_PAGOS_TRABAJADORES) -> List[asyncio.Task]:
+    """
+    Arranca el pool de trabajadores de la cola de pagos desde el lifespan. Lo que una ejecución
+    anterior dejó a medio procesar se retoma solo cuando vence su plazo (COLA_PAGOS_PLAZO_SEGUNDOS),
+    así un worker que arranca no le quita trabajos a otro que sigue vivo.
+    """
+    return [asyncio.create_task(_trabajador(), name=f"cola_pagos_{numero}") for numero in range(cantidad)]
+
+
+async def obtener_estadisticas() -> dict:
+    async with AsyncSessionLocal() as db:
+        estado = await dal.obtener_estado_cola(db, COLA_PAGOS_MUESTRAS_LATENCIA)
+    latencias = sorted(estado["latencias"])
+
+    def percentil(p: float):
+        if not latencias:
+            return None
+        return round(latencias[min(len(latencias) - 1, int(p * len(latencias)))] * 1000, 1)
+
+    pendiente_mas_viejo = estado["pendiente_mas_viejo"]
+    return {
+        "trabajadores": COLA_PAGOS_TRABAJADORES,
+        "pendientes": estado["por_estado"][TrabajoStatus.PENDIENTE],
+        "procesando": estado["por_estado"][TrabajoStatus.PROCESANDO],
+        "completados": estado["por_estado"][TrabajoStatus.COMPLETADO],
+        "fallidos": estado["por_estado"][TrabajoStatus.FALLIDO],
+        "espera_pendiente_mas_viejo_segundos": (
+            round((datetime.now(timezone.utc) - pendiente_mas_viejo.replace(tzinfo=timezone.utc)).total_seconds(), 1)
+            if pendiente_mas_viejo else None
+        ),
+        "latencia_p50_ms": percentil(0.5),
+        "latencia_p95_ms": percentil(0.95),
+        "latencia_max_ms": percentil(1.0),
+        "muestras_latencia": len(latencias),
+    }
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from api.core import models
+from api.core.enum import TrabajoStatus
+
+
+async def encolar_pago(
+    db: AsyncSession,
+    user_id: int,
+    address_id: int,
+    event_id: Optional[str] = None,
+    antes_de_confirmar: Optional[Callable[[models.ColaPagos], Awaitable[None]]] = None,
+) -> models.ColaPagos:
+    """
+    Guarda la notificación de pago en cola_pagos y confirma; a partir de acá el pedido no se pierde.
+    `antes_de_confirmar(trabajo)` corre con el id ya asignado, en la misma transacción.
+    """
+    ahora = datetime.now(timezone.utc)
+    trabajo = models.ColaPagos(
+        user_id=user_id,
+        address_id=address_id,
+        event_id=event_id,
+        status=TrabajoStatus.PENDIENTE.value,
+        intentos=0,
+        disponible_desde=ahora,
+        created_at=ahora,
+    )
+    db.add(trabajo)
+    if antes_de_confirmar is not None:
+        await db.flush()
+        await antes_de_confirmar(trabajo)
+    await db.commit()
+    return trabajo
+
+
+class TrabajoPerdido(Exception):
+    """El plazo del trabajo venció y otro trabajador lo retomó: el que lo tenía no debe tocarlo más."""
+
+
+def _es_del_trabajador(trabajo):
+    """Condición que fija el trabajo a quien lo tomó: el mismo id en procesando y con el mismo tomado_en."""
+    return (
+        models.ColaPagos.id == trabajo.id,
+        models.ColaPagos.status == TrabajoStatus.PROCESANDO.value,
+        models.ColaPagos.tomado_en == trabajo.tomado_en,
+    )
+
+
+async def tomar_lote(db: AsyncSession, limite: int, plazo: timedelta):
+    """
+    Reclama hasta `limite` trabajos con un único UPDATE ... RETURNING, así dos trabajadores nunca
+    toman el mismo: los pendientes ya disponibles y los que quedaron en procesando más de `plazo`
+    (su trabajador o su proceso murió). Marca tomado_en, suma un intento a cada uno y confirma.
+    """
+    ahora = datetime.now(timezone.utc)
+    disponible = and_(models.ColaPagos.status == TrabajoStatus.PENDIENTE.value, models.ColaPagos.disponible_desde <= ahora)
+    vencido = and_(models.ColaPagos.status == TrabajoStatus.PROCESANDO.value, models.ColaPagos.tomado_en < ahora - plazo)
+    disponibles = (
+        select(models.ColaPagos.id)
+        .where(or_(disponible, vencido))
+        .order_by(models.ColaPagos.id)
+        .limit(limite)
+    )
+    result = await db.execute(
+        update(models.ColaPagos)
+        .where(models.ColaPagos.id.in_(disponibles.scalar_subquery()), or_(disponible, vencido))
+        .values(status=TrabajoStatus.PROCESANDO.value, tomado_en=ahora, intentos=models.ColaPagos.intentos + 1)
+        .returning(models.ColaPagos.id, models.ColaPagos.user_id, models.ColaPagos.address_id, models.ColaPagos.intentos, models.ColaPagos.tomado_en)
+    )
+    lote = sorted(result.all(), key=lambda trabajo: trabajo.id)
+    await db.commit()
+    return lote
+
+
+async def marcar_completado(db: AsyncSession, trabajo, order_id: int) -> None:
+    """
+    Marca el trabajo completado con su pedido. No hace commit: se llama dentro de la transacción
+    que crea el pedido, así no puede quedar un pedido creado con su trabajo en procesando.
+    Lanza TrabajoPerdido si otro trabajador lo retomó, y eso deshace también el pedido.
+    """
+    result = await db.execute(
+        update(models.ColaPagos)
+        .where(*_es_del_trabajador(trabajo))
+        .values(status=TrabajoStatus.COMPLETADO.value, order_id=order_id, processed_at=datetime.now(timezone.utc), ultimo_error=None)
+    )
+    if result.rowcount != 1:
+        raise TrabajoPerdido(f"El trabajo {trabajo.id} fue retomado por otro trabajador.")
+
+
+async def registrar_fallo(db: AsyncSession, trabajo, error: str, reintentar_desde: Optional[datetime] = None) -> None:
+    """
+    Vuelve el trabajo a pendiente para reintentarlo desde `reintentar_desde`, o lo deja fallido si
+    no se indica. No toca un trabajo que ya retomó otro trabajador.
+    """
+    if reintentar_desde is None:
+        valores = {"status": TrabajoStatus.FALLIDO.value, "processed_at": datetime.now(timezone.utc)}
+    else:
+        valores = {"status": TrabajoStatus.PENDIENTE.value, "disponible_desde": reintentar_desde}
+    await db.execute(update(models.ColaPagos).where(*_es_del_trabajador(trabajo)).values(ultimo_error=error[:500], **valores))
+    await db.commit()
+
+
+async def obtener_estado_cola(db: AsyncSession, muestras: int) -> dict:
+    """
+    Profundidad de la cola (trabajos por estado y antigüedad del pendiente más viejo) y las
+    latencias, en segundos, desde que se encoló hasta que quedó procesado, de los últimos
+    `muestras` trabajos completados.
+    """
+    por_estado = dict((await db.execute(
+        select(models.ColaPagos.status, func.count()).group_by(models.ColaPagos.status)
+    )).all())
+    pendiente_mas_viejo = (await db.execute(
+        select(func.min(models.ColaPagos.created_at)).where(models.ColaPagos.status == TrabajoStatus.PENDIENTE.value)
+    )).scalar()
+    latencias: List[float] = (await db.execute(
+        select((func.julianday(models.ColaPagos.processed_at) - func.julianday(models.ColaPagos.created_at)) * 86400.0)
+        .where(models.ColaPagos.status == TrabajoStatus.COMPLETADO.value)
+        .order_by(models.ColaPagos.id.desc())
+        .limit(muestras)
+    )).scalars().all()
+    return {
+        "por_estado": {estado: por_estado.get(estado.value, 0) for estado in TrabajoStatus},
+        "pendiente_mas_viejo": pendiente_mas_viejo,
+        "latencias": latencias,
+    }
@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime, timezone
 
+from fastapi.responses import ORJSONResponse
 from api.core.database import AsyncSessionLocal
 from api.core import models
-from api.abrir_carrito import dal as carrito_dal
-from api.productos import dal as productos_dal
-from api.core.enum import PedidoStatus, PagoStatus
+from api.core.idempotencia import GuardarRespuesta, ejecutar_idempotente
+from api.auth.endpoints import get_current_admin_user
+from api.pagos import cola, dal, schemas
 
 router = APIRouter()
 
@@ -14,69 +14,45 @@ async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
 
-@router.post("/pagos/webhook", status_code=status.HTTP_200_OK, summary="Webhook para confirmación de pago", tags=["Pagos"])
+@router.post("/pagos/webhook", status_code=status.HTTP_200_OK, response_model=schemas.EncolarPagoResponse, summary="Webhook para confirmación de pago", tags=["Pagos"])
 async def webhook_confirmacion_pago(request: Request, db: AsyncSession = Depends(get_db)):
     """
     Endpoint que simula la recepción de una notificación de una pasarela de pagos.
-    Aquí se procesa la orden, se descuenta el stock y se vacía el carrito.
+    La notificación se guarda en la cola de pagos y se responde enseguida; los trabajadores
+    de api/pagos/cola.py crean el pedido, descuentan el stock y vacían el carrito.
     """
     data = await request.json()
     user_id = data.get("user_id")
     
     if not user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Falta el user_id en la notificación.")
+    if not data.get("address_id"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Falta el address_id en la notificación.")
 
-    # --- INICIO DE LA LÓGICA QUE ANTES ESTABA EN "finalizar_compra" ---
+    # Las pasarelas reintentan las notificaciones: con el id del evento (o la cabecera
+    # Idempotency-Key) un reintento devuelve la respuesta original sin volver a encolar el pago.
+    clave = request.headers.get("Idempotency-Key") or data.get("event_id")
+    return await ejecutar_idempotente(db, "webhook", clave, lambda guardar_respuesta: _encolar_pago_confirmado(db, data, user_id, guardar_respuesta))
 
-    # 1. Obtener carrito y sus items
-    carrito = await carrito_dal.obtener_o_crear_carrito(db=db, user_id=user_id)
-    if not carrito:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrito no encontrado para el usuario.")
-        
-    items_carrito = await carrito_dal.obtener_detalle_carrito(db=db, carrito_id=carrito.id)
-    if not items_carrito:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El carrito está vacío.")
 
-    # 2. Validar stock y calcular total
-    total_pedido = 0
-    for item in items_carrito:
-        producto = await productos_dal.obtener_producto_por_id(db=db, product_id=item.product_id)
-        if not producto or producto.stock < item.quantity:
-            # En un caso real, se manejaría este error de forma más elegante.
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Stock insuficiente para {producto.name if producto else 'un producto'}.")
-        total_pedido += item.price * item.quantity
-
-    # 3. Crear el Pedido
-    try:
-        # Asumimos que la dirección y método de pago se guardaron temporalmente o se obtienen de otra forma.
-        # Para esta simulación, tomamos la primera dirección del usuario.
-        direccion = await db.get(models.DireccionesEnvio, data.get("address_id"))
-        if not direccion:
-             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dirección no encontrada.")
-
-        nuevo_pedido = models.Pedidos(
-            user_id=user_id,
-            date=datetime.now(timezone.utc),
-            total=total_pedido,
-            status=PedidoStatus.COMPLETADO.value, # El pedido ya está pagado
-            address_id=direccion.id
-        )
-        db.add(nuevo_pedido)
-        await db.flush()
+async def _encolar_pago_confirmado(db: AsyncSession, data: dict, user_id: int, guardar_respuesta: GuardarRespuesta) -> ORJSONResponse:
+    """
+    Guarda el pago confirmado en la cola y despierta a un trabajador. La respuesta idempotente
+    se guarda en la misma transacción que el trabajo encolado.
+    """
+    respuesta = None
 
-        # 4. Crear detalles del pedido y **actualizar stock**
-        for item in items_carrito:
-            db.add(models.PedidoDetalle(order_id=nuevo_pedido.id, product_id=item.product_id, quantity=item.quantity, price=item.price))
-            producto = await productos_dal.obtener_producto_por_id(db, item.product_id)
-            producto.stock -= item.quantity
+    async def antes_de_confirmar(trabajo: models.ColaPagos) -> None:
+        nonlocal respuesta
+        respuesta = ORJSONResponse({"status": "ok", "message": "Pago recibido. El pedido se procesa en segundo plano.", "trabajo_id": trabajo.id})
+        await guardar_respuesta(respuesta)
 
-        # 5. Vaciar el carrito
-        await carrito_dal.vaciar_carrito_completo(db, carrito.id)
-        
-        await db.commit()
+    await dal.encolar_pago(db, user_id=user_id, address_id=data["address_id"], event_id=data.get("event_id"), antes_de_confirmar=antes_de_confirmar)
+    cola.avisar_trabajo_nuevo()
+    return respuesta
 
-    except Exception as e:
-        await db.rollback()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error al crear el pedido: {str(e)}")
 
-    return {"status": "ok", "message": "Pedido procesado correctamente."}
\ No newline at end of file
+@router.get("/pagos/admin/cola", response_model=schemas.EstadoColaPagosResponse, summary="Estado de la cola de pagos (Admin)", tags=["Admin"])
+async def estado_cola_pagos(current_admin: models.Usuarios = Depends(get_current_admin_user)):
+    """Profundidad de la cola por estado y latencia de procesamiento (encolado -> pedido creado) de los últimos pagos."""
+    return await cola.obtener_estadisticas()
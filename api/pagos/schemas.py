@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class EncolarPagoResponse(BaseModel):
+    status: str
+    message: str
+    trabajo_id: int
+
+
+class EstadoColaPagosResponse(BaseModel):
+    trabajadores: int
+    pendientes: int
+    procesando: int
+    completados: int
+    fallidos: int
+    espera_pendiente_mas_viejo_segundos: Optional[float] = None
+    latencia_p50_ms: Optional[float] = None
+    latencia_p95_ms: Optional[float] = None
+    latencia_max_ms: Optional[float] = None
+    muestras_latencia: int
@@ -0,0 +1,110 @@
+import os
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from api.core import models
+from api.core.cache import CacheLRU
+
+
+CACHE_CATALOGO_MAX_ENTRADAS = int(os.environ.get("CACHE_CATALOGO_MAX_ENTRADAS", "2000"))
+CACHE_CATALOGO_TTL_SEGUNDOS = float(os.environ.get("CACHE_CATALOGO_TTL_SEGUNDOS", "300"))
+
+cache_catalogo = CacheLRU(max_entradas=CACHE_CATALOGO_MAX_ENTRADAS, ttl_segundos=CACHE_CATALOGO_TTL_SEGUNDOS)
+
+# Escrituras de este proceso en cada espacio. `cacheado` no guarda lo calculado si hubo una
+# mientras calculaba. Lo que invalida de verdad es la versión de la base: la del espacio
+# (versiones_en_base) va en las claves de listados y categorías, y la de cada fila
+# (productos.version) se guarda junto a cada producto, así editar uno no invalida los demás.
+_versiones = {"productos": 0, "categorias": 0}
+
+
+async def versiones_en_base(db: AsyncSession, *espacios: str) -> Tuple[int, ...]:
+    """
+    Versión de cada espacio según la tabla versiones_catalogo, en el orden pedido. La suben
+    triggers en cada INSERT, UPDATE o DELETE de productos y categorías, así que también refleja
+    lo que escriben otros workers o los scripts. Se usa para el ETag y en las claves de caché.
+    """
+    result = await db.execute(
+        select(models.VersionesCatalogo.espacio, models.VersionesCatalogo.version)
+        .where(models.VersionesCatalogo.espacio.in_(espacios))
+    )
+    versiones = dict(result.all())
+    return tuple(versiones.get(espacio, 0) for espacio in espacios)
+
+
+async def versiones_de_productos(db: AsyncSession, product_ids: Iterable[int]) -> Dict[int, int]:
+    """Versión de fila de cada producto (productos.version) con un solo SELECT. Los inexistentes no aparecen."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    result = await db.execute(select(models.Productos.id, models.Productos.version).where(models.Productos.id.in_(product_ids)))
+    return dict(result.all())
+
+
+def _clave_producto(product_id: int) -> Tuple[str, int]:
+    return ("producto", product_id)
+
+
+async def cacheado(espacio: str, clave: Hashable, calcular: Callable[[], Awaitable]):
+    """
+    Devuelve el valor cacheado para `clave` o lo calcula con `calcular()`.
+    Si hubo una escritura en el espacio mientras se calculaba, el resultado no se guarda
+    para no volver a cachear un dato que pudo haber quedado viejo. Tampoco se cachea None
+    (un producto inexistente podría crearse después con ese id).
+    """
+    encontrado, valor = cache_catalogo.obtener(clave)
+    if encontrado:
+        return valor
+    version_inicial = _versiones[espacio]
+    valor = await calcular()
+    if valor is not None and _versiones[espacio] == version_inicial:
+        cache_catalogo.guardar(clave, valor)
+    return valor
+
+
+async def productos_cacheados(versiones: Dict[int, int], calcular_faltantes: Callable[[List[int]], Awaitable[Dict]]) -> Dict:
+    """
+    Devuelve {product_id: valor} para los productos de `versiones` ({product_id: versión de fila}).
+    Cada producto se guarda con su versión; si la de la base ya es otra, se recalcula. Los que
+    faltan se resuelven todos juntos con `calcular_faltantes(ids)`, que devuelve {id: valor}.
+    Como la versión se lee antes de calcular, lo guardado nunca es más viejo que su versión.
+    """
+    valores = {}
+    faltantes = []
+    for product_id, version in versiones.items():
+        encontrado, entrada = cache_catalogo.obtener(_clave_producto(product_id))
+        if encontrado and entrada[0] == version:
+            valores[product_id] = entrada[1]
+        else:
+            faltantes.append(product_id)
+    if faltantes:
+        calculados = await calcular_faltantes(faltantes)
+        for product_id, valor in calculados.items():
+            cache_catalogo.guardar(_clave_producto(product_id), (versiones[product_id], valor))
+        valores.update(calculados)
+    return valores
+
+
+def invalidar_productos(product_ids: Iterable[int]) -> None:
+    """
+    Registra una escritura de esos productos en este proceso: saca sus entradas de la caché y
+    anota la escritura para los listados, cuyas claves ya cambiaron con la versión de la base.
+    Las entradas de los demás productos siguen valiendo.
+    """
+    for product_id in product_ids:
+        cache_catalogo.invalidar(_clave_producto(product_id))
+    _versiones["productos"] += 1
+
+
+def invalidar_listados_productos() -> None:
+    _versiones["productos"] += 1
+
+
+def invalidar_categorias() -> None:
+    _versiones["categorias"] += 1
+
+
+def estadisticas() -> dict:
+    return {**cache_catalogo.estadisticas(), "versiones": dict(_versiones)}
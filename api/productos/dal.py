@@ -1,10 +1,35 @@
+import re
+from bisect import bisect_right
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 from api.core import models
-from typing import Optional
-from api.productos import schemas
-from sqlalchemy import or_
+from api.core.paginacion import codificar_cursor, decodificar_cursor, cortar_pagina
+from typing import Dict, Iterable, Optional
+from api.productos import schemas, cache
+from api.productos.facetas import indice_facetas
+from api.productos.sugerencias import indice_sugerencias
+from api.productos.trigramas import indice_trigramas
+from sqlalchemy import or_, and_, text, tuple_, func, Integer, Float
+
+
+def propagar_cambios_productos(productos: Iterable[models.Productos]) -> None:
+    """
+    Refleja productos ya confirmados en la base en la caché del catálogo y en los índices en memoria.
+    Se llama desde este módulo y desde los flujos que tocan el stock (checkout, webhook de pagos).
+    """
+    productos = list(productos)
+    cache.invalidar_productos(producto.id for producto in productos)
+    for producto in productos:
+        indice_facetas.actualizar(producto)
+        indice_sugerencias.actualizar(producto)
+        indice_trigramas.actualizar(producto)
+
+
+def propagar_baja_producto(product_id: int) -> None:
+    cache.invalidar_productos([product_id])
+    indice_facetas.eliminar(product_id)
+    indice_sugerencias.eliminar(product_id)
+    indice_trigramas.eliminar(product_id)
 
 
 async def crear_producto(db: AsyncSession, producto: schemas.ProductoCreateRequest):
@@ -12,6 +37,8 @@ async def crear_producto(db: AsyncSession, producto: schemas.ProductoCreateReque
     db.add(nuevo_producto)
     await db.commit()
     await db.refresh(nuevo_producto)
+    propagar_cambios_productos([nuevo_producto])
+    cache.invalidar_categorias()
 
     return nuevo_producto
 
@@ -22,6 +49,67 @@ async def obtener_productos(db: AsyncSession):
     return result.scalars().all()
 
 
+# Unidades vendidas según los contadores de ventas_productos (0 si el producto nunca se vendió).
+_UNIDADES_VENDIDAS = func.coalesce(models.VentasProductos.unidades, 0)
+
+# Columna de ordenamiento, sentido y tipo de la clave en el cursor para cada orden. El id
+# siempre desempata, en el mismo sentido, para que el keyset (clave, id) sea único.
+_ORDENES = {
+    schemas.OrdenProductos.ID: (models.Productos.id, False, int),
+    schemas.OrdenProductos.PRECIO_ASC: (models.Productos.price, False, int),
+    schemas.OrdenProductos.PRECIO_DESC: (models.Productos.price, True, int),
+    schemas.OrdenProductos.NOMBRE: (models.Productos.name, False, str),
+    schemas.OrdenProductos.NUEVOS: (models.Productos.id, True, int),
+    schemas.OrdenProductos.POPULARIDAD: (_UNIDADES_VENDIDAS, True, int),
+}
+
+
+def _aplicar_filtros(query, filtros: schemas.FiltrosProductos):
+    if filtros.category_id is not None:
+        query = query.where(models.Productos.category_id == filtros.category_id)
+    if filtros.marca:
+        query = query.where(models.Productos.marca.in_(filtros.marca))
+    if filtros.precio_min is not None:
+        query = query.where(models.Productos.price >= filtros.precio_min)
+    if filtros.precio_max is not None:
+        query = query.where(models.Productos.price <= filtros.precio_max)
+    if filtros.en_stock:
+        query = query.where(models.Productos.stock > 0)
+    return query
+
+
+async def listar_productos_paginados(
+    db: AsyncSession,
+    filtros: schemas.FiltrosProductos,
+    orden: schemas.OrdenProductos = schemas.OrdenProductos.ID,
+    limit: int = 50,
+    cursor: Optional[str] = None
+):
+    """
+    Lista productos filtrados y ordenados, paginando por keyset sobre (clave_de_orden, id).
+    Devuelve (productos, siguiente_cursor).
+    """
+    columna, descendente, tipo_clave = _ORDENES[orden]
+    query = _aplicar_filtros(select(models.Productos, columna.label("clave_orden")), filtros)
+    if orden == schemas.OrdenProductos.POPULARIDAD:
+        query = query.outerjoin(models.VentasProductos, models.VentasProductos.product_id == models.Productos.id)
+
+    if cursor is not None:
+        valor, ultimo_id = decodificar_cursor(cursor, tipo_clave, int)
+        clave = tuple_(columna, models.Productos.id)
+        query = query.where(clave < tuple_(valor, ultimo_id) if descendente else clave > tuple_(valor, ultimo_id))
+
+    if descendente:
+        query = query.order_by(columna.desc(), models.Productos.id.desc())
+    else:
+        query = query.order_by(columna.asc(), models.Productos.id.asc())
+
+    result = await db.execute(query.limit(limit + 1))
+    pagina, siguiente_cursor = cortar_pagina(result.all(), limit, lambda fila: codificar_cursor(fila.clave_orden, fila.Productos.id))
+
+    return [fila.Productos for fila in pagina], siguiente_cursor
+
+
 async def obtener_producto_por_id(db: AsyncSession, product_id: int):
     query = select(models.Productos).where(models.Productos.id == product_id)
     result = await db.execute(query)
@@ -29,6 +117,15 @@ async def obtener_producto_por_id(db: AsyncSession, product_id: int):
     return result.scalars().first()
 
 
+async def obtener_productos_por_ids(db: AsyncSession, product_ids: Iterable[int]) -> Dict[int, models.Productos]:
+    """Obtiene varios productos con una sola consulta `WHERE id IN (...)`. Devuelve {id: producto}; los ids inexistentes no aparecen."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    result = await db.execute(select(models.Productos).where(models.Productos.id.in_(product_ids)))
+    return {producto.id: producto for producto in result.scalars().all()}
+
+
 async def obtener_producto_por_nombre(db: AsyncSession, nombre: str) -> Optional[models.Productos]:
     result = await db.execute(
         select(models.Productos).where(models.Productos.name == nombre))
@@ -49,6 +146,8 @@ async def actualizar_producto(db: AsyncSession, product_id: int, producto: schem
             setattr(db_producto, key, value)
         await db.commit()
         await db.refresh(db_producto)
+        propagar_cambios_productos([db_producto])
+        cache.invalidar_categorias()
     return db_producto
 
 
@@ -60,6 +159,8 @@ async def actualizar_parcialmente_producto(db: AsyncSession, product_id: int, pr
             setattr(db_producto, key, value)
         await db.commit()
         await db.refresh(db_producto)
+        propagar_cambios_productos([db_producto])
+        cache.invalidar_categorias()
     return db_producto
 
 
@@ -68,6 +169,8 @@ async def eliminar_producto(db: AsyncSession, product_id: int):
     if db_producto:
         await db.delete(db_producto)
         await db.commit()
+        propagar_baja_producto(product_id)
+        cache.invalidar_categorias()
         return True
     return False
 
@@ -77,18 +180,66 @@ async def crear_categoria(db: AsyncSession, categoria: schemas.CategoriaCreateRe
     db.add(nueva_categoria)
     await db.commit()
     await db.refresh(nueva_categoria)
+    cache.invalidar_categorias()
 
-    result = await db.execute(select(models.Categorias).options(selectinload(models.Categorias.producto)).where(models.Categorias.id == nueva_categoria.id))
+    return nueva_categoria
 
-    categoria_con_relacion = result.scalar_one()
-    
-    return categoria_con_relacion
+
+def _consulta_categorias_con_conteo():
+    return (
+        select(models.Categorias.id, models.Categorias.name, func.count(models.Productos.id).label("cantidad_productos"))
+        .outerjoin(models.Productos, models.Productos.category_id == models.Categorias.id)
+        .group_by(models.Categorias.id)
+        .order_by(models.Categorias.id)
+    )
 
 
 async def obtener_categorias(db: AsyncSession):
-    result = await db.execute(select(models.Categorias).options(selectinload(models.Categorias.producto)))
-    
-    return result.scalars().all()
+    """
+    Lista las categorías con la cantidad de productos de cada una, resuelta con un único
+    LEFT JOIN + GROUP BY. No carga ningún producto en memoria.
+    Devuelve filas con id, name y cantidad_productos.
+    """
+    query = _consulta_categorias_con_conteo()
+    result = await db.execute(query)
+
+    return result.all()
+
+
+async def obtener_categorias_con_productos(db: AsyncSession, limit: int = 20, cursor: Optional[str] = None, productos_por_categoria: int = 10):
+    """
+    Página de categorías (keyset por id) con sus primeros `productos_por_categoria` productos.
+    Los productos de toda la página se traen con una sola consulta usando ROW_NUMBER() por
+    categoría; para ver el resto de una categoría está GET /productos/?category_id=.
+    Devuelve (categorias, productos_por_categoria_id, siguiente_cursor).
+    """
+    query = _consulta_categorias_con_conteo()
+    if cursor is not None:
+        (ultimo_id,) = decodificar_cursor(cursor, int)
+        query = query.where(models.Categorias.id > ultimo_id)
+    result = await db.execute(query.limit(limit + 1))
+    categorias, siguiente_cursor = cortar_pagina(result.all(), limit, lambda c: codificar_cursor(c.id))
+
+    productos: Dict[int, list] = {categoria.id: [] for categoria in categorias}
+    if categorias:
+        numerados = (
+            select(
+                models.Productos.id,
+                func.row_number().over(partition_by=models.Productos.category_id, order_by=models.Productos.id).label("posicion"),
+            )
+            .where(models.Productos.category_id.in_(productos.keys()))
+            .subquery()
+        )
+        result = await db.execute(
+            select(models.Productos)
+            .join(numerados, numerados.c.id == models.Productos.id)
+            .where(numerados.c.posicion <= productos_por_categoria)
+            .order_by(models.Productos.category_id, models.Productos.id)
+        )
+        for producto in result.scalars().all():
+            productos[producto.category_id].append(producto)
+
+    return categorias, productos, siguiente_cursor
 
 
 async def obtener_categoria_por_id(db: AsyncSession, categoria_id: int):
@@ -104,6 +255,7 @@ async def actualizar_categoria(db: AsyncSession, categoria_id: int, categoria: s
         db_categoria.name = categoria.name
         await db.commit()
         await db.refresh(db_categoria)
+        cache.invalidar_categorias()
     
     return db_categoria
 
@@ -113,20 +265,74 @@ async def eliminar_categoria(db: AsyncSession, categoria_id: int):
     if db_categoria:
         await db.delete(db_categoria)
         await db.commit()
+        cache.invalidar_categorias()
+        cache.invalidar_listados_productos()
         return True
     
     return False
 
-async def buscar_productos_por_termino(db: AsyncSession, termino: str):
-    # Usamos ilike para una búsqueda case-insensitive (ignora mayúsculas/minúsculas)
-    termino_like = f"%{termino}%"
-    result = await db.execute(
-        select(models.Productos)
-        .where(
-            or_(
-                models.Productos.name.ilike(termino_like),
-                models.Productos.description.ilike(termino_like)
-            )
+def _consulta_fts(termino: str) -> Optional[str]:
+    """
+    Arma la expresión MATCH de FTS5 a partir del texto libre del buscador.
+    Cada palabra se busca como prefijo (para que funcione mientras se tipea) y
+    se entrecomilla para que caracteres como '-' o ':' no se interpreten como operadores.
+    """
+    palabras = re.findall(r"\w+", termino)
+    if not palabras:
+        return None
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+
+async def buscar_productos_por_termino(db: AsyncSession, termino: str, limit: int = 20, cursor: Optional[str] = None):
+    """
+    Busca productos por nombre, descripción o marca usando el índice FTS5 `productos_fts`.
+    Los resultados se ordenan por relevancia (BM25) y se paginan por keyset sobre (rank, id).
+    Devuelve (productos, siguiente_cursor).
+    """
+    consulta = _consulta_fts(termino)
+    if consulta is None:
+        return [], None
+
+    # bm25 devuelve valores más negativos cuanto más relevante; el nombre pesa más que la marca y la descripción.
+    fts = (
+        text(
+            "SELECT rowid AS product_id, bm25(productos_fts, 10.0, 1.0, 5.0) AS rank "
+            "FROM productos_fts WHERE productos_fts MATCH :consulta"
         )
+        .bindparams(consulta=consulta)
+        .columns(product_id=Integer, rank=Float)
+        .subquery("fts")
     )
-    return result.scalars().all()
\ No newline at end of file
+    query = select(models.Productos, fts.c.rank).join(fts, fts.c.product_id == models.Productos.id)
+
+    if cursor is not None:
+        rank, ultimo_id = decodificar_cursor(cursor, float, int)
+        query = query.where(
+            or_(fts.c.rank > rank, and_(fts.c.rank == rank, models.Productos.id > ultimo_id))
+        )
+
+    query = query.order_by(fts.c.rank.asc(), models.Productos.id.asc()).limit(limit + 1)
+    filas = (await db.execute(query)).all()
+
+    pagina, siguiente = cortar_pagina(filas, limit, lambda fila: codificar_cursor(fila.rank, fila.Productos.id))
+    return [fila.Productos for fila in pagina], siguiente
+
+
+async def buscar_productos_difuso(db: AsyncSession, termino: str, limit: int = 20, cursor: Optional[str] = None):
+    """
+    Búsqueda tolerante a errores de tipeo sobre el índice de trigramas en memoria.
+    El ranking se calcula en memoria una vez por consulta (el índice lo guarda hasta el próximo
+    cambio) y se pagina por keyset sobre (puntaje, id) con una búsqueda binaria, sin recorrerlo;
+    a la base solo se le piden los productos de la página. Devuelve (productos, siguiente_cursor).
+    """
+    await indice_trigramas.asegurar_cargado(db)
+    ranking = indice_trigramas.buscar(termino)
+
+    inicio = 0
+    if cursor is not None:
+        puntaje, ultimo_id = decodificar_cursor(cursor, float, int)
+        inicio = bisect_right(ranking, (-puntaje, ultimo_id), key=lambda fila: (-fila[0], fila[1]))
+
+    pagina, siguiente = cortar_pagina(list(ranking[inicio:inicio + limit + 1]), limit, lambda fila: codificar_cursor(*fila))
+    productos = await obtener_productos_por_ids(db, (product_id for _, product_id in pagina))
+    return [productos[product_id] for _, product_id in pagina if product_id in productos], siguiente
@@ -1,40 +1,189 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from typing import List, Optional, Union
 from api.core.database import get_db # Importamos get_db desde un lugar central
 from api.core import models
+from api.core.paginacion import CABECERA_SIGUIENTE_CURSOR
+from api.core.cache_http import generar_etag, coincide_etag, respuesta_no_modificada, aplicar_cabeceras_cache, cabeceras_cache
+from api.core.respuestas import serializar, unir_lista, respuesta_preserializada
 from api.auth.endpoints import get_current_admin_user # Importamos la dependencia de admin
-from . import dal, schemas
+from . import dal, schemas, cache
+from .facetas import indice_facetas
+from .sugerencias import indice_sugerencias
 
 router = APIRouter()
 
-@router.get("/productos/", response_model=List[schemas.ProductoResponse], summary="Obtener todos los productos", tags=["Productos"])
-async def listar_productos(db: AsyncSession = Depends(get_db)):
-    return await dal.obtener_productos(db=db)
+# Política de Cache-Control para navegadores y CDN. must-revalidate hace que, al vencer,
+# el cliente pregunte con If-None-Match y reciba un 304 si el catálogo no cambió.
+CACHE_CONTROL_PRODUCTOS = os.environ.get("CACHE_CONTROL_PRODUCTOS", "public, max-age=30, must-revalidate")
+CACHE_CONTROL_CATEGORIAS = os.environ.get("CACHE_CONTROL_CATEGORIAS", "public, max-age=300, must-revalidate")
+
+MAX_PRODUCTOS_POR_LOTE = 100
+
+
+def filtros_productos(
+    category_id: Optional[int] = None,
+    marca: Optional[List[str]] = Query(None, description="Se puede repetir para filtrar por varias marcas"),
+    precio_min: Optional[int] = None,
+    precio_max: Optional[int] = None,
+    en_stock: bool = False
+) -> schemas.FiltrosProductos:
+    return schemas.FiltrosProductos(category_id=category_id, marca=marca, precio_min=precio_min, precio_max=precio_max, en_stock=en_stock)
+
+@router.get("/productos/", response_model=List[schemas.ProductoResponse], summary="Obtener productos (paginado, con filtros y orden)", tags=["Productos"])
+async def listar_productos(
+    request: Request,
+    filtros: schemas.FiltrosProductos = Depends(filtros_productos),
+    orden: schemas.OrdenProductos = schemas.OrdenProductos.ID,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Devuelve una página de productos. Si hay más, el cursor de la página siguiente
+    viaja en la cabecera X-Next-Cursor. La página se cachea ya serializada.
+    """
+    (version,) = await cache.versiones_en_base(db, "productos")
+    etag = generar_etag("productos", version)
+    if coincide_etag(request, etag):
+        return respuesta_no_modificada(etag, CACHE_CONTROL_PRODUCTOS)
+
+    clave = ("productos", version, filtros.model_dump_json(), orden, limit, cursor)
+
+    async def calcular():
+        productos, siguiente_cursor = await dal.listar_productos_paginados(db=db, filtros=filtros, orden=orden, limit=limit, cursor=cursor)
+        return unir_lista(serializar(schemas.ProductoResponse.model_validate(p)) for p in productos), siguiente_cursor
+
+    try:
+        contenido, siguiente_cursor = await cache.cacheado("productos", clave, calcular)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    cabeceras = cabeceras_cache(etag, CACHE_CONTROL_PRODUCTOS)
+    if siguiente_cursor:
+        cabeceras[CABECERA_SIGUIENTE_CURSOR] = siguiente_cursor
+    return respuesta_preserializada(contenido, cabeceras)
+
+@router.get("/productos/facetas", response_model=schemas.FacetasResponse, summary="Conteos por categoría, marca y rango de precio", tags=["Productos"])
+async def obtener_facetas(
+    request: Request,
+    response: Response,
+    filtros: schemas.FiltrosProductos = Depends(filtros_productos),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Devuelve cuántos productos hay por categoría, marca y rango de precio para la combinación
+    de filtros actual. Se resuelve con el índice de facetas en memoria, sin recorrer el catálogo.
+    """
+    etag = generar_etag("productos", *await cache.versiones_en_base(db, "productos"))
+    if coincide_etag(request, etag):
+        return respuesta_no_modificada(etag, CACHE_CONTROL_PRODUCTOS)
+    await indice_facetas.asegurar_cargado(db)
+    aplicar_cabeceras_cache(response, etag, CACHE_CONTROL_PRODUCTOS)
+    return indice_facetas.contar(filtros)
+
+@router.get("/productos/sugerencias", response_model=List[schemas.SugerenciaResponse], summary="Autocompletar nombres de productos y marcas", tags=["Productos"])
+async def sugerir_productos(
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(8, ge=1, le=20),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Sugerencias para el buscador mientras se tipea. Ignora mayúsculas y tildes y ordena
+    por unidades vendidas. Se resuelve con un índice en memoria, sin consultar la base.
+    """
+    await indice_sugerencias.asegurar_cargado(db)
+    return indice_sugerencias.sugerir(prefix, limit)
+
+@router.get("/productos/lote", response_model=List[schemas.ProductoResponse], summary="Obtener varios productos por sus IDs", tags=["Productos"])
+async def obtener_lote_de_productos(
+    request: Request,
+    ids: str = Query(..., description="IDs separados por coma, p. ej. 1,2,3"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Devuelve en una sola llamada los productos pedidos, en el mismo orden.
+    Los IDs que no existen se omiten. Pensado para hidratar listas guardadas en el frontend
+    (favoritos, vistos recientemente) sin hacer una request por producto.
+    """
+    try:
+        product_ids = list(dict.fromkeys(int(valor) for valor in ids.split(",") if valor.strip()))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El parámetro ids debe ser una lista de enteros separados por coma.")
+    if len(product_ids) > MAX_PRODUCTOS_POR_LOTE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Se pueden pedir como máximo {MAX_PRODUCTOS_POR_LOTE} productos por llamada.")
+
+    # El ETag depende solo de las versiones de los productos pedidos.
+    versiones = await cache.versiones_de_productos(db, product_ids)
+    etag = generar_etag("lote", *(f"{product_id}.{versiones[product_id]}" for product_id in product_ids if product_id in versiones))
+    if coincide_etag(request, etag):
+        return respuesta_no_modificada(etag, CACHE_CONTROL_PRODUCTOS)
+
+    async def calcular_faltantes(faltantes):
+        productos = await dal.obtener_productos_por_ids(db=db, product_ids=faltantes)
+        return {product_id: serializar(schemas.ProductoResponse.model_validate(producto)) for product_id, producto in productos.items()}
+
+    # Cada producto está cacheado como bytes JSON: la respuesta se arma concatenándolos.
+    productos = await cache.productos_cacheados(versiones, calcular_faltantes)
+    contenido = unir_lista(productos[product_id] for product_id in product_ids if product_id in productos)
+    return respuesta_preserializada(contenido, cabeceras_cache(etag, CACHE_CONTROL_PRODUCTOS))
 
 @router.get("/productos/{product_id}", response_model=schemas.ProductoResponse, summary="Obtener un producto por su ID", tags=["Productos"])
-async def obtener_producto(product_id: int, db: AsyncSession = Depends(get_db)):
-    producto = await dal.obtener_producto_por_id(db=db, product_id=product_id)
-    if producto is None:
+async def obtener_producto(product_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    # ETag y caché por fila: escribir otro producto no cambia la respuesta de este.
+    versiones = await cache.versiones_de_productos(db, [product_id])
+    if product_id not in versiones:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
-    return producto
+    etag = generar_etag("producto", product_id, versiones[product_id])
+    if coincide_etag(request, etag):
+        return respuesta_no_modificada(etag, CACHE_CONTROL_PRODUCTOS)
 
-# Filtrar productos por categoría
+    async def calcular_faltantes(faltantes):
+        productos = await dal.obtener_productos_por_ids(db=db, product_ids=faltantes)
+        return {product_id: serializar(schemas.ProductoResponse.model_validate(producto)) for product_id, producto in productos.items()}
+
+    contenido = (await cache.productos_cacheados(versiones, calcular_faltantes)).get(product_id)
+    if contenido is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    return respuesta_preserializada(contenido, cabeceras_cache(etag, CACHE_CONTROL_PRODUCTOS))
+
+# Filtrar productos por categoría (alias de /productos/?category_id=...)
 @router.get("/productos/categoria/{categoria_id}", response_model=List[schemas.ProductoResponse], summary="Obtener productos por categoría", tags=["Productos"])
-async def obtener_productos_por_categoria(categoria_id: int, db: AsyncSession = Depends(get_db)):
-    productos = await dal.obtener_productos_por_categoria(db=db, categoria_id=categoria_id)
-    return productos
+async def obtener_productos_por_categoria(
+    categoria_id: int,
+    request: Request,
+    filtros: schemas.FiltrosProductos = Depends(filtros_productos),
+    orden: schemas.OrdenProductos = schemas.OrdenProductos.ID,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    filtros.category_id = categoria_id
+    return await listar_productos(request=request, filtros=filtros, orden=orden, limit=limit, cursor=cursor, db=db)
 
 @router.get("/productos/buscar/", response_model=List[schemas.ProductoResponse], summary="Buscar productos por nombre o descripción", tags=["Productos"])
-async def buscar_productos(query: str, db: AsyncSession = Depends(get_db)):
+async def buscar_productos(
+    response: Response,
+    query: str,
+    fuzzy: bool = Query(False, description="Tolera errores de tipeo comparando trigramas"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
     """
     Busca productos que coincidan con el término de búsqueda (query)
-    en su nombre o descripción.
+    en su nombre, descripción o marca, ordenados por relevancia.
+    Con fuzzy=true también encuentra palabras mal escritas ("nootebook", "strx").
+    Si hay más resultados, el cursor de la página siguiente viaja en la cabecera X-Next-Cursor.
     """
-    productos_encontrados = await dal.buscar_productos_por_termino(db=db, termino=query)
-    if not productos_encontrados:
-        return [] # Devuelve una lista vacía si no hay resultados
+    buscar = dal.buscar_productos_difuso if fuzzy else dal.buscar_productos_por_termino
+    try:
+        productos_encontrados, siguiente_cursor = await buscar(db=db, termino=query, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if siguiente_cursor:
+        response.headers[CABECERA_SIGUIENTE_CURSOR] = siguiente_cursor
     return productos_encontrados
 
 # --- Endpoints de Categorías ---
@@ -44,9 +193,53 @@ async def crear_categoria(categoria: schemas.CategoriaCreateRequest, db: AsyncSe
     db_categoria = await dal.crear_categoria(db=db, categoria=categoria)
     return db_categoria
 
-@router.get("/categorias/", response_model=List[schemas.CategoriaResponse], tags=["Categorías"])
-async def listar_categorias(db: AsyncSession = Depends(get_db)):
-    categorias = await dal.obtener_categorias(db=db)
+@router.get("/categorias/", response_model=List[Union[schemas.CategoriaConProductosResponse, schemas.CategoriaResumenResponse]], tags=["Categorías"])
+async def listar_categorias(
+    request: Request,
+    response: Response,
+    incluir: Optional[str] = Query(None, pattern="^productos$", description="'productos' agrega los primeros productos de cada categoría"),
+    limit: int = Query(20, ge=1, le=100, description="Categorías por página (solo con incluir=productos)"),
+    productos_por_categoria: int = Query(10, ge=1, le=50),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Por defecto devuelve todas las categorías con su cantidad de productos, sin cargar productos.
+    Con incluir=productos la respuesta se pagina (cursor en X-Next-Cursor) y cada categoría trae
+    sus primeros `productos_por_categoria` productos.
+    """
+    if incluir is None:
+        (version,) = await cache.versiones_en_base(db, "categorias")
+        etag = generar_etag("categorias", version)
+        clave = ("categorias", version)
+
+        async def calcular():
+            categorias = await dal.obtener_categorias(db=db)
+            return [schemas.CategoriaResumenResponse.model_validate(c) for c in categorias], None
+    else:
+        version = await cache.versiones_en_base(db, "categorias", "productos")
+        etag = generar_etag("categorias", *version)
+        clave = ("categorias_con_productos", version, limit, productos_por_categoria, cursor)
+
+        async def calcular():
+            categorias, productos, siguiente = await dal.obtener_categorias_con_productos(
+                db=db, limit=limit, cursor=cursor, productos_por_categoria=productos_por_categoria)
+            return [
+                schemas.CategoriaConProductosResponse(
+                    id=c.id, name=c.name, cantidad_productos=c.cantidad_productos,
+                    productos=[schemas.ProductoResponse.model_validate(p) for p in productos[c.id]])
+                for c in categorias
+            ], siguiente
+
+    if coincide_etag(request, etag):
+        return respuesta_no_modificada(etag, CACHE_CONTROL_CATEGORIAS)
+    try:
+        categorias, siguiente_cursor = await cache.cacheado("categorias", clave, calcular)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if siguiente_cursor:
+        response.headers[CABECERA_SIGUIENTE_CURSOR] = siguiente_cursor
+    aplicar_cabeceras_cache(response, etag, CACHE_CONTROL_CATEGORIAS)
     return categorias
 
 @router.get("/categorias/{categoria_id}", response_model=schemas.CategoriaResponse, tags=["Categorías"])
@@ -113,4 +306,9 @@ async def eliminar_producto(
     eliminado = await dal.eliminar_producto(db=db, product_id=product_id)
     if not eliminado:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
-    return None
\ No newline at end of file
+    return None
+
+
+@router.get("/admin/cache/catalogo", summary="Estadísticas de la caché del catálogo (Admin)", tags=["Admin"])
+async def estadisticas_cache_catalogo(current_admin: models.Usuarios = Depends(get_current_admin_user)):
+    return cache.estadisticas()
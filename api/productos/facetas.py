@@ -0,0 +1,141 @@
+import bisect
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from api.core import models
+from api.core.indice_memoria import IndiceEnMemoria
+from api.productos import schemas
+
+
+# Límites (inclusive a la izquierda) de los rangos de precio que se ofrecen como faceta.
+RANGOS_PRECIO = [int(v) for v in os.environ.get("FACETAS_RANGOS_PRECIO", "250000,500000,1000000,2000000").split(",")]
+
+
+class IndiceFacetas(IndiceEnMemoria):
+    """
+    Índice invertido en memoria del catálogo: para cada categoría, marca y rango de precio
+    guarda el conjunto de ids de productos. Los conteos para una combinación de filtros se
+    resuelven intersectando conjuntos, sin consultar la base ni recorrer el catálogo.
+    Se carga una vez al arrancar y el DAL de productos lo mantiene al día en cada escritura.
+    """
+
+    def __init__(self, limites_precio: List[int]):
+        super().__init__()
+        self.limites_precio = sorted(limites_precio)
+        self._productos: Dict[int, tuple] = {}
+        self._por_categoria: Dict[int, Set[int]] = defaultdict(set)
+        self._por_marca: Dict[str, Set[int]] = defaultdict(set)
+        self._por_rango: Dict[int, Set[int]] = defaultdict(set)
+        self._en_stock: Set[int] = set()
+        # (precio, id) ordenado, para resolver filtros de rango de precio arbitrarios con bisect.
+        self._precios: List[tuple] = []
+
+    def _rango(self, precio: int) -> int:
+        return bisect.bisect_right(self.limites_precio, precio)
+
+    async def _leer(self, db: AsyncSession):
+        result = await db.execute(select(models.Productos))
+        return result.scalars().all()
+
+    def _construir(self, productos) -> None:
+        for producto in productos:
+            self._agregar(producto)
+
+    def _agregar(self, producto: models.Productos) -> None:
+        precio = producto.price or 0
+        rango = self._rango(precio)
+        self._productos[producto.id] = (producto.category_id, producto.marca, rango, precio)
+        self._por_categoria[producto.category_id].add(producto.id)
+        self._por_marca[producto.marca].add(producto.id)
+        self._por_rango[rango].add(producto.id)
+        if (producto.stock or 0) > 0:
+            self._en_stock.add(producto.id)
+        bisect.insort(self._precios, (precio, producto.id))
+
+    def eliminar(self, product_id: int) -> None:
+        if self._registrar_cambio():
+            self._quitar(product_id)
+
+    def _quitar(self, product_id: int) -> None:
+        datos = self._productos.pop(product_id, None)
+        if datos is None:
+            return
+        category_id, marca, rango, precio = datos
+        for postings, valor in ((self._por_categoria, category_id), (self._por_marca, marca), (self._por_rango, rango)):
+            postings[valor].discard(product_id)
+            if not postings[valor]:
+                del postings[valor]
+        self._en_stock.discard(product_id)
+        posicion = bisect.bisect_left(self._precios, (precio, product_id))
+        if posicion < len(self._precios) and self._precios[posicion] == (precio, product_id):
+            del self._precios[posicion]
+
+    def actualizar(self, producto: models.Productos) -> None:
+        """Refleja un alta o una modificación. Si el índice aún no se cargó no hace nada: se cargará completo."""
+        if not self._registrar_cambio():
+            return
+        self._quitar(producto.id)
+        self._agregar(producto)
+
+    def _ids_en_rango_de_precio(self, precio_min: Optional[int], precio_max: Optional[int]) -> Set[int]:
+        desde = 0 if precio_min is None else bisect.bisect_left(self._precios, (precio_min, -1))
+        hasta = len(self._precios) if precio_max is None else bisect.bisect_right(self._precios, (precio_max, float("inf")))
+        return {product_id for _, product_id in self._precios[desde:hasta]}
+
+    def contar(self, filtros: schemas.FiltrosProductos) -> dict:
+        """
+        Conteos por categoría, marca y rango de precio para los filtros dados. Cada faceta se
+        cuenta aplicando todos los filtros menos el propio, así el usuario ve cuántos productos
+        obtendría al cambiar ese filtro.
+        """
+        restricciones = {}
+        if filtros.category_id is not None:
+            restricciones["categoria"] = self._por_categoria.get(filtros.category_id, set())
+        if filtros.marca:
+            restricciones["marca"] = set().union(*(self._por_marca.get(marca, set()) for marca in filtros.marca))
+        if filtros.precio_min is not None or filtros.precio_max is not None:
+            restricciones["precio"] = self._ids_en_rango_de_precio(filtros.precio_min, filtros.precio_max)
+        if filtros.en_stock:
+            restricciones["stock"] = self._en_stock
+
+        def base(excepto: Optional[str]) -> Optional[Set[int]]:
+            conjuntos = sorted((ids for clave, ids in restricciones.items() if clave != excepto), key=len)
+            if not conjuntos:
+                return None
+            return conjuntos[0].intersection(*conjuntos[1:])
+
+        def contar_faceta(postings: Dict, ids_base: Optional[Set[int]]) -> Dict:
+            if ids_base is None:
+                return {valor: len(ids) for valor, ids in postings.items()}
+            conteos = {valor: len(ids & ids_base) for valor, ids in postings.items()}
+            return {valor: cantidad for valor, cantidad in conteos.items() if cantidad}
+
+        total = base(None)
+        por_rango = contar_faceta(self._por_rango, base("precio"))
+        limites = [0] + self.limites_precio
+        return {
+            "total": len(self._productos) if total is None else len(total),
+            "categorias": [
+                {"category_id": category_id, "cantidad": cantidad}
+                for category_id, cantidad in sorted(contar_faceta(self._por_categoria, base("categoria")).items(), key=lambda kv: (kv[0] is None, kv[0]))
+            ],
+            "marcas": [
+                {"marca": marca, "cantidad": cantidad}
+                for marca, cantidad in sorted(contar_faceta(self._por_marca, base("marca")).items())
+            ],
+            "rangos_precio": [
+                {
+                    "precio_min": limites[rango],
+                    "precio_max": limites[rango + 1] - 1 if rango + 1 < len(limites) else None,
+                    "cantidad": por_rango[rango],
+                }
+                for rango in sorted(por_rango)
+            ],
+        }
+
+
+indice_facetas = IndiceFacetas(RANGOS_PRECIO)
@@ -1,5 +1,6 @@
+import enum
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 
 # REQUEST
@@ -28,6 +29,23 @@ class CategoriaCreateRequest(BaseModel):
     name: str
 
 
+class FiltrosProductos(BaseModel):
+    category_id: Optional[int] = None
+    marca: Optional[List[str]] = None
+    precio_min: Optional[int] = None
+    precio_max: Optional[int] = None
+    en_stock: bool = False
+
+
+class OrdenProductos(str, enum.Enum):
+    ID = "id"
+    PRECIO_ASC = "precio_asc"
+    PRECIO_DESC = "precio_desc"
+    NOMBRE = "nombre"
+    NUEVOS = "nuevos"
+    POPULARIDAD = "popularidad"
+
+
 # RESPONSE
 
 class ProductoResponse(BaseModel):
@@ -41,7 +59,7 @@ class ProductoResponse(BaseModel):
     category_id: int
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 
 class CategoriaResponse(BaseModel):
@@ -49,4 +67,41 @@ class CategoriaResponse(BaseModel):
     name: str
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        from_attributes = True
+
+
+class CategoriaResumenResponse(CategoriaResponse):
+    cantidad_productos: int
+
+
+class CategoriaConProductosResponse(CategoriaResumenResponse):
+    productos: List[ProductoResponse]
+
+
+class ConteoCategoria(BaseModel):
+    category_id: Optional[int]
+    cantidad: int
+
+
+class ConteoMarca(BaseModel):
+    marca: str
+    cantidad: int
+
+
+class ConteoRangoPrecio(BaseModel):
+    precio_min: int
+    precio_max: Optional[int] = None
+    cantidad: int
+
+
+class FacetasResponse(BaseModel):
+    total: int
+    categorias: List[ConteoCategoria]
+    marcas: List[ConteoMarca]
+    rangos_precio: List[ConteoRangoPrecio]
+
+
+class SugerenciaResponse(BaseModel):
+    tipo: str
+    texto: str
+    product_id: Optional[int] = None
@@ -0,0 +1,153 @@
+import bisect
+import heapq
+import os
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from api.core import models
+from api.core.indice_memoria import IndiceEnMemoria
+from api.core.texto import normalizar
+
+
+TIPO_PRODUCTO = "producto"
+TIPO_MARCA = "marca"
+
+# Cantidad máxima de respuestas memorizadas por prefijo. Se vacía con cada cambio del catálogo.
+MAX_PREFIJOS_MEMORIZADOS = int(os.environ.get("SUGERENCIAS_MAX_PREFIJOS_MEMORIZADOS", "5000"))
+
+
+class IndiceSugerencias(IndiceEnMemoria):
+    """
+    Índice de autocompletado por prefijo sobre nombres y marcas de productos.
+
+    Es un arreglo ordenado de (clave_normalizada, tipo, referencia). Cada producto aporta una
+    entrada por cada palabra de su nombre (la clave es el nombre desde esa palabra), así
+    "rog" encuentra "Notebook Asus ROG Strix"; cada marca aporta una entrada. Un prefijo se
+    resuelve con dos búsquedas binarias y el rango resultante se ordena por popularidad
+    (unidades vendidas). Las respuestas por prefijo se memorizan hasta el próximo cambio.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._entradas: List[Tuple[str, str, object]] = []
+        self._productos: Dict[int, Tuple[str, str]] = {}
+        self._productos_por_marca: Dict[str, int] = defaultdict(int)
+        self._popularidad: Dict[int, int] = defaultdict(int)
+        self._popularidad_marca: Dict[str, int] = defaultdict(int)
+        self._memo: Dict[Tuple[str, int], list] = {}
+
+    async def _leer(self, db: AsyncSession):
+        productos = (await db.execute(select(models.Productos.id, models.Productos.name, models.Productos.marca))).all()
+        ventas = (await db.execute(select(models.VentasProductos.product_id, models.VentasProductos.unidades))).all()
+        return productos, ventas
+
+    def _construir(self, datos) -> None:
+        productos, ventas = datos
+        for product_id, unidades in ventas:
+            self._popularidad[product_id] = unidades or 0
+        for product_id, name, marca in productos:
+            self._agregar(product_id, name, marca, ordenar=False)
+        self._entradas.sort()
+
+    @staticmethod
+    def _claves_de_nombre(nombre: str) -> List[str]:
+        palabras = normalizar(nombre).split(" ")
+        return [" ".join(palabras[i:]) for i in range(len(palabras)) if palabras[i]]
+
+    def _insertar(self, entrada, ordenar: bool) -> None:
+        if ordenar:
+            bisect.insort(self._entradas, entrada)
+        else:
+            self._entradas.append(entrada)
+
+    def _remover(self, entrada) -> None:
+        posicion = bisect.bisect_left(self._entradas, entrada)
+        if posicion < len(self._entradas) and self._entradas[posicion] == entrada:
+            del self._entradas[posicion]
+
+    def _agregar(self, product_id: int, nombre: str, marca: str, ordenar: bool = True) -> None:
+        self._productos[product_id] = (nombre, marca)
+        for clave in self._claves_de_nombre(nombre):
+            self._insertar((clave, TIPO_PRODUCTO, product_id), ordenar)
+        if marca:
+            if self._productos_por_marca[marca] == 0:
+                self._insertar((normalizar(marca), TIPO_MARCA, marca), ordenar)
+            self._productos_por_marca[marca] += 1
+            self._popularidad_marca[marca] += self._popularidad[product_id]
+
+    def _quitar(self, product_id: int) -> None:
+        datos = self._productos.pop(product_id, None)
+        if datos is None:
+            return
+        nombre, marca = datos
+        for clave in self._claves_de_nombre(nombre):
+            self._remover((clave, TIPO_PRODUCTO, product_id))
+        if marca:
+            self._productos_por_marca[marca] -= 1
+            self._popularidad_marca[marca] -= self._popularidad[product_id]
+            if self._productos_por_marca[marca] == 0:
+                del self._productos_por_marca[marca]
+                del self._popularidad_marca[marca]
+                self._remover((normalizar(marca), TIPO_MARCA, marca))
+
+    def actualizar(self, producto: models.Productos) -> None:
+        if not self._registrar_cambio():
+            return
+        # Los cambios de stock o precio no tocan el índice; solo reindexamos si cambió el texto.
+        if self._productos.get(producto.id) == (producto.name, producto.marca):
+            return
+        self._quitar(producto.id)
+        self._agregar(producto.id, producto.name, producto.marca)
+        self._memo.clear()
+
+    def eliminar(self, product_id: int) -> None:
+        if self._registrar_cambio():
+            self._quitar(product_id)
+            self._memo.clear()
+
+    def sumar_ventas(self, unidades_por_producto: Dict[int, int]) -> None:
+        """Suma unidades vendidas a la popularidad de cada producto (y de su marca)."""
+        for product_id, unidades in unidades_por_producto.items():
+            self._popularidad[product_id] += unidades
+            datos = self._productos.get(product_id)
+            if datos and datos[1]:
+                self._popularidad_marca[datos[1]] += unidades
+        self._memo.clear()
+
+    def sugerir(self, prefijo: str, limite: int = 10) -> List[dict]:
+        prefijo = normalizar(prefijo)
+        if not prefijo:
+            return []
+        memo = self._memo.get((prefijo, limite))
+        if memo is not None:
+            return memo
+
+        desde = bisect.bisect_left(self._entradas, (prefijo,))
+        hasta = bisect.bisect_left(self._entradas, (prefijo + "\uffff",))
+        candidatos = {}
+        for _, tipo, referencia in self._entradas[desde:hasta]:
+            candidatos[(tipo, referencia)] = None
+
+        def puntaje(candidato):
+            tipo, referencia = candidato
+            if tipo == TIPO_MARCA:
+                return self._popularidad_marca[referencia], 1
+            return self._popularidad[referencia], 0
+
+        mejores = heapq.nlargest(limite, candidatos, key=puntaje)
+        resultado = [
+            {"tipo": TIPO_MARCA, "texto": referencia, "product_id": None}
+            if tipo == TIPO_MARCA else
+            {"tipo": TIPO_PRODUCTO, "texto": self._productos[referencia][0], "product_id": referencia}
+            for tipo, referencia in mejores
+        ]
+        if len(self._memo) >= MAX_PREFIJOS_MEMORIZADOS:
+            self._memo.clear()
+        self._memo[(prefijo, limite)] = resultado
+        return resultado
+
+
+indice_sugerencias = IndiceSugerencias()
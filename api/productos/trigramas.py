@@ -0,0 +1,163 @@
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from api.core import models
+from api.core.cache import CacheLRU
+from api.core.indice_memoria import IndiceEnMemoria
+from api.core.texto import normalizar
+
+
+# Similitud mínima (Jaccard de trigramas) para que una palabra del catálogo cuente como coincidencia.
+UMBRAL_SIMILITUD = float(os.environ.get("BUSQUEDA_DIFUSA_UMBRAL", "0.3"))
+
+# Peso de cada campo en el puntaje, en el mismo orden de importancia que el bm25 de la búsqueda FTS.
+PESOS_CAMPOS = {"name": 1.0, "marca": 0.8, "description": 0.3}
+
+# Rankings ya calculados por consulta: las páginas siguientes de una búsqueda no recalculan ni reordenan.
+# Cualquier cambio en el índice los descarta, así que el TTL solo acota la memoria de consultas viejas.
+BUSQUEDA_DIFUSA_CACHE_ENTRADAS = int(os.environ.get("BUSQUEDA_DIFUSA_CACHE_ENTRADAS", "256"))
+BUSQUEDA_DIFUSA_CACHE_TTL_SEGUNDOS = float(os.environ.get("BUSQUEDA_DIFUSA_CACHE_TTL_SEGUNDOS", "300"))
+
+
+def trigramas(palabra: str) -> Set[str]:
+    """Trigramas de una palabra con el mismo relleno que pg_trgm: dos espacios al inicio y uno al final."""
+    relleno = f"  {palabra} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def _palabras(texto: Optional[str]) -> Set[str]:
+    """Palabras normalizadas de `texto`; la puntuación separa palabras: 'Wi-Fi/USB-C' -> {'wi', 'fi', 'usb', 'c'}."""
+    return {palabra for palabra in re.split(r"\W+", normalizar(texto or "")) if palabra}
+
+
+class IndiceTrigramas(IndiceEnMemoria):
+    """
+    Índice de trigramas para la búsqueda tolerante a errores de tipeo.
+
+    Se indexa el vocabulario del catálogo, no los productos: trigrama -> palabras que lo contienen,
+    y palabra -> {product_id: peso del mejor campo donde aparece}. Para cada palabra de la consulta
+    solo se evalúan las palabras del vocabulario que comparten trigramas con ella (y que comparten
+    suficientes como para poder superar el umbral), así el costo depende del tamaño del vocabulario
+    candidato y no del catálogo.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._trigramas_de_palabra: Dict[str, Set[str]] = {}
+        self._palabras_por_trigrama: Dict[str, Set[str]] = defaultdict(set)
+        self._productos_por_palabra: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._textos: Dict[int, Tuple[str, str, str]] = {}
+        self._rankings = CacheLRU(BUSQUEDA_DIFUSA_CACHE_ENTRADAS, BUSQUEDA_DIFUSA_CACHE_TTL_SEGUNDOS)
+
+    async def _leer(self, db: AsyncSession):
+        result = await db.execute(select(models.Productos.id, models.Productos.name, models.Productos.marca, models.Productos.description))
+        return result.all()
+
+    def _construir(self, productos) -> None:
+        for product_id, name, marca, description in productos:
+            self._agregar(product_id, (name, marca, description))
+        self._rankings.limpiar()
+
+    def _pesos_por_palabra(self, textos: Tuple[str, str, str]) -> Dict[str, float]:
+        pesos: Dict[str, float] = {}
+        for campo, texto in zip(("name", "marca", "description"), textos):
+            for palabra in _palabras(texto):
+                pesos[palabra] = max(pesos.get(palabra, 0.0), PESOS_CAMPOS[campo])
+        return pesos
+
+    def _agregar(self, product_id: int, textos: Tuple[str, str, str]) -> None:
+        self._textos[product_id] = textos
+        for palabra, peso in self._pesos_por_palabra(textos).items():
+            if palabra not in self._trigramas_de_palabra:
+                self._trigramas_de_palabra[palabra] = trigramas(palabra)
+                for trigrama in self._trigramas_de_palabra[palabra]:
+                    self._palabras_por_trigrama[trigrama].add(palabra)
+            self._productos_por_palabra[palabra][product_id] = peso
+
+    def _quitar(self, product_id: int) -> None:
+        textos = self._textos.pop(product_id, None)
+        if textos is None:
+            return
+        for palabra in self._pesos_por_palabra(textos):
+            productos = self._productos_por_palabra[palabra]
+            productos.pop(product_id, None)
+            if productos:
+                continue
+            # La palabra ya no aparece en ningún producto: sale del vocabulario.
+            del self._productos_por_palabra[palabra]
+            for trigrama in self._trigramas_de_palabra.pop(palabra):
+                self._palabras_por_trigrama[trigrama].discard(palabra)
+                if not self._palabras_por_trigrama[trigrama]:
+                    del self._palabras_por_trigrama[trigrama]
+
+    def actualizar(self, producto: models.Productos) -> None:
+        if not self._registrar_cambio():
+            return
+        textos = (producto.name, producto.marca, producto.description)
+        if self._textos.get(producto.id) == textos:
+            return
+        self._quitar(producto.id)
+        self._agregar(producto.id, textos)
+        self._rankings.limpiar()
+
+    def eliminar(self, product_id: int) -> None:
+        if self._registrar_cambio():
+            self._quitar(product_id)
+            self._rankings.limpiar()
+
+    def _palabras_similares(self, palabra: str) -> Dict[str, float]:
+        """Palabras del vocabulario con similitud >= UMBRAL_SIMILITUD respecto de `palabra`."""
+        trigramas_consulta = trigramas(palabra)
+        compartidos: Dict[str, int] = defaultdict(int)
+        for trigrama in trigramas_consulta:
+            for candidata in self._palabras_por_trigrama.get(trigrama, ()):
+                compartidos[candidata] += 1
+
+        # Jaccard = c / (|A| + |B| - c) <= c / |A|: con menos de umbral * |A| trigramas
+        # compartidos una candidata no puede alcanzar el umbral y se descarta sin más cálculo.
+        minimo = UMBRAL_SIMILITUD * len(trigramas_consulta)
+        similares = {}
+        for candidata, comunes in compartidos.items():
+            if comunes < minimo:
+                continue
+            similitud = comunes / (len(trigramas_consulta) + len(self._trigramas_de_palabra[candidata]) - comunes)
+            if similitud >= UMBRAL_SIMILITUD:
+                similares[candidata] = similitud
+        return similares
+
+    def buscar(self, termino: str) -> Tuple[Tuple[float, int], ...]:
+        """
+        Devuelve ((puntaje, product_id), ...) ordenado por puntaje descendente e id ascendente.
+        El puntaje de un producto es el promedio, sobre las palabras de la consulta, de la mejor
+        similitud encontrada en ese producto multiplicada por el peso del campo.
+        El ranking de cada consulta se guarda hasta el próximo cambio del índice.
+        """
+        palabras = _palabras(termino)
+        if not palabras:
+            return ()
+        clave = tuple(sorted(palabras))
+        encontrado, ranking = self._rankings.obtener(clave)
+        if not encontrado:
+            ranking = self._calcular_ranking(palabras)
+            self._rankings.guardar(clave, ranking)
+        return ranking
+
+    def _calcular_ranking(self, palabras: Set[str]) -> Tuple[Tuple[float, int], ...]:
+        puntajes: Dict[int, float] = defaultdict(float)
+        for palabra in palabras:
+            mejores: Dict[int, float] = {}
+            for similar, similitud in self._palabras_similares(palabra).items():
+                for product_id, peso in self._productos_por_palabra[similar].items():
+                    puntaje = similitud * peso
+                    if puntaje > mejores.get(product_id, 0.0):
+                        mejores[product_id] = puntaje
+            for product_id, puntaje in mejores.items():
+                puntajes[product_id] += puntaje
+        return tuple(sorted(((round(puntaje / len(palabras), 6), product_id) for product_id, puntaje in puntajes.items()), key=lambda r: (-r[0], r[1])))
+
+indice_trigramas = IndiceTrigramas()
@@ -93,11 +93,8 @@ async function fetchProducts(searchTerm = '') {
     }
 
     try {
-        const response = await fetch(url); // No necesita token para ver productos
-        if (response.ok) {
-            const products = await response.json();
-            renderProducts(products, searchTerm);
-        } else {
+        const response = await pedirPaginaProductos(url, searchTerm); // No necesita token para ver productos
+        if (!response.ok) {
             console.error('Error al obtener los productos:', await response.text());
             productGrid.innerHTML = '<p class="text-center">No se pudieron cargar los productos.</p>';
         }
@@ -107,6 +104,55 @@ async function fetchProducts(searchTerm = '') {
     }
 }
 
+// Listado que está en la grilla: la URL que lo generó y el cursor de su página siguiente.
+// El backend pagina /productos/ y /productos/buscar/ y manda el cursor en la cabecera X-Next-Cursor.
+let paginaProductos = { url: null, cursor: null, searchTerm: '' };
+
+async function pedirPaginaProductos(url, searchTerm = '', cursor = null) {
+    // Sin cursor se pide la primera página y se reemplaza la grilla; con cursor se agregan los productos al final.
+    const urlPagina = new URL(url);
+    if (cursor) {
+        urlPagina.searchParams.set('cursor', cursor);
+    }
+    const response = await fetch(urlPagina);
+    if (response.ok) {
+        const products = await response.json();
+        paginaProductos = { url, cursor: response.headers.get('X-Next-Cursor'), searchTerm };
+        renderProducts(products, searchTerm, cursor !== null);
+    } else {
+        paginaProductos = { url: null, cursor: null, searchTerm: '' };
+    }
+    actualizarBotonCargarMas();
+    return response;
+}
+
+function actualizarBotonCargarMas() {
+    const loadMoreButton = document.getElementById('load-more-button');
+    if (loadMoreButton) {
+        loadMoreButton.disabled = false;
+        loadMoreButton.classList.toggle('d-none', !paginaProductos.cursor);
+    }
+}
+
+async function cargarMasProductos() {
+    if (!paginaProductos.cursor) {
+        return;
+    }
+    const loadMoreButton = document.getElementById('load-more-button');
+    if (loadMoreButton) loadMoreButton.disabled = true;
+
+    try {
+        const response = await pedirPaginaProductos(paginaProductos.url, paginaProductos.searchTerm, paginaProductos.cursor);
+        if (!response.ok) {
+            throw new Error(await response.text());
+        }
+    } catch (error) {
+        console.error('Error al cargar más productos:', error);
+        alert('No se pudieron cargar más productos.');
+        actualizarBotonCargarMas();
+    }
+}
+
 async function loadNavCategories() {
     const desktopNavContainer = document.getElementById('secondary-nav-categories');
     const mobileNavContainer = document.getElementById('mobile-nav-categories');
@@ -179,20 +225,18 @@ async function loadFilterOptions() {
     // Cargar Marcas
     if (brandContainer) {
         try {
-            // No tenemos un endpoint de marcas, así que las extraemos de los productos.
-            // Esto es menos eficiente, pero funciona sin cambiar el backend.
-            const response = await fetch(`${API_BASE_URL}/productos/`);
-            const products = await response.json();
-            const brands = [...new Set(products.map(p => p.marca).filter(m => m && m !== 'N/A'))]; // Obtenemos marcas únicas y filtramos nulos o "N/A"
-            brands.sort(); // Ordenamos alfabéticamente
+            // Las marcas y sus conteos salen del endpoint de facetas, sin descargar el catálogo.
+            const response = await fetch(`${API_BASE_URL}/productos/facetas`);
+            const facetas = await response.json();
+            const brands = facetas.marcas.filter(m => m.marca && m.marca !== 'N/A'); // Filtramos marcas vacías o "N/A"
 
             let brandsHtml = '';
-            brands.forEach(brand => {
+            brands.forEach(({ marca: brand, cantidad }) => {
                 const brandId = brand.toLowerCase().replace(/\s+/g, '-');
                 brandsHtml += `
                     <div class="form-check">
                         <input class="form-check-input" type="checkbox" value="${brand}" id="brand-filter-${brandId}">
-                        <label class="form-check-label" for="brand-filter-${brandId}">${brand}</label>
+                        <label class="form-check-label" for="brand-filter-${brandId}">${brand} <span class="text-muted small">(${cantidad})</span></label>
                     </div>`;
             });
             brandContainer.innerHTML = brandsHtml;
@@ -230,31 +274,17 @@ async function filtrarProductos({ categoryID = null, selectedBrands = [], minPri
     productGrid.innerHTML = '<p class="text-center">Filtrando productos...</p>';
 
     try {
-        // 1. Obtenemos todos los productos o los de una categoría específica si se seleccionó.
-        const url = categoryID 
-            ? `${API_BASE_URL}/productos/categoria/${categoryID}` 
-            : `${API_BASE_URL}/productos/`;
-        
-        const response = await fetch(url);
+        // Los filtros se aplican en el servidor; solo viaja la página de productos que corresponde.
+        const params = new URLSearchParams();
+        if (categoryID) params.append('category_id', categoryID);
+        selectedBrands.forEach(brand => params.append('marca', brand));
+        if (minPrice !== null) params.append('precio_min', Math.floor(minPrice));
+        if (maxPrice !== null) params.append('precio_max', Math.ceil(maxPrice));
+
+        const response = await pedirPaginaProductos(`${API_BASE_URL}/productos/?${params.toString()}`);
         if (!response.ok) {
             throw new Error('No se pudieron obtener los productos para filtrar.');
         }
-        
-        let productos = await response.json();
-
-        // 2. Aplicamos los filtros adicionales (marcas y precio) en el frontend.
-        let productosFiltrados = productos.filter(producto => {
-            const pasaFiltroPrecioMin = minPrice === null || producto.price >= minPrice;
-            const pasaFiltroPrecioMax = maxPrice === null || producto.price <= maxPrice;
-            // Si no se seleccionaron marcas, este filtro se pasa para todos los productos.
-            // Si se seleccionaron, el producto debe pertenecer a una de ellas.
-            const pasaFiltroMarca = selectedBrands.length === 0 || selectedBrands.includes(producto.marca);
-
-            return pasaFiltroPrecioMin && pasaFiltroPrecioMax && pasaFiltroMarca;
-        });
-
-        // 3. Renderizamos los productos que pasaron todos los filtros.
-        renderProducts(productosFiltrados);
 
     } catch (error) {
         console.error('Error al filtrar productos:', error);
@@ -262,8 +292,13 @@ async function filtrarProductos({ categoryID = null, selectedBrands = [], minPri
     }
 }
 
-function renderProducts(products, searchTerm = '') {
+function renderProducts(products, searchTerm = '', agregar = false) {
+    // Con `agregar` las tarjetas van al final de la grilla (página siguiente del mismo listado).
     const productGrid = document.getElementById('product-grid');
+    if (agregar) {
+        productGrid.insertAdjacentHTML('beforeend', products.map(tarjetaProducto).join(''));
+        return;
+    }
     productGrid.innerHTML = ''; // Limpiar el grid
 
     if (products.length === 0 && searchTerm) {
@@ -277,7 +312,12 @@ function renderProducts(products, searchTerm = '') {
     }
 
     products.forEach(product => {
-        const productCard = `
+        productGrid.innerHTML += tarjetaProducto(product);
+    });
+}
+
+function tarjetaProducto(product) {
+    return `
             <div class="col">
                 <div class="card h-100 shadow-sm">
                     <a href="producto.html?id=${product.id}">
@@ -296,9 +336,8 @@ function renderProducts(products, searchTerm = '') {
                         </div>
                     </div>
                 </div>
-        `;
-        productGrid.innerHTML += productCard;
-    });
+            </div>
+    `;
 }
 
 async function addToCart(productId) {
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# --- Configuración para poder importar desde la carpeta 'api' ---
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+# ----------------------------------------------------------------
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from api.core import models
+from api.abrir_carrito import almacen, dal, schemas
+
+# Compara mutaciones de carrito por segundo entre el almacén "sqlite" (un commit por cambio)
+# y el almacén "memoria" (write-behind, con un volcado al final incluido en el tiempo).
+# Cada cliente concurrente trabaja sobre el carrito de un usuario distinto, alternando
+# "agregar 1 unidad" y "fijar la cantidad en 1" con el DAL del carrito.
+# Trabaja sobre una copia temporal de database.db; la base real no se modifica.
+# Uso: python scripts/benchmark_carrito.py [mutaciones_por_cliente] [clientes]
+
+MUTACIONES_POR_CLIENTE = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+CLIENTES = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+
+async def cliente(Sesion, user_id: int, product_id: int) -> None:
+    async with Sesion() as db:
+        carrito = await dal.obtener_o_crear_carrito(db, user_id)
+        fijar_en_uno = [schemas.OperacionCarritoRequest(operacion=schemas.TipoOperacionCarrito.FIJAR, product_id=product_id, quantity=1)]
+        for i in range(MUTACIONES_POR_CLIENTE):
+            if i % 2 == 0:
+                await dal.agregar_item_al_carrito(db, carrito.id, product_id, 1)
+            else:
+                await dal.aplicar_operaciones_carrito(db, carrito.id, fijar_en_uno)
+
+
+async def medir(Sesion, modo: str, user_ids, product_id: int) -> float:
+    almacen.CARRITO_ALMACEN = modo
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(Sesion, user_id, product_id) for user_id in user_ids))
+    if almacen.en_memoria():
+        async with Sesion() as db:
+            await almacen.almacen_carritos.volcar(db)
+    return time.perf_counter() - inicio
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directorio:
+        copia = os.path.join(directorio, "database.db")
+        shutil.copy(os.path.join(project_root, "database.db"), copia)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{copia}")
+        Sesion = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+        async with Sesion() as db:
+            user_ids = (await db.execute(select(models.Usuarios.id).order_by(models.Usuarios.id).limit(CLIENTES))).scalars().all()
+            product_id = (await db.execute(select(models.Productos.id).where(models.Productos.stock >= 2).limit(1))).scalar_one()
+
+        total = MUTACIONES_POR_CLIENTE * len(user_ids)
+        print(f"{len(user_ids)} clientes x {MUTACIONES_POR_CLIENTE} mutaciones = {total} mutaciones por caso\n")
+        base = None
+        for modo in ("sqlite", "memoria"):
+            segundos = await medir(Sesion, modo, user_ids, product_id)
+            por_segundo = total / segundos
+            base = base or por_segundo
+            print(f"{modo:<10} {por_segundo:>10.0f} mutaciones/s   ({por_segundo / base:.1f}x)")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
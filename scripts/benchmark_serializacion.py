@@ -0,0 +1,82 @@
+import os
+import sys
+import timeit
+from typing import List
+
+# --- Configuración para poder importar desde la carpeta 'api' ---
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+# ----------------------------------------------------------------
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from api.core import models
+from api.core.respuestas import serializar, unir_lista, respuesta_preserializada
+from api.productos import schemas
+
+# Microbenchmark de la serialización de una página de productos (GET /productos/).
+# Compara, por request, el camino original de FastAPI (validar ORM -> jsonable_encoder -> json
+# de la stdlib), el mismo camino con ORJSONResponse, y el camino actual con bytes cacheados.
+# Uso: python scripts/benchmark_serializacion.py [productos_por_pagina] [repeticiones]
+
+PRODUCTOS_POR_PAGINA = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+REPETICIONES = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+adaptador_lista = TypeAdapter(List[schemas.ProductoResponse])
+
+
+def crear_productos(cantidad: int) -> List[models.Productos]:
+    return [
+        models.Productos(
+            id=i,
+            name=f"Notebook Asus Vivobook {i}",
+            description="Notebook con procesador AMD Ryzen 7, 16 GB de RAM y SSD de 512 GB. " * 3,
+            price=1_000_000 + i,
+            marca="Asus",
+            stock=10,
+            image_url=f"https://example.com/img/{i}.webp",
+            category_id=1,
+        )
+        for i in range(cantidad)
+    ]
+
+
+def camino_stdlib(productos):
+    # Lo que hace FastAPI con response_model: valida el ORM, lo pasa a tipos JSON y codifica con json.
+    validados = adaptador_lista.validate_python([schemas.ProductoResponse.model_validate(p) for p in productos])
+    return JSONResponse(jsonable_encoder(adaptador_lista.dump_python(validados, mode="json"))).body
+
+
+def camino_orjson(productos):
+    validados = adaptador_lista.validate_python([schemas.ProductoResponse.model_validate(p) for p in productos])
+    return ORJSONResponse(adaptador_lista.dump_python(validados, mode="json")).body
+
+
+def camino_preserializado(cacheados):
+    # Acierto de caché: la página ya está en bytes y solo se arma la respuesta.
+    return respuesta_preserializada(cacheados).body
+
+
+def main():
+    productos = crear_productos(PRODUCTOS_POR_PAGINA)
+    pagina_cacheada = unir_lista(serializar(schemas.ProductoResponse.model_validate(p)) for p in productos)
+
+    casos = [
+        ("stdlib json + response_model", lambda: camino_stdlib(productos)),
+        ("orjson + response_model", lambda: camino_orjson(productos)),
+        ("bytes preserializados", lambda: camino_preserializado(pagina_cacheada)),
+    ]
+
+    print(f"Página de {PRODUCTOS_POR_PAGINA} productos, {REPETICIONES} repeticiones por caso\n")
+    base = None
+    for nombre, funcion in casos:
+        segundos = min(timeit.repeat(funcion, number=REPETICIONES, repeat=3))
+        por_request_us = segundos / REPETICIONES * 1_000_000
+        base = base or por_request_us
+        print(f"{nombre:<32} {por_request_us:>10.1f} µs/request   ({base / por_request_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import argparse
+import asyncio
+import os
+import sys
+
+# --- Configuración para poder importar desde la carpeta 'api' ---
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+# ----------------------------------------------------------------
+
+from api.core.database import engine
+from api.abrir_carrito.compactacion import compactar_carritos_abandonados, CARRITOS_ABANDONADOS_DIAS, CARRITOS_COMPACTACION_LOTE
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Elimina carritos sin actividad y sus líneas.")
+    parser.add_argument("--dias", type=int, default=CARRITOS_ABANDONADOS_DIAS, help="Días sin actividad para considerar abandonado un carrito")
+    parser.add_argument("--lote", type=int, default=CARRITOS_COMPACTACION_LOTE, help="Carritos por transacción")
+    args = parser.parse_args()
+
+    engine.echo = False
+    eliminados = await compactar_carritos_abandonados(dias=args.dias, lote=args.lote)
+    print(f"Carritos eliminados: {eliminados['carritos']}")
+    print(f"Líneas eliminadas: {eliminados['lineas']}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+import asyncio
+import os
+import sys
+
+# --- Configuración para poder importar desde la carpeta 'api' ---
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+# ----------------------------------------------------------------
+
+from api.core.database import AsyncSessionLocal, engine
+from api.checkout.analitica import reconstruir_analitica, reconstruir_ventas_productos
+
+# Recalcula el cubo ventas_cubo (hora x categoría x método de pago) y los contadores por
+# producto de ventas_productos a partir de todos los pedidos. Hace falta si se editaron
+# pedidos o categorías de productos a mano en la base: el cubo guarda la categoría que
+# tenía cada producto al momento de la venta.
+# Uso: python scripts/reconstruir_analitica.py
+
+
+async def main():
+    engine.echo = False
+    async with AsyncSessionLocal() as db:
+        filas = await reconstruir_analitica(db)
+        productos = await reconstruir_ventas_productos(db)
+    print(f"ventas_cubo reconstruido: {filas} filas.")
+    print(f"ventas_productos reconstruida: {productos} productos con ventas.")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
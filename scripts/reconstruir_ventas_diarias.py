@@ -0,0 +1,27 @@
+import asyncio
+import os
+import sys
+
+# --- Configuración para poder importar desde la carpeta 'api' ---
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+# ----------------------------------------------------------------
+
+from api.core.database import AsyncSessionLocal, engine
+from api.checkout.dal import reconstruir_ventas_diarias
+
+# Recalcula la tabla ventas_diarias a partir de todos los pedidos. Sirve para la carga
+# inicial y para corregirla si se editaron pedidos a mano en la base.
+# Uso: python scripts/reconstruir_ventas_diarias.py
+
+
+async def main():
+    engine.echo = False
+    async with AsyncSessionLocal() as db:
+        dias = await reconstruir_ventas_diarias(db)
+    print(f"ventas_diarias reconstruida: {dias} días con ventas.")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
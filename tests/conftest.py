@@ -0,0 +1,56 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# --- Configuración para poder importar desde la carpeta 'api' ---
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+# ----------------------------------------------------------------
+
+# La app abre ./database.db y sirve ./public relativos al directorio de trabajo: las pruebas
+# corren sobre una copia de la base en un directorio temporal, así la real no se modifica.
+_directorio_db = tempfile.mkdtemp(prefix="tests_database_")
+shutil.copy(os.path.join(project_root, "database.db"), os.path.join(_directorio_db, "database.db"))
+os.symlink(os.path.join(project_root, "public"), os.path.join(_directorio_db, "public"))
+os.chdir(_directorio_db)
+
+import httpx
+
+from api.core import database
+from api.auth import security
+from api.main import app
+
+database.engine.echo = False
+
+ADMIN = "manu_1025@outlook.com"
+USUARIO = "pepito@gmail.com"
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_directorio_db, ignore_errors=True)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    async with database.AsyncSessionLocal() as sesion:
+        yield sesion
+    await database.engine.dispose()
+
+
+@pytest.fixture
+async def cliente():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+    await database.engine.dispose()
+
+
+def cabeceras_de(email: str) -> dict:
+    return {"Authorization": "Bearer " + security.create_access_token({"sub": email})}
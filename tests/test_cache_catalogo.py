@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from api.productos import cache
+from conftest import USUARIO, cabeceras_de
+
+pytestmark = pytest.mark.anyio
+
+
+def escribir_desde_otro_proceso(sql: str, *parametros) -> None:
+    """Escribe con una conexión aparte, como lo haría otro worker o un script: este proceso no se entera."""
+    with sqlite3.connect("database.db") as conexion:
+        conexion.execute(sql, parametros)
+
+
+async def test_etag_cambia_con_escrituras_de_otro_proceso(cliente):
+    primera = await cliente.get("/productos/1")
+    assert primera.status_code == 200
+    etag = primera.headers["etag"]
+    assert (await cliente.get("/productos/1", headers={"If-None-Match": etag})).status_code == 304
+
+    escribir_desde_otro_proceso("UPDATE productos SET stock = stock + 7 WHERE id = ?", 1)
+
+    segunda = await cliente.get("/productos/1", headers={"If-None-Match": etag})
+    assert segunda.status_code == 200
+    assert segunda.headers["etag"] != etag
+    assert segunda.json()["stock"] == primera.json()["stock"] + 7
+
+
+async def test_listado_y_categorias_no_sirven_cache_vieja(cliente):
+    listado = await cliente.get("/productos/", params={"limit": 100})
+    categorias = await cliente.get("/categorias/")
+    nombres = {c["id"]: c["name"] for c in categorias.json()}
+    categoria_id = next(iter(nombres))
+
+    escribir_desde_otro_proceso("UPDATE productos SET price = price + 1 WHERE id = ?", listado.json()[0]["id"])
+    escribir_desde_otro_proceso("UPDATE categorias SET name = name || ' (editada)' WHERE id = ?", categoria_id)
+
+    nuevo_listado = await cliente.get("/productos/", params={"limit": 100}, headers={"If-None-Match": listado.headers["etag"]})
+    assert nuevo_listado.status_code == 200
+    assert nuevo_listado.json()[0]["price"] == listado.json()[0]["price"] + 1
+
+    nuevas_categorias = await cliente.get("/categorias/", headers={"If-None-Match": categorias.headers["etag"]})
+    assert nuevas_categorias.status_code == 200
+    assert {c["id"]: c["name"] for c in nuevas_categorias.json()}[categoria_id] == nombres[categoria_id] + " (editada)"
+
+
+async def test_reservar_stock_no_cambia_el_etag(cliente):
+    cabeceras = cabeceras_de(USUARIO)
+    await cliente.delete("/carrito/mi_carrito/vaciar", headers=cabeceras)
+    await cliente.post("/carrito/mi_carrito/detalles", json={"product_id": 17, "quantity": 1}, headers=cabeceras)
+    etag = (await cliente.get("/productos/17")).headers["etag"]
+
+    # La preferencia de pago reserva stock (productos.stock_reservado), que el cliente no ve.
+    preferencia = await cliente.post("/pagos/crear_preferencia", json={"address_id": 7, "payment_method_id": 1}, headers=cabeceras)
+    assert preferencia.status_code == 200
+
+    assert (await cliente.get("/productos/17", headers={"If-None-Match": etag})).status_code == 304
+    await cliente.delete("/carrito/mi_carrito/vaciar", headers=cabeceras)
+
+
+async def test_escribir_un_producto_no_invalida_los_demas(cliente):
+    etag = (await cliente.get("/productos/1")).headers["etag"]
+    etag_lote = (await cliente.get("/productos/lote", params={"ids": "1,3"})).headers["etag"]
+
+    escribir_desde_otro_proceso("UPDATE productos SET price = price + 1 WHERE id = ?", 2)
+
+    assert (await cliente.get("/productos/1", headers={"If-None-Match": etag})).status_code == 304
+    assert (await cliente.get("/productos/lote", params={"ids": "1,3"}, headers={"If-None-Match": etag_lote})).status_code == 304
+    aciertos = cache.cache_catalogo.aciertos
+    assert (await cliente.get("/productos/1")).status_code == 200
+    assert cache.cache_catalogo.aciertos == aciertos + 1
+
+    # En cambio, invalidar el producto 1 desde este proceso saca solo su entrada.
+    cache.invalidar_productos([1])
+    assert (await cliente.get("/productos/1")).status_code == 200
+    assert cache.cache_catalogo.aciertos == aciertos + 1
+    assert (await cliente.get("/productos/lote", params={"ids": "3"})).status_code == 200
+    assert cache.cache_catalogo.aciertos == aciertos + 2
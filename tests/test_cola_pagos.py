@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.future import select
+
+from api.core import models
+from api.core.enum import TrabajoStatus
+from api.checkout import dal as checkout_dal
+from api.pagos import cola, dal
+from conftest import USUARIO, cabeceras_de
+
+pytestmark = pytest.mark.anyio
+
+PLAZO = timedelta(seconds=60)
+
+
+async def encolar_con_carrito(cliente, db) -> models.ColaPagos:
+    cabeceras = cabeceras_de(USUARIO)
+    await cliente.delete("/carrito/mi_carrito/vaciar", headers=cabeceras)
+    await cliente.post("/carrito/mi_carrito/detalles", json={"product_id": 17, "quantity": 1}, headers=cabeceras)
+    return await dal.encolar_pago(db, user_id=9, address_id=7)
+
+
+async def estado(db, trabajo_id: int) -> models.ColaPagos:
+    return (await db.execute(
+        select(models.ColaPagos).where(models.ColaPagos.id == trabajo_id).execution_options(populate_existing=True)
+    )).scalar_one()
+
+
+async def tomar(db, trabajo_id: int, plazo: timedelta = PLAZO):
+    return next(trabajo for trabajo in await dal.tomar_lote(db, 100, plazo) if trabajo.id == trabajo_id)
+
+
+async def test_el_trabajo_se_completa_en_la_transaccion_del_pedido(cliente, db, monkeypatch):
+    trabajo = await encolar_con_carrito(cliente, db)
+    tomado = await tomar(db, trabajo.id)
+
+    # Falla algo después del commit del pedido: el trabajo ya quedó completado con él.
+    def fallar(productos):
+        raise RuntimeError("el proceso murió")
+
+    monkeypatch.setattr(checkout_dal, "propagar_cambios_productos", fallar)
+    await cola.procesar_trabajo(tomado)
+
+    fila = await estado(db, trabajo.id)
+    assert fila.status == TrabajoStatus.COMPLETADO.value
+    assert fila.order_id is not None
+    assert (await db.get(models.Pedidos, fila.order_id)) is not None
+
+
+async def test_un_trabajo_en_curso_no_se_retoma_antes_del_plazo(cliente, db):
+    trabajo_id = (await encolar_con_carrito(cliente, db)).id
+    tomado = await tomar(db, trabajo_id)
+
+    # Otro worker que arranca (o sondea) no lo ve mientras el plazo no venció.
+    assert trabajo_id not in [t.id for t in await dal.tomar_lote(db, 100, PLAZO)]
+
+    # Vencido el plazo, se retoma, y el trabajador original ya no puede completarlo.
+    retomado = await tomar(db, trabajo_id, plazo=timedelta(seconds=-1))
+    assert retomado.intentos == tomado.intentos + 1
+    with pytest.raises(dal.TrabajoPerdido):
+        await dal.marcar_completado(db, tomado, order_id=1)
+    await db.rollback()
+
+    await cola.procesar_trabajo(retomado)
+    fila = await estado(db, trabajo_id)
+    assert fila.status == TrabajoStatus.COMPLETADO.value and fila.order_id is not None
+
+
+async def test_el_trabajador_que_perdio_el_trabajo_no_crea_el_pedido(cliente, db):
+    trabajo = await encolar_con_carrito(cliente, db)
+    tomado = await tomar(db, trabajo.id)
+    await tomar(db, trabajo.id, plazo=timedelta(seconds=-1))
+    pedidos_antes = len((await db.execute(select(models.Pedidos.id))).all())
+
+    await cola.procesar_trabajo(tomado)
+
+    assert len((await db.execute(select(models.Pedidos.id))).all()) == pedidos_antes
+    assert (await estado(db, trabajo.id)).status == TrabajoStatus.PROCESANDO.value
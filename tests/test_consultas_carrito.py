@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import delete, event
+from sqlalchemy.future import select
+
+from api.core import database, models
+from api.abrir_carrito import almacen
+from api.abrir_carrito.almacen import almacen_carritos
+from api.abrir_carrito.dal import obtener_carrito_por_usuario_id, obtener_detalle_carrito_con_productos
+
+pytestmark = pytest.mark.anyio
+
+USUARIO_ID = 9
+
+
+async def llenar_carrito(db, carrito_id: int, lineas: int) -> None:
+    productos = (await db.execute(select(models.Productos).order_by(models.Productos.id).limit(lineas))).scalars().all()
+    assert len(productos) == lineas
+    await db.execute(delete(models.CarritoDetalle).where(models.CarritoDetalle.cart_id == carrito_id))
+    db.add_all(
+        models.CarritoDetalle(cart_id=carrito_id, product_id=producto.id, quantity=1, price=producto.price)
+        for producto in productos
+    )
+    await db.commit()
+    almacen_carritos.olvidar(carrito_id)
+
+
+async def sentencias_del_detalle(db, carrito_id: int):
+    """Devuelve (líneas del detalle, sentencias SQL que ejecutó obtener_detalle_carrito_con_productos)."""
+    sentencias = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+
+    event.listen(database.engine.sync_engine, "before_cursor_execute", contar)
+    try:
+        detalle = await obtener_detalle_carrito_con_productos(db, carrito_id)
+    finally:
+        event.remove(database.engine.sync_engine, "before_cursor_execute", contar)
+    assert all(linea.product_name is not None for linea in detalle)
+    return len(detalle), len(sentencias)
+
+
+@pytest.mark.parametrize("almacen_carrito", ["sqlite", "memoria"])
+async def test_el_detalle_del_carrito_no_depende_de_la_cantidad_de_lineas(db, monkeypatch, almacen_carrito):
+    monkeypatch.setattr(almacen, "CARRITO_ALMACEN", almacen_carrito)
+    carrito = await obtener_carrito_por_usuario_id(db, USUARIO_ID)
+    # La primera carga del almacén en memoria lee además el último id de línea; no entra en la cuenta.
+    await obtener_detalle_carrito_con_productos(db, carrito.id)
+
+    try:
+        await llenar_carrito(db, carrito.id, 1)
+        lineas, con_una_linea = await sentencias_del_detalle(db, carrito.id)
+        assert lineas == 1
+
+        await llenar_carrito(db, carrito.id, 10)
+        lineas, con_diez_lineas = await sentencias_del_detalle(db, carrito.id)
+        assert lineas == 10
+
+        assert con_diez_lineas == con_una_linea
+    finally:
+        await db.execute(delete(models.CarritoDetalle).where(models.CarritoDetalle.cart_id == carrito.id))
+        await db.commit()
+        almacen_carritos.olvidar(carrito.id)
@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+
+from api.checkout import dal as checkout_dal
+from conftest import USUARIO, cabeceras_de
+
+pytestmark = pytest.mark.anyio
+
+
+def contar_pedidos() -> int:
+    with sqlite3.connect("database.db") as conexion:
+        return conexion.execute("SELECT count(*) FROM pedidos").fetchone()[0]
+
+
+async def preparar_carrito(cliente, cabeceras) -> None:
+    await cliente.delete("/carrito/mi_carrito/vaciar", headers=cabeceras)
+    respuesta = await cliente.post("/carrito/mi_carrito/detalles", json={"product_id": 17, "quantity": 1}, headers=cabeceras)
+    assert respuesta.status_code == 201, respuesta.text
+
+
+async def test_reintento_devuelve_el_mismo_pedido(cliente):
+    cabeceras = {**cabeceras_de(USUARIO), "Idempotency-Key": "reintento-simple"}
+    await preparar_carrito(cliente, cabeceras)
+    antes = contar_pedidos()
+
+    primera = await cliente.post("/checkout", json={"address_id": 7, "payment_method_id": 1}, headers=cabeceras)
+    segunda = await cliente.post("/checkout", json={"address_id": 7, "payment_method_id": 1}, headers=cabeceras)
+
+    assert primera.status_code == segunda.status_code == 201
+    assert segunda.headers.get("Idempotent-Replayed") == "true"
+    assert segunda.json()["id"] == primera.json()["id"]
+    assert contar_pedidos() == antes + 1
+
+
+async def test_falla_despues_del_commit_no_libera_la_clave(cliente, monkeypatch):
+    """Si algo falla después de confirmar el pedido, la respuesta ya quedó guardada con él."""
+    cabeceras = {**cabeceras_de(USUARIO), "Idempotency-Key": "falla-tras-commit"}
+    await preparar_carrito(cliente, cabeceras)
+    antes = contar_pedidos()
+
+    def fallar(productos):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(checkout_dal, "propagar_cambios_productos", fallar)
+    fallida = await cliente.post("/checkout", json={"address_id": 7, "payment_method_id": 1}, headers=cabeceras)
+    assert fallida.status_code == 500
+    monkeypatch.undo()
+
+    # El cliente reintenta (y hasta vuelve a cargar el carrito): recibe el pedido original.
+    await preparar_carrito(cliente, cabeceras)
+    reintento = await cliente.post("/checkout", json={"address_id": 7, "payment_method_id": 1}, headers=cabeceras)
+    assert reintento.status_code == 201
+    assert reintento.headers.get("Idempotent-Replayed") == "true"
+    assert contar_pedidos() == antes + 1
+
+
+async def test_error_antes_del_commit_libera_la_clave(cliente, monkeypatch):
+    cabeceras = {**cabeceras_de(USUARIO), "Idempotency-Key": "falla-antes-del-commit"}
+    await preparar_carrito(cliente, cabeceras)
+    antes = contar_pedidos()
+
+    async def fallar(db, order_id):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(checkout_dal, "sumar_pedido_a_ventas_productos", fallar)
+    assert (await cliente.post("/checkout", json={"address_id": 7, "payment_method_id": 1}, headers=cabeceras)).status_code == 500
+    monkeypatch.undo()
+    assert contar_pedidos() == antes
+
+    reintento = await cliente.post("/checkout", json={"address_id": 7, "payment_method_id": 1}, headers=cabeceras)
+    assert reintento.status_code == 201
+    assert "Idempotent-Replayed" not in reintento.headers
+    assert contar_pedidos() == antes + 1
+
+
+async def test_webhook_repetido_encola_una_sola_vez(cliente):
+    evento = {"user_id": 9, "address_id": 7, "event_id": "evento-repetido"}
+    primera = await cliente.post("/pagos/webhook", json=evento)
+    segunda = await cliente.post("/pagos/webhook", json=evento)
+    assert primera.status_code == segunda.status_code == 200
+    assert segunda.headers.get("Idempotent-Replayed") == "true"
+    assert segunda.json()["trabajo_id"] == primera.json()["trabajo_id"]
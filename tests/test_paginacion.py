@@ -0,0 +1,57 @@
+import base64
+import json
+
+import pytest
+
+from api.core.paginacion import CABECERA_SIGUIENTE_CURSOR, codificar_cursor, decodificar_cursor
+from conftest import ADMIN, cabeceras_de
+
+pytestmark = pytest.mark.anyio
+
+
+def cursor_crudo(*valores) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(valores)).encode("utf-8")).decode("ascii")
+
+
+def test_decodificar_cursor_valida_tipos():
+    assert decodificar_cursor(codificar_cursor("Notebook", 3), str, int) == ["Notebook", 3]
+    assert decodificar_cursor(codificar_cursor(-2, 7), float, int) == [-2.0, 7]
+    for cursor in (cursor_crudo(None, 1), cursor_crudo("a", "b"), cursor_crudo([1], 1), cursor_crudo(True, 1), "no-es-base64!", cursor_crudo(1)):
+        with pytest.raises(ValueError, match="Cursor inválido"):
+            decodificar_cursor(cursor, float, int)
+
+
+# (ruta, parámetros, cursores armados a mano que no corresponden al endpoint)
+ENDPOINTS_PAGINADOS = [
+    ("/productos/", {"orden": "id"}, [cursor_crudo(None, 1), cursor_crudo("a", 1), cursor_crudo(1)]),
+    ("/productos/", {"orden": "precio_desc"}, [cursor_crudo([1], 1), cursor_crudo(1.5, 1)]),
+    ("/productos/", {"orden": "nombre"}, [cursor_crudo([1], 1), cursor_crudo(1, 1)]),
+    ("/productos/", {"orden": "nuevos"}, [cursor_crudo([1], 1)]),
+    ("/productos/", {"orden": "popularidad"}, [cursor_crudo([1], 1), cursor_crudo(None, None)]),
+    ("/productos/buscar/", {"query": "notebook"}, [cursor_crudo(None, 1), cursor_crudo("a", "b")]),
+    ("/productos/buscar/", {"query": "notebok", "fuzzy": "true"}, [cursor_crudo("a", "b"), cursor_crudo(None, 1)]),
+    ("/categorias/", {"incluir": "productos"}, [cursor_crudo(None), cursor_crudo("1")]),
+    ("/pedidos", {}, [cursor_crudo(None), cursor_crudo([1]), cursor_crudo(1, 2)]),
+]
+
+
+@pytest.mark.parametrize("ruta, parametros, cursores", ENDPOINTS_PAGINADOS)
+async def test_cursor_invalido_devuelve_400(cliente, ruta, parametros, cursores):
+    for cursor in cursores:
+        respuesta = await cliente.get(ruta, params={**parametros, "cursor": cursor}, headers=cabeceras_de(ADMIN))
+        assert respuesta.status_code == 400, (cursor, respuesta.text)
+        assert respuesta.json() == {"detail": "Cursor inválido."}
+
+
+@pytest.mark.parametrize("ruta, parametros, _", ENDPOINTS_PAGINADOS)
+async def test_recorrer_todas_las_paginas(cliente, ruta, parametros, _):
+    vistos, cursor = [], None
+    while True:
+        respuesta = await cliente.get(ruta, params={**parametros, "limit": 2, **({"cursor": cursor} if cursor else {})}, headers=cabeceras_de(ADMIN))
+        assert respuesta.status_code == 200, respuesta.text
+        vistos += [fila["id"] for fila in respuesta.json()]
+        cursor = respuesta.headers.get(CABECERA_SIGUIENTE_CURSOR)
+        if not cursor:
+            break
+    assert vistos
+    assert len(vistos) == len(set(vistos))
@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import delete
+
+from api.core import database, models
+from api.abrir_carrito import resumen
+from api.abrir_carrito.dal import agregar_item_al_carrito, obtener_o_crear_carrito, obtener_resumen_carrito
+
+pytestmark = pytest.mark.anyio
+
+
+def test_una_escritura_solo_invalida_el_resumen_de_su_carrito():
+    _, version_inicial = resumen.leer(-1)
+    with resumen.escritura(-2):
+        resumen.aplicar_cambio(-2, 10.0, 1, 1)
+    resumen.guardar(-1, 5.0, 1, 1, version_inicial)
+    assert resumen.leer(-1)[0] == (5.0, 1, 1)
+
+
+def test_un_resumen_leido_antes_de_una_escritura_del_mismo_carrito_no_se_guarda():
+    resumen.descartar(-3)
+    _, version_inicial = resumen.leer(-3)
+    with resumen.escritura(-3):
+        resumen.aplicar_cambio(-3, 10.0, 1, 1)
+    resumen.guardar(-3, 5.0, 1, 1, version_inicial)
+    assert resumen.leer(-3)[0] is None
+
+
+async def test_una_lectura_entre_el_commit_y_el_ajuste_no_cuenta_dos_veces(db, monkeypatch):
+    carrito = await obtener_o_crear_carrito(db, 9)
+    carrito_id = carrito.id
+    await db.execute(delete(models.CarritoDetalle).where(models.CarritoDetalle.cart_id == carrito_id))
+    await db.commit()
+    resumen.descartar(carrito_id)
+
+    # Otra request lee el resumen justo cuando el commit del alta ya está en la base,
+    # antes de que el escritor le aplique su cambio.
+    commit = db.commit
+
+    async def commit_y_leer():
+        await commit()
+        async with database.AsyncSessionLocal() as otra:
+            assert await obtener_resumen_carrito(otra, carrito_id) == (pytest.approx(precio), 2, 1)
+
+    monkeypatch.setattr(db, "commit", commit_y_leer)
+    precio = (await db.get(models.Productos, 17)).price * 2
+    assert await agregar_item_al_carrito(db, carrito_id, 17, 2) is not None
+    monkeypatch.undo()
+
+    async with database.AsyncSessionLocal() as otra:
+        assert await obtener_resumen_carrito(otra, carrito_id) == (pytest.approx(precio), 2, 1)
+
+    await db.execute(delete(models.CarritoDetalle).where(models.CarritoDetalle.cart_id == carrito_id))
+    await db.commit()
+    resumen.descartar(carrito_id)
@@ -0,0 +1,78 @@
+import asyncio
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import func, insert, update
+from sqlalchemy.future import select
+
+from api.core import database, models
+from api.core.enum import PedidoStatus
+from api.checkout.dal import crear_pedido_desde_carrito
+
+pytestmark = pytest.mark.anyio
+
+# Checkouts simultáneos de 1 unidad del mismo producto con menos stock que compradores.
+# Los que SQLite rechaza por lock ("database is locked") no venden nada y se cuentan aparte.
+COMPRADORES = 50
+STOCK = 5
+
+
+async def preparar_compradores(db, product_id: int, price: float) -> list:
+    ahora = datetime.now(timezone.utc)
+    compradores = []
+    for i in range(COMPRADORES):
+        usuario = models.Usuarios(email=f"stress_{i}@example.com", password="-", nombre="Stress", apellido=str(i), fecha_nacimiento=date(2000, 1, 1))
+        db.add(usuario)
+        await db.flush()
+        direccion = models.DireccionesEnvio(user_id=usuario.id, address="Falsa 123", city="Test", zip_code="1000")
+        carrito = models.Carrito(user_id=usuario.id, time_tamptz=ahora, ultima_actividad=ahora)
+        db.add_all([direccion, carrito])
+        await db.flush()
+        await db.execute(insert(models.CarritoDetalle).values(cart_id=carrito.id, product_id=product_id, quantity=1, price=price))
+        compradores.append((usuario.id, direccion.id, carrito.id))
+    await db.commit()
+    return compradores
+
+
+async def comprar(user_id: int, address_id: int, cart_id: int) -> str:
+    async with database.AsyncSessionLocal() as db:
+        try:
+            await crear_pedido_desde_carrito(db, cart_id, user_id=user_id, address_id=address_id, status=PedidoStatus.COMPLETADO.value)
+        except ValueError:
+            return "sin_stock"
+        except Exception as e:
+            if "locked" in str(e):
+                return "lock"
+            raise
+    return "vendido"
+
+
+async def unidades_vendidas(db, product_id: int) -> int:
+    return (await db.execute(
+        select(func.coalesce(func.sum(models.PedidoDetalle.quantity), 0)).where(models.PedidoDetalle.product_id == product_id)
+    )).scalar_one()
+
+
+async def test_checkouts_concurrentes_no_venden_de_mas(db):
+    product_id, price, stock_original = (await db.execute(
+        select(models.Productos.id, models.Productos.price, models.Productos.stock).order_by(models.Productos.id.desc()).limit(1)
+    )).one()
+    await db.execute(update(models.Productos).where(models.Productos.id == product_id).values(stock=STOCK, stock_reservado=0))
+    await db.execute(models.ReservasStock.__table__.delete().where(models.ReservasStock.product_id == product_id))
+    compradores = await preparar_compradores(db, product_id, price)
+    vendidas_antes = await unidades_vendidas(db, product_id)
+
+    try:
+        resultados = await asyncio.gather(*(comprar(*comprador) for comprador in compradores))
+
+        db.expire_all()
+        stock_final = (await db.execute(select(models.Productos.stock).where(models.Productos.id == product_id))).scalar_one()
+        vendidas = await unidades_vendidas(db, product_id) - vendidas_antes
+
+        assert 0 < vendidas <= STOCK
+        assert stock_final >= 0
+        assert vendidas == STOCK - stock_final
+        assert vendidas == resultados.count("vendido")
+    finally:
+        await db.execute(update(models.Productos).where(models.Productos.id == product_id).values(stock=stock_original))
+        await db.commit()
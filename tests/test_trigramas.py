@@ -0,0 +1,27 @@
+from api.productos.trigramas import IndiceTrigramas, _palabras
+
+
+def test_la_puntuacion_separa_palabras():
+    assert _palabras("Auriculares Wi-Fi/USB-C, 2.0 (Sony).") == {"auriculares", "wi", "fi", "usb", "c", "2", "0", "sony"}
+    assert _palabras("Cañón ÉPICO") == {"canon", "epico"}
+    assert _palabras(None) == set()
+
+
+def test_las_palabras_con_puntuacion_se_encuentran():
+    indice = IndiceTrigramas()
+    indice._construir([(1, "Cable USB-C", "Sony.", "Carga rápida, 65W"), (2, "Mouse", "Logitech", None)])
+    assert [product_id for _, product_id in indice.buscar("usb")] == [1]
+    assert [product_id for _, product_id in indice.buscar("sony")] == [1]
+    assert [product_id for _, product_id in indice.buscar("rapida")] == [1]
+
+
+def test_el_ranking_se_guarda_hasta_que_cambia_el_indice():
+    indice = IndiceTrigramas()
+    indice._construir([(1, "Cable USB", "Sony", None), (2, "Cargador USB", "Sony", None)])
+    indice.cargado = True
+
+    ranking = indice.buscar("usb sony")
+    assert indice.buscar("Sony, USB") is ranking
+
+    indice.eliminar(2)
+    assert [product_id for _, product_id in indice.buscar("usb sony")] == [1]